@@ -7,15 +7,44 @@ from SIRStochasticDynamicsDisconnect import *
 from SIRStochasticDynamicsRewire import *
 from SIRStochasticDynamicsRewireDegree import *
 from SIRStochasticDynamicsRewireNeighbour import *
+from SIRSynchronousEnsemble import *
+from SISSynchronousEnsemble import *
 
-from IPython.parallel import Client
+from Executors import *
+from SharedTopology import *
 import time
 import csv
 
 
 # In[2]:
 
-def make_simulation(N, M, desc, model_type, repetitions = 1, offset = 0 ):
+# the kinds of network the simulations can be run on
+NETWORKS = [ 'barabasi_albert', 'configuration_model', 'erdos_renyi' ]
+
+def make_topology( network, N, M, alpha = 2, seed = None ):
+    '''Build a network of one of the kinds in NETWORKS. All have a mean
+    degree of about 2M: M is the number of edges added with each node of a
+    Barabasi-Albert network, the smallest degree of a configuration model
+    with power-law exponent alpha, and half the mean degree of an
+    Erdos-Renyi network.
+    
+    network: the kind of network
+    N: the number of nodes
+    M: the degree parameter
+    alpha: the exponent of the power law, for configuration models (defaults to 2)
+    seed: the seed for the network (optional, defaults to a new random network)
+    returns: the network, as a CompactTopology'''
+    if network == 'barabasi_albert':
+        return barabasi_albert_topology(N, M, seed = seed)
+    elif network == 'configuration_model':
+        return configuration_model_topology(N, alpha, k_min = M, seed = seed)
+    elif network == 'erdos_renyi':
+        return erdos_renyi_topology(N, (2.0 * M) / (N - 1), seed = seed)
+    else:
+        raise ValueError('Unknown network {n} (expected one of {ns})'.format(n = network, ns = NETWORKS))
+
+def make_simulation(N, M, desc, model_type, repetitions = 1, offset = 0, topologies = None, cache = None,
+                    network = 'barabasi_albert', alpha = 2 ):
     '''Return a function to populate and run the simulation on a graph
     with dynamics. If there is more than one repetition, return the
     average of the outbreak parameters.
@@ -24,13 +53,60 @@ def make_simulation(N, M, desc, model_type, repetitions = 1, offset = 0 ):
     p: model function for degree distribution
     desc: description of distrbution, used for filename generation
     repetitions: (optional) number of repetitions (defaults to 1)
-    offset: (optional) start repetition (defaults to 0)'''
+    offset: (optional) start repetition (defaults to 0)
+    topologies: (optional) SharedTopology networks to run on in turn, rather
+    than building a new network for each repetition (defaults to None)
+    cache: (optional) a TopologyCache to load the network of each repetition
+    from, seeded by the repetition number, rather than building it (defaults to None)
+    network: (optional) the kind of network, one of NETWORKS (defaults to 'barabasi_albert')
+    alpha: (optional) the exponent of the power law, for configuration models (defaults to 2)'''
+    return Simulation(N, M, desc, model_type, repetitions, offset, topologies, cache, network, alpha)
+
+
+class Simulation(object):
+    '''A function to populate and run the simulation on a graph with
+    dynamics, made as an object rather than a closure so that it can be
+    pickled and sent to other processes.'''
+    
+    def __init__( self, N, M, desc, model_type, repetitions = 1, offset = 0, topologies = None, cache = None,
+                  network = 'barabasi_albert', alpha = 2 ):
+        '''See make_simulation() for the parameters.'''
+        self.N = N
+        self.M = M
+        self.desc = desc
+        self.model_type = model_type
+        self.repetitions = repetitions
+        self.offset = offset
+        self.topologies = topologies
+        self.cache = cache
+        self.network = network
+        self.alpha = alpha
     
-    def run_simulation( g ):
+    def rebuild( self, g, seed = None ):
+        '''Build a new network for a repetition, loading it from the cache
+        if there is one and the network is seeded. See make_topology()
+        for the kinds of network.
+        
+        g: the graph with dynamics
+        seed: the seed for the network (optional, defaults to a new random network)'''
+        N = self.N
+        M = self.M
+        if self.network == 'barabasi_albert':
+            g.rebuild_barabasi_albert(N, M, seed = seed, cache = self.cache)
+        elif self.network == 'configuration_model':
+            g.rebuild_configuration_model(N, self.alpha, k_min = M, seed = seed, cache = self.cache)
+        elif self.network == 'erdos_renyi':
+            g.rebuild_erdos_renyi(N, (2.0 * M) / (N - 1), seed = seed, cache = self.cache)
+        else:
+            raise ValueError('Unknown network {n} (expected one of {ns})'.format(n = self.network, ns = NETWORKS))
+    
+    def __call__( self, g ):
+        '''Run the simulation.
+        
+        g: the graph with dynamics
+        returns: a dict of the averaged results'''
+        repetitions = self.repetitions
         
-        # Write the results to a csv file
-        filename = model_type + '_results.csv'
-
         #with open(filename, 'wb') as csvfile:
         #        writer = csv.writer(csvfile, delimiter=',',quotechar='|', quoting=csv.QUOTE_MINIMAL)
         #        writer.writerow(['p_infect'] + ['p_rewire'] + ['p_recover'] + ['repetitions'] + 
@@ -45,7 +121,14 @@ def make_simulation(N, M, desc, model_type, repetitions = 1, offset = 0 ):
             # build the network topology using the given degree distribution
             g.reset()
             
-            g.rebuild_barabasi_albert(N,M)
+            if self.topologies is not None:
+                # attach to one of the shared networks
+                g.copy_from(self.topologies[(self.offset + rep) % len(self.topologies)].attach())
+            elif self.cache is not None:
+                # load the network for this repetition from the cache
+                self.rebuild(g, seed = self.offset + rep)
+            else:
+                self.rebuild(g)
             
             # run the simulation dynamics
             steps = g.dynamics()
@@ -57,18 +140,39 @@ def make_simulation(N, M, desc, model_type, repetitions = 1, offset = 0 ):
               
         end = time.clock()
         
+        return self.record(g.p_infect, g.p_rewire, g.p_recover, start, end, time_results, node_results, r_infinities)
+    
+    def record( self, p_infect, p_rewire, p_recover, start, end, time_results, node_results, r_infinities ):
+        '''Average the results of the repetitions of a parameter point and
+        append them to the results file.
+        
+        p_infect: the infection probability
+        p_rewire: the rewiring probability
+        p_recover: the recovery probability
+        start: the time the repetitions started
+        end: the time they ended
+        time_results: the time of the peak of infection of each repetition
+        node_results: the number of nodes infected at the peak of each repetition
+        r_infinities: the final size of each repetition
+        returns: a dict of the averaged results'''
+        N = self.N
+        repetitions = self.repetitions
+        
+        # Write the results to a csv file
+        filename = self.model_type + '_results.csv'
+        
         with open(filename, 'ab') as csvfile:
             spamwriter = csv.writer(csvfile, delimiter=',',quotechar='|', quoting=csv.QUOTE_MINIMAL)
-            spamwriter.writerow([N] + [g.p_infect] + [g.p_rewire] + [g.p_recover] + [repetitions] + 
+            spamwriter.writerow([N] + [p_infect] + [p_rewire] + [p_recover] + [repetitions] + 
                                 [start] + [end] + [numpy.mean(time_results)] + [numpy.mean(node_results)] +
                                 [numpy.mean(r_infinities)])
         
         # construct metadata to wrap-up repetition results
         r = dict()
         r['nodes'] = N
-        r['p_infect'] = g.p_infect
-        r['p_rewire'] = g.p_rewire
-        r['p_recover'] = g.p_recover
+        r['p_infect'] = p_infect
+        r['p_rewire'] = p_rewire
+        r['p_recover'] = p_recover
         r['repetitions'] = repetitions
         r['start_time'] = start
         r['end_time'] = end
@@ -77,66 +181,127 @@ def make_simulation(N, M, desc, model_type, repetitions = 1, offset = 0 ):
         r['r_infinity'] = numpy.mean(r_infinities)
         
         return r
-    
-    return run_simulation
 
 
-# In[3]:
+# the synchronous models that can be run as lock-step ensembles
+ENSEMBLES = { 'SYNCHRONOUS_SIR': SIRSynchronousEnsemble,
+              'SYNCHRONOUS_SIS': SISSynchronousEnsemble }
 
-def blob_runner( reps = 1, timelim = 10000, numnodes = 5000, seed = 3, startinfected = 0.01, pinf_min = 0.00, pinf_max = 0.02, 
-                pinf_num = 10, prew_min = 0.00, prew_max = 0.00, prew_num = 10, prec_min = 0.00, prec_max = 0.00, 
-                prec_num = 10, set_alpha = 2, model_type = 'BASE'):
+def make_ensemble_simulation(N, M, desc, model_type, repetitions = 1, offset = 0, topologies = None, cache = None,
+                             network = 'barabasi_albert', alpha = 2 ):
+    '''Return a function to run the repetitions of a parameter point of a
+    synchronous model together, as the replicas of an ensemble on a single
+    network, returning the same averaged results as make_simulation().
+    The function is called with a dict of the ensemble's parameters
+    (p_infect, p_recover, p_infected, time_limit and optionally seed).
     
-    # IPython profile for our remote cluster
-    cluster_name = "blob"
+    model_type: the model, one of the keys of ENSEMBLES
+    See make_simulation() for the other parameters. The network is the
+    topology or cached network numbered by the offset, or a new network.'''
+    return EnsembleSimulation(N, M, desc, model_type, repetitions, offset, topologies, cache, network, alpha)
 
-    # connect to cluster
-    cluster = Client(profile = cluster_name)
-    #cluster = Client()
-    print("Cluster has {n} engines available".format(n = len(cluster[:])))
 
-    # Add the location of the files on the blob server to python path
-    #def parallel(x):
-    #    import sys
-    #    sys.path.append('//home//mjp22//08_Blob')
-    #    return sys.path
+class EnsembleSimulation(Simulation):
+    '''A function to run the repetitions of a parameter point of a
+    synchronous model as an ensemble, made as an object so that it can be
+    pickled and sent to other processes.'''
+    
+    def __init__( self, N, M, desc, model_type, repetitions = 1, offset = 0, topologies = None, cache = None,
+                  network = 'barabasi_albert', alpha = 2 ):
+        '''See make_ensemble_simulation() for the parameters.'''
+        if model_type not in ENSEMBLES:
+            raise ValueError('Unknown ensemble {m} (expected one of {ms})'.format(m = model_type, ms = ENSEMBLES.keys()))
+        Simulation.__init__(self, N, M, desc, model_type, repetitions, offset, topologies, cache, network, alpha)
+    
+    def topology( self ):
+        '''Return the network for the replicas: one of the shared
+        networks, the network seeded by the offset from the cache if there
+        is one, or otherwise a new network.
         
-    #k = cluster[:].map_sync(parallel,range(1))
-    
-    #print k
-    
-    d = cluster[:]
-    
-    # set up imports on cluster machines
-    with d.sync_imports():
-        import time
-        import math
-        import numpy
-        import mpmath
-        import networkx
-        import dill
-        import collections
-        import operator
-        import os.path
-        import csv
-    
-    # use Dill as pickler
-    d.use_dill()
-
-    # load-balance work across the available compute nodes
-    view = cluster.load_balanced_view()
-    
-    def parallel(x):
-    
-        filename = model_type + '_results.csv'
-        with open(filename, 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=',',quotechar='|', quoting=csv.QUOTE_MINIMAL)
-            writer.writerow(['nodes'] + ['p_infect'] + ['p_rewire'] + ['p_recover'] + ['repetitions'] + 
-                            ['start_time'] + ['end_time'] + ['avg_time_data'] + ['avg_node_data'] + ['r_infinity'])
+        returns: the network, as a CompactTopology'''
+        (N, M, alpha, seed) = (self.N, self.M, self.alpha, self.offset)
+        if self.topologies is not None:
+            return self.topologies[self.offset % len(self.topologies)].attach()
+        elif self.cache is None:
+            return make_topology(self.network, N, M, alpha)
         
-        return 'done'
+        # use the same cache entries as the graphs with dynamics
+        if self.network == 'barabasi_albert':
+            params = dict(n = N, m = M)
+        elif self.network == 'configuration_model':
+            params = dict(n = N, alpha = alpha, k_min = M, k_max = None)
+        elif self.network == 'erdos_renyi':
+            params = dict(n = N, p = (2.0 * M) / (N - 1))
+        else:
+            raise ValueError('Unknown network {n} (expected one of {ns})'.format(n = self.network, ns = NETWORKS))
+        return self.cache.topology(self.network, params, seed, lambda: make_topology(self.network, N, M, alpha, seed = seed))
     
-    print 'CSV file written: ', view.map_sync(parallel, range(1))
+    def __call__( self, point ):
+        '''Run the ensemble.
+        
+        point: a dict of the ensemble's parameters
+        returns: a dict of the averaged results'''
+        e = ENSEMBLES[self.model_type](self.topology(), replicas = self.repetitions, **point)
+        
+        start = time.clock()
+        stats = e.dynamics()
+        end = time.clock()
+        
+        # synchronous ensembles don't rewire
+        (time_results, node_results) = stats['peak_infection']
+        return self.record(e.p_infect, 0.0, e.p_recover, start, end, time_results, node_results, stats['r_infinity'])
+
+
+# In[3]:
+
+def write_header( model_type ):
+    '''Start the results file of a sweep with a header row, where the
+    simulations will append their results.
+    
+    model_type: the model, used for the filename
+    returns: the string 'done' '''
+    filename = model_type + '_results.csv'
+    with open(filename, 'wb') as csvfile:
+        writer = csv.writer(csvfile, delimiter=',',quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(['nodes'] + ['p_infect'] + ['p_rewire'] + ['p_recover'] + ['repetitions'] + 
+                        ['start_time'] + ['end_time'] + ['avg_time_data'] + ['avg_node_data'] + ['r_infinity'])
+    
+    return 'done'
+
+
+# In[4]:
+
+def blob_runner( reps = 1, timelim = 10000, numnodes = 5000, seed = 3, startinfected = 0.01, pinf_min = 0.00, pinf_max = 0.02, 
+                pinf_num = 10, prew_min = 0.00, prew_max = 0.00, prew_num = 10, prec_min = 0.00, prec_max = 0.00, 
+                prec_num = 10, set_alpha = 2, model_type = 'BASE', executor = None, topologies = 0, cache = None,
+                network = 'barabasi_albert'):
+    '''Run a sweep of simulations over a grid of parameters.
+    
+    executor: the Executor to run the simulations with (defaults to a
+    ProcessPoolExecutor using all the local cores; use IPythonExecutor
+    for the blob cluster or SerialExecutor to run in this process)
+    topologies: the number of networks to build once and publish into
+    shared memory for all the simulations to use, with the compact backend
+    (defaults to 0, building a new network for every repetition). The
+    shared memory is local, so this can't be used with a cluster
+    cache: a TopologyCache to load the networks from, so that the same
+    networks are used by every sweep and only built once (defaults to None)
+    network: the kind of network, one of NETWORKS, with seed as its degree
+    parameter and set_alpha as the power-law exponent of configuration
+    models (defaults to 'barabasi_albert')
+    model_type: the model, or one of the keys of ENSEMBLES to run the
+    repetitions of each point of a synchronous model together as an
+    ensemble on one network, which can't rewire'''
+    if (model_type in ENSEMBLES) and (prew_max > 0):
+        raise ValueError('Synchronous ensembles don\'t rewire (p_rewire must be 0)')
+    
+    # run on the local cores unless told otherwise
+    close_executor = False
+    if executor is None:
+        executor = ProcessPoolExecutor()
+        close_executor = True
+    
+    print 'CSV file written: ', executor.map(write_header, [ model_type ])
     
     # set up simulation parameters
     repetitions = reps
@@ -156,6 +321,14 @@ def blob_runner( reps = 1, timelim = 10000, numnodes = 5000, seed = 3, startinfe
     print 'p_infects: ', p_infects
     print 'p_rewires: ', p_rewires
     print 'p_recovers: ', p_recovers
+    
+    # build and publish the shared networks
+    shared = None
+    backend = 'networkx'
+    if topologies > 0:
+        shared = [ SharedTopology(make_topology(network, N, M, alpha)) for i in xrange(topologies) ]
+    if (shared is not None) or (cache is not None):
+        backend = 'compact'
 
     simulations = []
     
@@ -165,47 +338,54 @@ def blob_runner( reps = 1, timelim = 10000, numnodes = 5000, seed = 3, startinfe
                 
                 if(model_type == 'REWIRE'):
                     simulations.append(SIRStochasticDynamicsRewire(time_limit = time_limit, p_infected = p_infected, 
-                                         p_infect = pi, p_recover = prec, p_rewire = prew))
+                                         p_infect = pi, p_recover = prec, p_rewire = prew, backend = backend))
                 elif(model_type == 'DISCONNECT'):
                     simulations.append(SIRStochasticDynamicsDisconnect(time_limit = time_limit, p_infected = p_infected, 
-                                         p_infect = pi, p_recover = prec, p_rewire = prew))
+                                         p_infect = pi, p_recover = prec, p_rewire = prew, backend = backend))
                 elif(model_type == 'NEIGHBOUR'):
                     simulations.append(SIRStochasticDynamicsRewireNeighbour(time_limit = time_limit, p_infected = p_infected, 
-                                         p_infect = pi, p_recover = prec, p_rewire = prew))
+                                         p_infect = pi, p_recover = prec, p_rewire = prew, backend = backend))
                 elif(model_type == 'DEGREE'):
                     simulations.append(SIRStochasticDynamicsRewireDegree(time_limit = time_limit, p_infected = p_infected, 
-                                         p_infect = pi, p_recover = prec, p_rewire = prew))
+                                         p_infect = pi, p_recover = prec, p_rewire = prew, backend = backend))
+                elif(model_type in ENSEMBLES):
+                    simulations.append(dict(time_limit = time_limit, p_infected = p_infected, 
+                                            p_infect = pi, p_recover = prec))
                     
     
    
-    sim = make_simulation(N, M, desc = '', repetitions = repetitions, model_type = model_type)
+    if model_type in ENSEMBLES:
+        sim = make_ensemble_simulation(N, M, desc = '', repetitions = repetitions, model_type = model_type, topologies = shared,
+                                       cache = cache, network = network, alpha = alpha)
+    else:
+        sim = make_simulation(N, M, desc = '', repetitions = repetitions, model_type = model_type, topologies = shared, cache = cache,
+                              network = network, alpha = alpha)
     
     print 'Beginning simulations...'
     
-    rc = view.map_async(sim, simulations)
-    
-    # wait for simulations to complete
-    #rc.wait()
-    
-    elapsed = 0
-    while True:
-        msgset = set(rc.msg_ids)
-        completed = len(msgset.difference(cluster.outstanding))
-        pending = len(msgset.intersection(cluster.outstanding))
-        print 'After %d secs: %d complete, %d outstanding' % (elapsed, completed, pending)
-        if rc.ready():
-            break
-        time.sleep(60)
-        elapsed += 60
+    # collect the results as they complete
+    results = [ None ] * len(simulations)
+    completed = 0
+    try:
+        for (i, r) in executor.imap_unordered(sim, simulations):
+            results[i] = r
+            completed += 1
+            print '%d complete, %d outstanding' % (completed, len(simulations) - completed)
+    finally:
+        if close_executor:
+            executor.close()
+        if shared is not None:
+            for t in shared:
+                t.unlink()
     
     # Write the results to a csv file locally and on the server
     filename = '.\\output\\' + model_type + '_results.csv'
 
     with open(filename, 'wb') as csvfile:
         awriter = csv.writer(csvfile, delimiter=',',quotechar='|', quoting=csv.QUOTE_MINIMAL)
-        awriter.writerow(rc.result[0].keys())
-        for i in xrange(0,len(rc.result)):
-            awriter.writerow(rc.result[i].values())
+        awriter.writerow(results[0].keys())
+        for i in xrange(0,len(results)):
+            awriter.writerow(results[i].values())
     
     print 'Simulations complete'
     
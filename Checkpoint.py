@@ -0,0 +1,74 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import os
+import pickle
+import tempfile
+
+# snapshots of the state of a simulation
+from Snapshot import *
+
+
+# In[2]:
+
+class Checkpoint(object):
+    '''The complete state of a simulation part-way through a run, from
+    which the run can be continued exactly, even in another process. A
+    checkpoint holds a Snapshot of the network, the states, the occupied
+    edges, the clock and the model's indexes, together with the state of
+    the engine: the random number stream, the timeline and outbreaks so
+    far, the stopping criterion, the rates of the transition channels,
+    and any state particular to the engine.
+
+    Checkpoints are written as binary pickles, in which the arrays of the
+    snapshot are stored directly. A checkpoint is written to a temporary
+    file that is then renamed over the old one, so a run that is killed
+    while writing a checkpoint leaves the previous one intact.'''
+
+    # changed whenever the format changes, to refuse older checkpoints
+    VERSION = 1
+
+    def __init__( self, snapshot, engine ):
+        '''Create a checkpoint. Checkpoints are usually taken by the
+        simulation rather than created directly.
+
+        snapshot: the Snapshot
+        engine: a dict of the state of the engine'''
+        self._snapshot = snapshot
+        self._engine = engine
+
+    def snapshot( self ):
+        '''Return the snapshot.'''
+        return self._snapshot
+
+    def engine( self ):
+        '''Return the dict of the state of the engine.'''
+        return self._engine
+
+    def save( self, filename ):
+        '''Write the checkpoint to a file, replacing any previous checkpoint.
+
+        filename: the file'''
+        directory = os.path.dirname(os.path.abspath(filename))
+        (fd, temporary) = tempfile.mkstemp(prefix = '.checkpoint-', dir = directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((self.VERSION, self._snapshot, self._engine), f, pickle.HIGHEST_PROTOCOL)
+            os.rename(temporary, filename)
+        except:
+            os.remove(temporary)
+            raise
+
+    @classmethod
+    def load( cls, filename ):
+        '''Read a checkpoint from a file.
+
+        filename: the file
+        returns: the checkpoint'''
+        with open(filename, 'rb') as f:
+            (version, snapshot, engine) = pickle.load(f)
+        if version != cls.VERSION:
+            raise ValueError('Checkpoint {f} has version {v}, not {w}'.format(f = filename, v = version, w = cls.VERSION))
+        return cls(snapshot, engine)
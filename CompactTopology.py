@@ -0,0 +1,1078 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import numpy
+import networkx
+import array
+import os
+import pickle
+
+
+# In[2]:
+
+class CompactTopology(object):
+    '''An array-backed undirected network in compressed sparse row (CSR)
+    form. Nodes are relabelled to the integers 0 to N - 1; the neighbours
+    of node i are held, sorted, in neighbours[offsets[i]:offsets[i + 1]],
+    so each edge costs two int32 entries rather than the nested dicts of
+    a networkx graph. The original node labels are kept in a relabelling
+    map. A topology is never changed by a simulation, so it can be shared
+    between any number of them: the dynamical state of each simulation is
+    held in the CompactNodes and CompactAdjacency views over it.'''
+
+    def __init__( self, graph = None ):
+        '''Create a topology, optionally from the nodes and edges of
+        a networkx graph. Self-loops are dropped.
+
+        graph: the graph (optional)'''
+        if graph is None:
+            self._set_arrays(numpy.zeros(1, dtype = numpy.int32), numpy.zeros(0, dtype = numpy.int32))
+        else:
+            labels = graph.nodes()
+            n = len(labels)
+            if sorted(labels) == range(n):
+                # already labelled 0 to N - 1, so no relabelling is needed
+                labels = None
+                us = numpy.fromiter((u for (u, v) in graph.edges_iter()), dtype = numpy.int64)
+                vs = numpy.fromiter((v for (u, v) in graph.edges_iter()), dtype = numpy.int64)
+            else:
+                index = dict([ (l, i) for (i, l) in enumerate(labels) ])
+                us = numpy.fromiter((index[u] for (u, v) in graph.edges_iter()), dtype = numpy.int64)
+                vs = numpy.fromiter((index[v] for (u, v) in graph.edges_iter()), dtype = numpy.int64)
+            self._build(n, us, vs)
+            self._set_labels(labels)
+
+    @classmethod
+    def from_edges( cls, n, us, vs, labels = None ):
+        '''Create a topology directly from arrays of edge endpoints, without
+        building a networkx graph first. Self-loops and repeated edges are dropped.
+
+        n: the number of nodes
+        us: the first endpoint of each edge, in 0 to n - 1
+        vs: the second endpoint of each edge, in 0 to n - 1
+        labels: the original label of each node (optional, defaults to 0 to n - 1)
+        returns: the topology'''
+        topology = cls()
+        topology._build(n, numpy.asarray(us, dtype = numpy.int64), numpy.asarray(vs, dtype = numpy.int64))
+        topology._set_labels(labels)
+        return topology
+
+    @classmethod
+    def from_arrays( cls, offsets, neighbours, labels = None, edge_ids = None ):
+        '''Create a topology around existing CSR arrays, without copying
+        them, for example arrays mapped read-only from shared memory.
+
+        offsets: the row offsets
+        neighbours: the sorted neighbours of each row
+        labels: the original label of each node (optional, defaults to 0 to n - 1)
+        edge_ids: the edge number of each slot (optional, worked out when needed)
+        returns: the topology'''
+        topology = cls()
+        topology._set_arrays(offsets, neighbours)
+        topology._set_labels(labels)
+        topology._edge_ids = edge_ids
+        return topology
+
+    @classmethod
+    def load( cls, directory, mmap_mode = 'r' ):
+        '''Load a topology saved by save(), by default mapping the arrays
+        read-only into memory rather than reading them.
+
+        directory: the directory
+        mmap_mode: how to map the arrays, as for numpy.load (defaults to 'r', or None to read them)
+        returns: the topology'''
+        labels = None
+        if os.path.exists(os.path.join(directory, 'labels.pkl')):
+            with open(os.path.join(directory, 'labels.pkl'), 'rb') as f:
+                labels = pickle.load(f)
+        return cls.from_arrays(numpy.load(os.path.join(directory, 'offsets.npy'), mmap_mode = mmap_mode),
+                               numpy.load(os.path.join(directory, 'neighbours.npy'), mmap_mode = mmap_mode),
+                               labels,
+                               numpy.load(os.path.join(directory, 'edges.npy'), mmap_mode = mmap_mode))
+
+    def save( self, directory ):
+        '''Save the topology as .npy files of the CSR arrays and the edge
+        numbers, which can be mapped into memory by load(), with the labels
+        pickled alongside if there are any.
+
+        directory: the directory, which must exist'''
+        numpy.save(os.path.join(directory, 'offsets.npy'), self._offsets)
+        numpy.save(os.path.join(directory, 'neighbours.npy'), self._neighbours)
+        numpy.save(os.path.join(directory, 'edges.npy'), self.edge_ids())
+        if self._labels is not None:
+            with open(os.path.join(directory, 'labels.pkl'), 'wb') as f:
+                pickle.dump(self._labels, f, 2)
+
+    def __getstate__( self ):
+        '''Pickle the arrays and labels, but not the lookups worked out from them.'''
+        return (self._offsets, self._neighbours, self._labels)
+
+    def __setstate__( self, state ):
+        (offsets, neighbours, labels) = state
+        self._set_arrays(offsets, neighbours)
+        self._set_labels(labels)
+
+    def _build( self, n, us, vs ):
+        '''Build the CSR arrays from arrays of edge endpoints.'''
+        # store each edge in both directions, without self-loops
+        keep = (us != vs)
+        (us, vs) = (us[keep], vs[keep])
+        heads = numpy.concatenate((us, vs))
+        tails = numpy.concatenate((vs, us))
+
+        # sort by node and then by neighbour, as a single key, and drop repeats
+        keys = numpy.unique(heads * n + tails)
+        (heads, tails) = numpy.divmod(keys, n)
+
+        offsets = numpy.zeros(n + 1, dtype = numpy.int32)
+        numpy.cumsum(numpy.bincount(heads, minlength = n), out = offsets[1:])
+        self._set_arrays(offsets, tails.astype(numpy.int32))
+
+    def _set_arrays( self, offsets, neighbours ):
+        '''Install the CSR arrays.'''
+        self._offsets = offsets
+        self._neighbours = neighbours
+        self._labels = None
+        self._index = None
+        self._keys = None
+        self._edge_ids = None
+
+    def _set_labels( self, labels ):
+        '''Install the relabelling map, or None if the labels are 0 to N - 1.'''
+        if labels is not None:
+            labels = list(labels)
+            self._index = dict([ (l, i) for (i, l) in enumerate(labels) ])
+        self._labels = labels
+
+    def order( self ):
+        '''Return the number of nodes.'''
+        return len(self._offsets) - 1
+
+    def size( self ):
+        '''Return the number of edges.'''
+        return len(self._neighbours) // 2
+
+    def offsets( self ):
+        '''Return the array of row offsets.'''
+        return self._offsets
+
+    def neighbour_array( self ):
+        '''Return the array of neighbours.'''
+        return self._neighbours
+
+    def edge_ids( self ):
+        '''Return an array numbering the undirected edges 0 to E - 1, giving
+        the number of the edge in each slot, so that both directions of an
+        edge have the same number. This is worked out the first time it's needed.'''
+        if self._edge_ids is None:
+            heads = numpy.repeat(numpy.arange(self.order(), dtype = numpy.int64), numpy.diff(self._offsets))
+            forward = (heads < self._neighbours)
+            ids = numpy.zeros(len(self._neighbours), dtype = numpy.int32)
+            ids[forward] = numpy.arange(int(forward.sum()), dtype = numpy.int32)
+            backward = numpy.flatnonzero(~forward)
+            ids[backward] = ids[self.reverse_slots(backward)]
+            self._edge_ids = ids
+        return self._edge_ids
+
+    def is_shared( self ):
+        '''Test whether the topology's arrays are read-only, as when they're
+        mapped from shared memory, in which case simulations that change
+        the edges have to lay their changes over the arrays.'''
+        return not self._neighbours.flags.writeable
+
+    def degree( self, i ):
+        '''Return the degree of a node.
+
+        i: the node'''
+        return int(self._offsets[i + 1] - self._offsets[i])
+
+    def neighbours( self, i ):
+        '''Return a list of the neighbours of a node.
+
+        i: the node'''
+        return self._neighbours[self._offsets[i]:self._offsets[i + 1]].tolist()
+
+    def slot( self, i, j ):
+        '''Return the position of j in the neighbours of i, or -1
+        if they aren't adjacent.
+
+        i: the node
+        j: the neighbour'''
+        start = self._offsets[i]
+        end = self._offsets[i + 1]
+        k = start + int(numpy.searchsorted(self._neighbours[start:end], j))
+        if (k < end) and (self._neighbours[k] == j):
+            return k
+        return -1
+
+    def reverse_slots( self, slots ):
+        '''Return the slots holding the reverse of the edges in an array
+        of slots. This searches the edges as one sorted array of keys,
+        which is built the first time it's needed.
+
+        slots: the slots
+        returns: an array of the reverse slots'''
+        if self._keys is None:
+            n = self.order()
+            heads = numpy.repeat(numpy.arange(n, dtype = numpy.int64), numpy.diff(self._offsets))
+            self._keys = heads * n + self._neighbours
+        n = self.order()
+        heads = numpy.searchsorted(self._offsets, slots, side = 'right') - 1
+        return numpy.searchsorted(self._keys, self._neighbours[slots].astype(numpy.int64) * n + heads)
+
+    def label( self, i ):
+        '''Return the original label of a node.
+
+        i: the node'''
+        if self._labels is None:
+            return i
+        return self._labels[i]
+
+    def index( self, l ):
+        '''Return the node with a given original label.
+
+        l: the label'''
+        if self._index is None:
+            return l
+        return self._index[l]
+
+    def to_networkx( self ):
+        '''Return the topology as a networkx graph with the original labels.'''
+        g = networkx.Graph()
+        labels = [ self.label(i) for i in xrange(self.order()) ]
+        g.add_nodes_from(labels)
+        heads = numpy.repeat(numpy.arange(self.order()), numpy.diff(self._offsets))
+        forward = (heads < self._neighbours)
+        g.add_edges_from([ (labels[i], labels[j]) for (i, j) in zip(heads[forward].tolist(), self._neighbours[forward].tolist()) ])
+        return g
+
+
+class CompactNodes(object):
+    '''The node map of a network on a CompactTopology, with each node's
+    dynamical state held as an index into the list of states in an int8
+    array (-1 meaning no state). Behaves like the node attribute dict
+    of a networkx graph, with only the state as an attribute. The array
+    is a Python array rather than a numpy one as it's read and written
+    one element at a time, which is much quicker; state_array() gives a
+    numpy view of it.'''
+
+    def __init__( self, topology, states, key ):
+        '''topology: the topology
+        states: the list of states
+        key: the name of the state attribute'''
+        self._n = topology.order()
+        self._states = list(states)
+        self._codes = dict([ (s, i) for (i, s) in enumerate(self._states) ])
+        self._key = key
+        self._state = array.array('b', [ -1 ]) * self._n
+
+    def __len__( self ):
+        return self._n
+
+    def __iter__( self ):
+        return iter(xrange(self._n))
+
+    def __contains__( self, n ):
+        return isinstance(n, (int, long, numpy.integer)) and (0 <= n < self._n)
+
+    def __getitem__( self, n ):
+        if not self.__contains__(n):
+            raise KeyError(n)
+        return CompactNodeData(self, n)
+
+    def keys( self ):
+        return range(self._n)
+
+    def items( self ):
+        return [ (n, CompactNodeData(self, n)) for n in xrange(self._n) ]
+
+    def states( self ):
+        '''Return the list of states, in the order of their indices.'''
+        return list(self._states)
+
+    def state_array( self ):
+        '''Return a numpy int8 view of the state indices.'''
+        return numpy.frombuffer(self._state, dtype = numpy.int8)
+
+
+class CompactNodeData(object):
+    '''The attribute dict of a single node in CompactNodes.'''
+
+    __slots__ = [ '_nodes', '_n' ]
+
+    def __init__( self, nodes, n ):
+        self._nodes = nodes
+        self._n = n
+
+    def __getitem__( self, key ):
+        nodes = self._nodes
+        if key != nodes._key:
+            raise KeyError(key)
+        c = nodes._state[self._n]
+        if c < 0:
+            raise KeyError(key)
+        return nodes._states[c]
+
+    def __setitem__( self, key, value ):
+        nodes = self._nodes
+        if key != nodes._key:
+            raise KeyError(key)
+        nodes._state[self._n] = nodes._codes[value]
+
+    def __contains__( self, key ):
+        return (key == self._nodes._key) and (self._nodes._state[self._n] >= 0)
+
+    def get( self, key, default = None ):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys( self ):
+        return [ k for k in [ self._nodes._key ] if k in self ]
+
+
+class CompactAdjacency(object):
+    '''The adjacency map of a network on a CompactTopology, with a bitset
+    over the edge slots recording which edges are occupied. Behaves like
+    the adjacency dict of a networkx graph. The topology is shared, so
+    adding or removing edges isn't supported. As with the states, the
+    bitset is held in a bytearray for quick access to single bits.'''
+
+    def __init__( self, topology, key ):
+        '''topology: the topology
+        key: the name of the occupied attribute'''
+        self._topology = topology
+        self._offsets = topology.offsets()
+        self._neighbours = topology.neighbour_array()
+        self._n = topology.order()
+        self._key = key
+        self._occupied = bytearray((len(self._neighbours) + 7) // 8)
+
+    def __len__( self ):
+        return self._n
+
+    def __iter__( self ):
+        return iter(xrange(self._n))
+
+    def __contains__( self, n ):
+        return isinstance(n, (int, long, numpy.integer)) and (0 <= n < self._n)
+
+    def __getitem__( self, n ):
+        if not self.__contains__(n):
+            raise KeyError(n)
+        return CompactNeighbours(self, n)
+
+    def __delitem__( self, n ):
+        raise TypeError('A compact topology cannot be changed')
+
+    def keys( self ):
+        return range(self._n)
+
+    def items( self ):
+        return ( (n, CompactNeighbours(self, n)) for n in xrange(self._n) )
+
+    def neighbour( self, n, i ):
+        '''Return the i'th neighbour of a node, without listing them.
+
+        n: the node
+        i: the position of the neighbour, less than the node's degree'''
+        return int(self._neighbours[self._offsets[n] + i])
+
+    def is_occupied( self, k ):
+        '''Test whether the edge in a slot is occupied.
+
+        k: the slot'''
+        return (self._occupied[k >> 3] & (1 << (k & 7))) != 0
+
+    def set_occupied( self, n, k, occupied ):
+        '''Mark the edge in a slot, and its reverse, as occupied or not.
+
+        n: the node whose neighbours include the slot
+        k: the slot'''
+        # both directions are always marked alike, so if this one is already
+        # right there's no need to look up the reverse slot
+        if self.is_occupied(k) == bool(occupied):
+            return
+        m = int(self._neighbours[k])
+        for s in (k, self._topology.slot(m, n)):
+            if occupied:
+                self._occupied[s >> 3] |= (1 << (s & 7))
+            else:
+                self._occupied[s >> 3] &= ~(1 << (s & 7)) & 0xff
+
+    def occupy_slots( self, slots ):
+        '''Mark the edges in an array of slots, and their reverses, as
+        occupied, all at once.
+
+        slots: the slots'''
+        if len(slots) == 0:
+            return
+        slots = numpy.concatenate((slots, self._topology.reverse_slots(slots)))
+        bits = self.occupied_array()
+        numpy.bitwise_or.at(bits, slots >> 3, (1 << (slots & 7)).astype(numpy.uint8))
+
+    def occupied_array( self ):
+        '''Return a numpy uint8 view of the occupied bitset.'''
+        return numpy.frombuffer(self._occupied, dtype = numpy.uint8)
+
+
+class CompactNeighbours(object):
+    '''The neighbour dict of a single node in CompactAdjacency.'''
+
+    __slots__ = [ '_adj', '_n' ]
+
+    def __init__( self, adj, n ):
+        self._adj = adj
+        self._n = n
+
+    def __len__( self ):
+        adj = self._adj
+        return int(adj._offsets[self._n + 1] - adj._offsets[self._n])
+
+    def __iter__( self ):
+        adj = self._adj
+        return iter(adj._neighbours[adj._offsets[self._n]:adj._offsets[self._n + 1]].tolist())
+
+    def __contains__( self, m ):
+        return self._adj._topology.slot(self._n, m) >= 0
+
+    def __getitem__( self, m ):
+        k = self._adj._topology.slot(self._n, m)
+        if k < 0:
+            raise KeyError(m)
+        return CompactEdgeData(self._adj, self._n, k)
+
+    def __setitem__( self, m, data ):
+        raise TypeError('A compact topology cannot be changed')
+
+    def __delitem__( self, m ):
+        raise TypeError('A compact topology cannot be changed')
+
+    def keys( self ):
+        return list(self)
+
+    def items( self ):
+        adj = self._adj
+        start = int(adj._offsets[self._n])
+        ms = adj._neighbours[start:adj._offsets[self._n + 1]].tolist()
+        return [ (m, CompactEdgeData(adj, self._n, start + i)) for (i, m) in enumerate(ms) ]
+
+
+class CompactEdgeData(object):
+    '''The attribute dict of a single edge in CompactAdjacency,
+    DynamicAdjacency or OverlayAdjacency, with only the occupied flag as
+    an attribute. The edge is identified by its slot in a CompactAdjacency,
+    and by its edge id in the others.'''
+
+    __slots__ = [ '_adj', '_n', '_k' ]
+
+    def __init__( self, adj, n, k ):
+        self._adj = adj
+        self._n = n
+        self._k = k
+
+    def __getitem__( self, key ):
+        if key != self._adj._key:
+            raise KeyError(key)
+        return self._adj.is_occupied(self._k)
+
+    def __setitem__( self, key, value ):
+        if key != self._adj._key:
+            raise KeyError(key)
+        self._adj.set_occupied(self._n, self._k, value)
+
+    def __contains__( self, key ):
+        return key == self._adj._key
+
+    def get( self, key, default = None ):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys( self ):
+        return [ self._adj._key ]
+
+    def update( self, data ):
+        for key in data.keys():
+            self[key] = data[key]
+
+
+class DynamicAdjacency(object):
+    '''A mutable adjacency map for networks on a CompactTopology whose
+    edges are changed by the dynamics, such as the rewiring and disconnect
+    models. Each simulation takes its own copy of the topology, laid out
+    in rows like the CSR arrays but with some slack slots at the end of
+    each node's row, so edges are added and removed in O(1) amortised
+    time (after finding the neighbour in its row) without any allocation:
+
+    - removing an edge moves the last neighbour in the row into its slot
+    - adding an edge uses a slack slot, or if the row is full moves the row
+      to a block twice the size, taken from a free-list of blocks left by
+      earlier moves or else added at the end of the arrays
+    - once more than half the slots are in abandoned blocks, all the rows
+      are laid out again without gaps
+
+    A neighbour is found in a short row by searching it, and in the row of
+    a hub, with more than HUB_DEGREE neighbours, through a map from each
+    neighbour to its position in the row, so finding a neighbour never
+    takes more than O(HUB_DEGREE). Positions are kept relative to the
+    start of the row, so the maps survive rows being moved.
+
+    As slots move, each undirected edge has an id that stays fixed while
+    the edge exists, which is what the edge attribute dicts refer to and
+    what the occupied bitset is indexed by. The ids of removed edges are
+    kept in a free-list for reuse. Behaves like the adjacency dict of a
+    networkx graph, so add_edge() and remove_edges_from() work as usual.'''
+
+    # spare slots given to each row when the rows are laid out, as a fraction
+    # of the node's degree, and at least MIN_SLACK of them
+    SLACK = 0.25
+    MIN_SLACK = 2
+    
+    # rows with more neighbours than this keep a map of their positions,
+    # which is dropped once they shrink to half the size
+    HUB_DEGREE = 32
+
+    def __init__( self, topology, key, neighbours = None ):
+        '''topology: the topology
+        key: the name of the occupied attribute
+        neighbours: the neighbours of each node in the order to lay them
+        out, in the rows of the topology (defaults to the topology's sorted order)'''
+        self._n = topology.order()
+        self._key = key
+        if neighbours is None:
+            neighbours = topology.neighbour_array()
+
+        # number the undirected edges, giving both directions the same id
+        offsets = topology.offsets()
+        degrees = numpy.diff(offsets).astype(numpy.int64)
+        heads = numpy.repeat(numpy.arange(self._n, dtype = numpy.int64), degrees)
+        tails = numpy.asarray(neighbours).astype(numpy.int64)
+        keys = numpy.minimum(heads, tails) * self._n + numpy.maximum(heads, tails)
+        (_, ids) = numpy.unique(keys, return_inverse = True)
+        self._layout(degrees, tails, ids)
+
+        # the edge ids in use, with the number of directions present for each
+        self._edges = len(tails) // 2
+        self._halves = bytearray([ 2 ]) * self._edges
+        self._free_edges = []
+        self._occupied = bytearray((self._edges + 7) // 8)
+
+    def _layout( self, degrees, tails, ids ):
+        '''Lay out the rows with their slack from arrays of the degree of
+        each node and the neighbour and edge id of each slot, row by row.'''
+        capacities = degrees + numpy.maximum(self.MIN_SLACK, (degrees * self.SLACK).astype(numpy.int64))
+        starts = numpy.zeros(self._n, dtype = numpy.int64)
+        numpy.cumsum(capacities[:-1], out = starts[1:])
+        total = int(capacities.sum())
+
+        # work out where each slot goes in the new layout
+        firsts = numpy.cumsum(degrees) - degrees
+        heads = numpy.repeat(numpy.arange(self._n, dtype = numpy.int64), degrees)
+        positions = starts[heads] + (numpy.arange(len(tails), dtype = numpy.int64) - firsts[heads])
+        neighbours = numpy.empty(total, dtype = numpy.int32)
+        neighbours.fill(-1)
+        neighbours[positions] = tails
+        edge_ids = numpy.zeros(total, dtype = numpy.int32)
+        edge_ids[positions] = ids
+
+        self._start = self._to_array('l', starts)
+        self._degree = self._to_array('i', degrees)
+        self._capacity = self._to_array('i', capacities)
+        self._neighbours = self._to_array('i', neighbours)
+        self._edge_ids = self._to_array('i', edge_ids)
+
+        # no blocks have been abandoned yet
+        self._free_blocks = dict()
+        self._wasted = 0
+
+        # map the positions of the neighbours of the hubs
+        self._positions = dict()
+        for n in numpy.flatnonzero(degrees > self.HUB_DEGREE).tolist():
+            self._map_row(n)
+
+    def _map_row( self, n ):
+        '''Make the map from the neighbours of a node to their positions in its row.'''
+        s = self._start[n]
+        self._positions[n] = dict([ (m, i) for (i, m) in enumerate(self._neighbours[s:s + self._degree[n]]) ])
+
+    def _to_array( self, typecode, a ):
+        '''Convert a numpy array to a Python array of the given type.'''
+        b = array.array(typecode)
+        b.fromstring(numpy.asarray(a, dtype = numpy.dtype(typecode)).tostring())
+        return b
+
+    def compact( self ):
+        '''Lay out all the rows again, giving each the standard slack and
+        dropping the blocks abandoned when rows were moved.'''
+        starts = numpy.frombuffer(self._start, dtype = numpy.dtype('l')).astype(numpy.int64)
+        degrees = numpy.frombuffer(self._degree, dtype = numpy.int32).astype(numpy.int64)
+        firsts = numpy.cumsum(degrees) - degrees
+        heads = numpy.repeat(numpy.arange(self._n, dtype = numpy.int64), degrees)
+        positions = starts[heads] + (numpy.arange(int(degrees.sum()), dtype = numpy.int64) - firsts[heads])
+        tails = numpy.frombuffer(self._neighbours, dtype = numpy.int32)[positions]
+        ids = numpy.frombuffer(self._edge_ids, dtype = numpy.int32)[positions]
+        self._layout(degrees, tails, ids)
+
+    def slots( self ):
+        '''Return the number of slots allocated, in use or not.'''
+        return len(self._neighbours)
+
+    def __len__( self ):
+        return self._n
+
+    def __iter__( self ):
+        return iter(xrange(self._n))
+
+    def __contains__( self, n ):
+        return isinstance(n, (int, long, numpy.integer)) and (0 <= n < self._n)
+
+    def __getitem__( self, n ):
+        if not self.__contains__(n):
+            raise KeyError(n)
+        return DynamicNeighbours(self, n)
+
+    def __delitem__( self, n ):
+        raise TypeError('Nodes cannot be removed from a compact topology')
+
+    def keys( self ):
+        return range(self._n)
+
+    def items( self ):
+        return ( (n, DynamicNeighbours(self, n)) for n in xrange(self._n) )
+
+    def find( self, n, m ):
+        '''Return the slot of m in the row of n, or -1 if they aren't adjacent.
+
+        n: the node
+        m: the neighbour'''
+        s = self._start[n]
+        positions = self._positions.get(n)
+        if positions is not None:
+            i = positions.get(m)
+            if i is None:
+                return -1
+            return s + i
+        try:
+            return s + self._neighbours[s:s + self._degree[n]].index(m)
+        except ValueError:
+            return -1
+
+    def neighbours( self, n ):
+        '''Return a list of the neighbours of a node.
+
+        n: the node'''
+        s = self._start[n]
+        return self._neighbours[s:s + self._degree[n]].tolist()
+
+    def neighbour( self, n, i ):
+        '''Return the i'th neighbour of a node, without listing them.
+
+        n: the node
+        i: the position of the neighbour, less than the node's degree'''
+        return self._neighbours[self._start[n] + i]
+
+    def add( self, n, m, data ):
+        '''Add m to the neighbours of n, or update the edge's attributes if
+        it's already there. Adding the first direction of an edge gives it
+        a new id, and adding the second gives it the same id.
+
+        n: the node
+        m: the neighbour
+        data: the edge's attribute dict'''
+        k = self.find(n, m)
+        if k < 0:
+            r = self.find(m, n)
+            if r >= 0:
+                e = self._edge_ids[r]
+                self._halves[e] += 1
+            else:
+                e = self._new_edge()
+            if self._degree[n] == self._capacity[n]:
+                self._move_row(n)
+            k = self._start[n] + self._degree[n]
+            self._neighbours[k] = m
+            self._edge_ids[k] = e
+            self._degree[n] += 1
+            positions = self._positions.get(n)
+            if positions is not None:
+                positions[m] = self._degree[n] - 1
+            elif self._degree[n] > self.HUB_DEGREE:
+                self._map_row(n)
+        CompactEdgeData(self, n, self._edge_ids[k]).update(data)
+
+    def remove( self, n, m ):
+        '''Remove m from the neighbours of n. Once both directions of an edge
+        have been removed its id is freed.
+
+        n: the node
+        m: the neighbour'''
+        k = self.find(n, m)
+        if k < 0:
+            raise KeyError(m)
+        e = self._edge_ids[k]
+
+        # move the last neighbour in the row into the gap
+        last = self._start[n] + self._degree[n] - 1
+        moved = self._neighbours[last]
+        self._neighbours[k] = moved
+        self._edge_ids[k] = self._edge_ids[last]
+        self._neighbours[last] = -1
+        self._degree[n] -= 1
+        positions = self._positions.get(n)
+        if positions is not None:
+            del positions[m]
+            if self._degree[n] <= self.HUB_DEGREE // 2:
+                del self._positions[n]
+            elif k != last:
+                positions[moved] = k - self._start[n]
+
+        self._halves[e] -= 1
+        if self._halves[e] == 0:
+            self.set_occupied(n, e, False)
+            self._free_edges.append(e)
+
+    def _new_edge( self ):
+        '''Return a free edge id, with one direction present.'''
+        if len(self._free_edges) > 0:
+            e = self._free_edges.pop()
+        else:
+            e = self._edges
+            self._edges += 1
+            self._halves.append(0)
+            if (e >> 3) == len(self._occupied):
+                self._occupied.append(0)
+        self._halves[e] = 1
+        return e
+
+    def _move_row( self, n ):
+        '''Move a full row to a block twice its size.'''
+        start = self._start[n]
+        degree = self._degree[n]
+        capacity = self._capacity[n]
+        new_capacity = max(2 * capacity, 4)
+
+        # take a block from the free-list, or add one at the end
+        blocks = self._free_blocks.get(new_capacity)
+        if blocks:
+            s = blocks.pop()
+            self._wasted -= new_capacity
+        else:
+            s = len(self._neighbours)
+            self._neighbours.extend(array.array('i', [ -1 ]) * new_capacity)
+            self._edge_ids.extend(array.array('i', [ 0 ]) * new_capacity)
+        self._neighbours[s:s + degree] = self._neighbours[start:start + degree]
+        self._edge_ids[s:s + degree] = self._edge_ids[start:start + degree]
+        self._start[n] = s
+        self._capacity[n] = new_capacity
+
+        # put the old block on the free-list
+        if capacity > 0:
+            self._neighbours[start:start + capacity] = array.array('i', [ -1 ]) * capacity
+            self._free_blocks.setdefault(capacity, []).append(start)
+            self._wasted += capacity
+
+        # lay the rows out again if too much space has been abandoned
+        if 2 * self._wasted > len(self._neighbours):
+            self.compact()
+
+    def is_occupied( self, e ):
+        '''Test whether an edge is occupied.
+
+        e: the edge id'''
+        return (self._occupied[e >> 3] & (1 << (e & 7))) != 0
+
+    def set_occupied( self, n, e, occupied ):
+        '''Mark an edge as occupied or not.
+
+        n: one of the edge's nodes (unused, for compatibility with CompactAdjacency)
+        e: the edge id'''
+        if occupied:
+            self._occupied[e >> 3] |= (1 << (e & 7))
+        else:
+            self._occupied[e >> 3] &= ~(1 << (e & 7)) & 0xff
+
+    def occupied_array( self ):
+        '''Return a numpy uint8 view of the occupied bitset.'''
+        return numpy.frombuffer(self._occupied, dtype = numpy.uint8)
+
+
+class DynamicNeighbours(object):
+    '''The neighbour dict of a single node in DynamicAdjacency.'''
+
+    __slots__ = [ '_adj', '_n' ]
+
+    def __init__( self, adj, n ):
+        self._adj = adj
+        self._n = n
+
+    def __len__( self ):
+        return self._adj._degree[self._n]
+
+    def __iter__( self ):
+        return iter(self._adj.neighbours(self._n))
+
+    def __contains__( self, m ):
+        return self._adj.find(self._n, m) >= 0
+
+    def __getitem__( self, m ):
+        k = self._adj.find(self._n, m)
+        if k < 0:
+            raise KeyError(m)
+        return CompactEdgeData(self._adj, self._n, self._adj._edge_ids[k])
+
+    def get( self, m, default = None ):
+        k = self._adj.find(self._n, m)
+        if k < 0:
+            return default
+        return CompactEdgeData(self._adj, self._n, self._adj._edge_ids[k])
+
+    def __setitem__( self, m, data ):
+        self._adj.add(self._n, m, data)
+
+    def __delitem__( self, m ):
+        self._adj.remove(self._n, m)
+
+    def keys( self ):
+        return list(self)
+
+    def items( self ):
+        adj = self._adj
+        s = adj._start[self._n]
+        d = adj._degree[self._n]
+        return [ (m, CompactEdgeData(adj, self._n, e)) for (m, e) in zip(adj._neighbours[s:s + d], adj._edge_ids[s:s + d]) ]
+
+
+class OverlayAdjacency(object):
+    '''A mutable adjacency map for networks whose edges are changed by the
+    dynamics, laid over a CompactTopology that is shared and can't be
+    written to, such as one mapped from shared memory by several worker
+    processes. Rather than each simulation taking a copy of the whole
+    topology, as DynamicAdjacency does, a node's row is copied into lists
+    the first time it changes, copy-on-write, and the unchanged rows are
+    read from the shared arrays. This suits dynamics that change a small
+    part of the network.
+
+    Edges in the topology keep the numbers given by its edge_ids(), and
+    added edges are numbered from E upwards; both directions of an edge
+    have the same number, which is what the occupied bitset is indexed by.
+    Behaves like the adjacency dict of a networkx graph, so add_edge() and
+    remove_edges_from() work as usual.'''
+
+    def __init__( self, topology, key ):
+        '''topology: the topology
+        key: the name of the occupied attribute'''
+        self._topology = topology
+        self._offsets = topology.offsets()
+        self._neighbours = topology.neighbour_array()
+        self._edge_ids = topology.edge_ids()
+        self._n = topology.order()
+        self._key = key
+
+        # the rows that have been changed, as lists of neighbours and edge ids
+        self._rows = dict()
+        self._edges = topology.size()
+        self._occupied = bytearray((self._edges + 7) // 8)
+
+    def overlaid( self ):
+        '''Return the number of rows that have been copied.'''
+        return len(self._rows)
+
+    def __len__( self ):
+        return self._n
+
+    def __iter__( self ):
+        return iter(xrange(self._n))
+
+    def __contains__( self, n ):
+        return isinstance(n, (int, long, numpy.integer)) and (0 <= n < self._n)
+
+    def __getitem__( self, n ):
+        if not self.__contains__(n):
+            raise KeyError(n)
+        return OverlayNeighbours(self, n)
+
+    def __delitem__( self, n ):
+        raise TypeError('Nodes cannot be removed from a compact topology')
+
+    def keys( self ):
+        return range(self._n)
+
+    def items( self ):
+        return ( (n, OverlayNeighbours(self, n)) for n in xrange(self._n) )
+
+    def degree( self, n ):
+        '''Return the degree of a node.
+
+        n: the node'''
+        row = self._rows.get(n)
+        if row is not None:
+            return len(row[0])
+        return int(self._offsets[n + 1] - self._offsets[n])
+
+    def find( self, n, m ):
+        '''Return the id of the edge between n and m, or -1 if m isn't
+        among the neighbours of n.
+
+        n: the node
+        m: the neighbour'''
+        row = self._rows.get(n)
+        if row is not None:
+            try:
+                return row[1][row[0].index(m)]
+            except ValueError:
+                return -1
+        k = self._topology.slot(n, m)
+        if k < 0:
+            return -1
+        return int(self._edge_ids[k])
+
+    def neighbours( self, n ):
+        '''Return a list of the neighbours of a node.
+
+        n: the node'''
+        row = self._rows.get(n)
+        if row is not None:
+            return list(row[0])
+        return self._neighbours[self._offsets[n]:self._offsets[n + 1]].tolist()
+
+    def neighbour( self, n, i ):
+        '''Return the i'th neighbour of a node, without listing them.
+
+        n: the node
+        i: the position of the neighbour, less than the node's degree'''
+        row = self._rows.get(n)
+        if row is not None:
+            return row[0][i]
+        return int(self._neighbours[self._offsets[n] + i])
+
+    def edges( self, n ):
+        '''Return a list of (neighbour, edge id) pairs for a node.
+
+        n: the node'''
+        row = self._rows.get(n)
+        if row is not None:
+            return zip(row[0], row[1])
+        (s, e) = (self._offsets[n], self._offsets[n + 1])
+        return zip(self._neighbours[s:e].tolist(), self._edge_ids[s:e].tolist())
+
+    def _copy_row( self, n ):
+        '''Return the private copy of a node's row, making it if needed.'''
+        row = self._rows.get(n)
+        if row is None:
+            (s, e) = (self._offsets[n], self._offsets[n + 1])
+            row = (self._neighbours[s:e].tolist(), self._edge_ids[s:e].tolist())
+            self._rows[n] = row
+        return row
+
+    def add( self, n, m, data ):
+        '''Add m to the neighbours of n, or update the edge's attributes if
+        it's already there. Adding the first direction of an edge gives it
+        a new id, and adding the second gives it the same id.
+
+        n: the node
+        m: the neighbour
+        data: the edge's attribute dict'''
+        e = self.find(n, m)
+        if e < 0:
+            e = self.find(m, n)
+            if e < 0:
+                e = self._new_edge()
+            (ns, es) = self._copy_row(n)
+            ns.append(m)
+            es.append(e)
+        CompactEdgeData(self, n, e).update(data)
+
+    def remove( self, n, m ):
+        '''Remove m from the neighbours of n. Once both directions of an edge
+        have been removed it's marked unoccupied, and its id isn't used again.
+
+        n: the node
+        m: the neighbour'''
+        if self.find(n, m) < 0:
+            raise KeyError(m)
+        (ns, es) = self._copy_row(n)
+        i = ns.index(m)
+        e = es[i]
+
+        # move the last neighbour in the row into the gap
+        ns[i] = ns[-1]
+        es[i] = es[-1]
+        ns.pop()
+        es.pop()
+
+        if self.find(m, n) < 0:
+            self.set_occupied(n, e, False)
+
+    def _new_edge( self ):
+        '''Return an unused edge id.'''
+        e = self._edges
+        self._edges += 1
+        if (e >> 3) == len(self._occupied):
+            self._occupied.append(0)
+        return e
+
+    def is_occupied( self, e ):
+        '''Test whether an edge is occupied.
+
+        e: the edge id'''
+        return (self._occupied[e >> 3] & (1 << (e & 7))) != 0
+
+    def set_occupied( self, n, e, occupied ):
+        '''Mark an edge as occupied or not.
+
+        n: one of the edge's nodes (unused, for compatibility with CompactAdjacency)
+        e: the edge id'''
+        if occupied:
+            self._occupied[e >> 3] |= (1 << (e & 7))
+        else:
+            self._occupied[e >> 3] &= ~(1 << (e & 7)) & 0xff
+
+    def occupied_array( self ):
+        '''Return a numpy uint8 view of the occupied bitset.'''
+        return numpy.frombuffer(self._occupied, dtype = numpy.uint8)
+
+
+class OverlayNeighbours(object):
+    '''The neighbour dict of a single node in OverlayAdjacency.'''
+
+    __slots__ = [ '_adj', '_n' ]
+
+    def __init__( self, adj, n ):
+        self._adj = adj
+        self._n = n
+
+    def __len__( self ):
+        return self._adj.degree(self._n)
+
+    def __iter__( self ):
+        return iter(self._adj.neighbours(self._n))
+
+    def __contains__( self, m ):
+        return self._adj.find(self._n, m) >= 0
+
+    def __getitem__( self, m ):
+        e = self._adj.find(self._n, m)
+        if e < 0:
+            raise KeyError(m)
+        return CompactEdgeData(self._adj, self._n, e)
+
+    def get( self, m, default = None ):
+        e = self._adj.find(self._n, m)
+        if e < 0:
+            return default
+        return CompactEdgeData(self._adj, self._n, e)
+
+    def __setitem__( self, m, data ):
+        self._adj.add(self._n, m, data)
+
+    def __delitem__( self, m ):
+        self._adj.remove(self._n, m)
+
+    def keys( self ):
+        return list(self)
+
+    def items( self ):
+        return [ (m, CompactEdgeData(self._adj, self._n, e)) for (m, e) in self._adj.edges(self._n) ]
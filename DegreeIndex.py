@@ -0,0 +1,167 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import bisect
+from PopulationSet import *
+
+
+# In[2]:
+
+class DegreeIndex(object):
+    '''An index of nodes by dynamical state and degree. For each state the
+    nodes are held in a PopulationSet per degree, with a sorted list of the
+    degrees that have any nodes, so a node of a given state whose degree is
+    nearest some target can be found by searching outwards from the target,
+    rather than by looking at every node. The index has to be told whenever
+    a node changes state or gains or loses an edge.'''
+
+    def __init__( self ):
+        '''Create an empty index.'''
+        # state -> degree -> nodes
+        self._buckets = dict()
+        # state -> sorted list of degrees with nodes
+        self._degrees = dict()
+        # the state and degree of each node
+        self._state = dict()
+        self._degree = dict()
+
+    def __len__( self ):
+        return len(self._state)
+
+    def __contains__( self, n ):
+        return n in self._state
+
+    def state( self, n ):
+        '''Return the state a node is indexed under.'''
+        return self._state[n]
+
+    def degree( self, n ):
+        '''Return the degree a node is indexed under.'''
+        return self._degree[n]
+
+    def add( self, n, state, degree ):
+        '''Add a node to the index.
+
+        n: the node
+        state: its state
+        degree: its degree'''
+        self._state[n] = state
+        self._degree[n] = degree
+        self._bucket_add(n, state, degree)
+
+    def remove( self, n ):
+        '''Remove a node from the index.
+
+        n: the node'''
+        self._bucket_remove(n, self._state.pop(n), self._degree.pop(n))
+
+    def set_state( self, n, state ):
+        '''Move a node to a new state.
+
+        n: the node
+        state: the new state'''
+        self._bucket_remove(n, self._state[n], self._degree[n])
+        self._state[n] = state
+        self._bucket_add(n, state, self._degree[n])
+
+    def change_degree( self, n, delta ):
+        '''Change the degree of a node, typically by one as an edge is
+        added or removed.
+
+        n: the node
+        delta: the change in degree'''
+        self._bucket_remove(n, self._state[n], self._degree[n])
+        self._degree[n] += delta
+        self._bucket_add(n, self._state[n], self._degree[n])
+
+    def nearest( self, target, states, exclude, rng ):
+        '''Choose a node uniformly at random from those in the given states
+        whose degree is nearest the target, ignoring some excluded nodes.
+        The buckets are visited outwards from the target degree, taking
+        O(log D) to start the search and O(k) to account for k excluded nodes.
+
+        target: the target degree
+        states: the states to choose from
+        exclude: the nodes that mustn't be chosen
+        rng: the random stream
+        returns: the node, or None if there are no suitable nodes'''
+        exclude = set(exclude)
+
+        # for each state, the positions of the next degrees below and above the target
+        searches = []
+        for s in states:
+            degrees = self._degrees.get(s, [])
+            hi = bisect.bisect_left(degrees, target)
+            searches.append([ s, degrees, hi - 1, hi ])
+
+        while True:
+            # find the distance of the nearest degrees not yet looked at
+            d = None
+            for (s, degrees, lo, hi) in searches:
+                if (lo >= 0) and ((d is None) or (target - degrees[lo] < d)):
+                    d = target - degrees[lo]
+                if (hi < len(degrees)) and ((d is None) or (degrees[hi] - target < d)):
+                    d = degrees[hi] - target
+            if d is None:
+                return None
+
+            # gather the buckets at that distance
+            buckets = []
+            for search in searches:
+                (s, degrees, lo, hi) = search
+                if (hi < len(degrees)) and (degrees[hi] - target == d):
+                    buckets.append(self._buckets[s][degrees[hi]])
+                    search[3] = hi + 1
+                if (lo >= 0) and (target - degrees[lo] == d):
+                    buckets.append(self._buckets[s][degrees[lo]])
+                    search[2] = lo - 1
+
+            # count the suitable nodes in them
+            total = sum([ len(b) for b in buckets ])
+            excluded = len([ x for x in exclude if self._in_buckets(x, buckets) ])
+            if total > excluded:
+                return self._choose(buckets, total, excluded, exclude, rng)
+
+    def _in_buckets( self, n, buckets ):
+        '''Test whether a node is in any of the buckets.'''
+        for b in buckets:
+            if n in b:
+                return True
+        return False
+
+    def _choose( self, buckets, total, excluded, exclude, rng ):
+        '''Choose a node uniformly from the buckets, ignoring the excluded
+        nodes, by rejection if few are excluded or by listing otherwise.'''
+        if 2 * excluded < total:
+            while True:
+                i = rng.randint(total)
+                for b in buckets:
+                    if i < len(b):
+                        n = b[i]
+                        break
+                    i -= len(b)
+                if n not in exclude:
+                    return n
+        else:
+            candidates = [ n for b in buckets for n in b if n not in exclude ]
+            return candidates[rng.randint(len(candidates))]
+
+    def _bucket_add( self, n, state, degree ):
+        '''Add a node to the bucket for its state and degree.'''
+        buckets = self._buckets.setdefault(state, dict())
+        if degree not in buckets:
+            buckets[degree] = PopulationSet()
+            bisect.insort(self._degrees.setdefault(state, []), degree)
+        buckets[degree].add(n)
+
+    def _bucket_remove( self, n, state, degree ):
+        '''Remove a node from the bucket for its state and degree,
+        dropping the bucket if it's left empty.'''
+        buckets = self._buckets[state]
+        buckets[degree].remove(n)
+        if len(buckets[degree]) == 0:
+            del buckets[degree]
+            degrees = self._degrees[state]
+            del degrees[bisect.bisect_left(degrees, degree)]
@@ -0,0 +1,119 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import multiprocessing
+
+
+# In[2]:
+
+def _run_indexed( task ):
+    '''Run a function on an argument, returning the result with the
+    argument's index so that results can be matched to their arguments
+    when they arrive out of order. Defined at module level so that it
+    can be pickled.
+
+    task: a tuple of the function, the index and the argument
+    returns: a tuple of the index and the result'''
+    (f, i, x) = task
+    return (i, f(x))
+
+
+class Executor(object):
+    '''A way of running a function over a list of arguments, such as the
+    simulations of a parameter sweep. Results are returned as they
+    complete, so a caller can report progress without polling. This is
+    the base class for the different ways of running the work.'''
+
+    def imap_unordered( self, f, xs ):
+        '''Run a function over a list of arguments, yielding results in
+        the order they complete.
+
+        f: the function
+        xs: the arguments
+        returns: an iterator over (index, result) pairs, where index is
+        the position of the argument in xs'''
+        raise NotImplementedError('imap_unordered()')
+
+    def map( self, f, xs ):
+        '''Run a function over a list of arguments and wait for all the results.
+
+        f: the function
+        xs: the arguments
+        returns: a list of the results, in the order of the arguments'''
+        results = [ None ] * len(xs)
+        for (i, r) in self.imap_unordered(f, xs):
+            results[i] = r
+        return results
+
+    def close( self ):
+        '''Release any resources held by the executor.'''
+        pass
+
+
+class SerialExecutor(Executor):
+    '''Run the work one argument at a time in this process, which is
+    simplest for debugging and for small sweeps.'''
+
+    def imap_unordered( self, f, xs ):
+        for (i, x) in enumerate(xs):
+            yield (i, f(x))
+
+
+class ProcessPoolExecutor(Executor):
+    '''Run the work in a pool of local processes, by default one per
+    core. Arguments are handed to the processes in chunks, to cut the
+    cost of passing them between processes. The function and arguments
+    have to be picklable.'''
+
+    def __init__( self, processes = None, chunksize = None ):
+        '''Create a pool of processes.
+
+        processes: the number of processes (defaults to the number of cores)
+        chunksize: the number of arguments to hand to a process at once
+        (defaults to spreading the arguments in about four chunks per process)'''
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self._processes = processes
+        self._chunksize = chunksize
+        self._pool = multiprocessing.Pool(processes)
+
+    def imap_unordered( self, f, xs ):
+        chunksize = self._chunksize
+        if chunksize is None:
+            chunksize = max(1, len(xs) // (4 * self._processes))
+        tasks = [ (f, i, x) for (i, x) in enumerate(xs) ]
+        return self._pool.imap_unordered(_run_indexed, tasks, chunksize)
+
+    def close( self ):
+        self._pool.close()
+        self._pool.join()
+
+
+class IPythonExecutor(Executor):
+    '''Run the work on an IPython parallel cluster, load-balanced across
+    the cluster's engines, using dill to pickle the work so that closures
+    can be sent. IPython is only needed if this executor is used.'''
+
+    def __init__( self, profile = 'blob', modules = [] ):
+        '''Connect to a cluster.
+
+        profile: the IPython profile of the cluster (defaults to 'blob')
+        modules: names of modules to import on the engines (optional)'''
+        from IPython.parallel import Client
+
+        self._cluster = Client(profile = profile)
+        print("Cluster has {n} engines available".format(n = len(self._cluster[:])))
+        d = self._cluster[:]
+        for m in modules:
+            d.execute('import ' + m, block = True)
+        d.use_dill()
+        self._view = self._cluster.load_balanced_view()
+
+    def imap_unordered( self, f, xs ):
+        tasks = [ (f, i, x) for (i, x) in enumerate(xs) ]
+        return iter(self._view.map_async(_run_indexed, tasks, ordered = False))
+
+    def close( self ):
+        self._cluster.close()
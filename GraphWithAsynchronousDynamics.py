@@ -12,17 +12,35 @@ class GraphWithAsynchronousDynamics(GraphWithDynamics):
     '''A graph with a dynamics that runs asynchronously,
     by calculating the minimum time an event could occur
     in, then incrementing by that amount if an event did 
-    indeed occur and what it was.'''
+    indeed occur and what it was.
+    
+    Two algorithms are available:
+    'rejection': pick a node at random at every timestep and let it act
+    with a probability given by its rate, so most timesteps do nothing
+    'rejection-free': group the nodes by their rates, skip the timesteps
+    in which nothing would happen by drawing their number from a geometric
+    distribution, and pick a node in proportion to its rate to act (the
+    n-fold way), giving the same statistics as rejection while only
+    visiting nodes where something happens. Models need to provide
+    node_rate() to use it'''
 
     # Timestep to increment
     DT = 0
     
-    def __init__( self, graph = None, time_limit = 10000, states = [], rates = dict() ):
+    # the algorithms
+    ALGORITHMS = ['rejection', 'rejection-free']
+    
+    def __init__( self, graph = None, time_limit = 10000, states = [], rates = dict(), algorithm = 'rejection', **kwargs ):
         '''Create a graph, optionally with nodes and edges copied from
         the graph given.
         
-        g: graph to copy (optional)'''
-        GraphWithDynamics.__init__(self, graph, time_limit, states = states, rates = rates)
+        g: graph to copy (optional)
+        algorithm: the algorithm, 'rejection' or 'rejection-free' (defaults to 'rejection')
+        kwargs: options for the graph dynamics, e.g. seed or record (optional)'''
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError('Unknown algorithm {a}'.format(a = algorithm))
+        GraphWithDynamics.__init__(self, graph, time_limit, states = states, rates = rates, **kwargs)
+        self._algorithm = algorithm
         
     def model( self, n ):
         '''The dynamics function that's run over the network. This
@@ -36,6 +54,23 @@ class GraphWithAsynchronousDynamics(GraphWithDynamics):
         will be calculated by 1 over the value returned here.
         '''
         raise NotYetImplementedError('model()')
+    
+    def node_rate( self, n ):
+        '''Return the rate at which an event happens at a node, so that when
+        picked it acts with probability N * rate * DT. This is a placeholder
+        to be re-defined by sub-classes that run rejection-free.
+        
+        n: the node
+        returns: the rate'''
+        raise NotImplementedError('The {m} model cannot run rejection-free'.format(m = self.__class__.__name__))
+    
+    def affected_nodes( self, n ):
+        '''Return the nodes whose rates may have changed after an event at
+        a node, which by default are the node and its neighbours.
+        
+        n: the node
+        returns: a list of nodes'''
+        return [ n ] + self.neighbors(n)
         
 
     def _dynamics( self ):
@@ -48,7 +83,6 @@ class GraphWithAsynchronousDynamics(GraphWithDynamics):
         rc = dict()
         timestepEvents = 0
         events = 0
-        eventDist = dict()
         
         # Calculate the maximum rate
         max_trans_rate = self.set_timestep_rate()
@@ -56,42 +90,129 @@ class GraphWithAsynchronousDynamics(GraphWithDynamics):
         # Timestep = 1 over number of nodes by maximum transition rate
         self.DT = 1.0/(self.order()*max_trans_rate);
         
-        # Run continuously until equilibrium reached
-        while True:
-            
-            #Pick a node at random
-            n = numpy.random.randint(self.order())
-            # Random number for probability distribution
-            r = numpy.random.random()
-            # Run an action on the node dependent on it's current state
-            event = self.asyn_node_action(n, self.DT, r)
-            
-            # Increment the timestep, if nothing happened, don't update the population distribution history
-            self.increment_timestep(self.DT, event)
-            
-            # test for termination
-            if self.at_equilibrium():
-                break
+        if self._algorithm == 'rejection-free':
+            events = self._rejection_free_dynamics()
+        else:
+            # Run continuously until equilibrium reached
+            while True:
+                
+                #Pick a node at random
+                n = self._rng.randint(self.order())
+                # Random number for probability distribution
+                r = self._rng.random()
+                # Run an action on the node dependent on it's current state
+                event = self.asyn_node_action(n, self.DT, r)
+                
+                # Increment the timestep, if nothing happened, don't update the population distribution history
+                if event:
+                    events += 1
+                self.increment_timestep(self.DT, event, events = int(event))
+                
+                # test for termination
+                if self.at_equilibrium():
+                    break
             
         # return the simulation-level results
         rc['timesteps'] = self.CURRENT_TIMESTEP
         rc['events'] = events
-        rc['event_distribution'] = eventDist
-        
-        # compute the limits and means
-        cs = sorted(networkx.connected_components(self.skeletonise()), key = len, reverse = True)
-        max_outbreak_size = len(cs[0])
-        max_outbreak_proportion = (max_outbreak_size + 0.0) / self.order()
-        mean_outbreak_size = numpy.mean([ len(c) for c in cs ])
         
         # add parameters and metrics for this simulation run
         rc['number_of_nodes'] = self.order(),
-        rc['mean_outbreak_size'] = mean_outbreak_size,
-        rc['max_outbreak_size'] = max_outbreak_size,
-        rc['max_outbreak_proportion'] = max_outbreak_proportion
+        rc.update(self.outbreak_statistics())
         
         return rc
     
+    def _rejection_free_dynamics( self ):
+        '''Rejection-free asynchronous dynamics. The nodes are held in classes
+        of equal rate, and at each step the number of timesteps until the next
+        event is drawn from the geometric distribution with the probability that
+        a timestep has an event, the time is moved on past the timesteps in
+        which nothing happens, and a node is chosen to act in proportion to its
+        rate. The run stops when the model is at equilibrium or when nothing
+        more can happen. A skip is never taken past the time horizon of the
+        stopping criterion: if the next event would come after it, the clock
+        stops at the first timestep past the horizon, as it would with
+        rejection, and the criterion is tested there. If it isn't met the
+        number of timesteps to the next event is drawn again, which, the
+        distribution being memoryless, leaves the statistics unchanged.
+        
+        returns: the number of events'''
+        events = 0
+        self._rate_classes = dict()
+        self._node_rates = dict()
+        for n in self.nodes_iter():
+            self._set_node_rate(n)
+        
+        while True:
+            total = sum([ rate * len(ns) for (rate, ns) in self._rate_classes.iteritems() ])
+            if total <= 0.0:
+                break
+            
+            # skip the timesteps before the next event
+            p = min(total * self.DT, 1.0)
+            if p < 1.0:
+                skipped = int(math.floor(math.log(1.0 - self._rng.random()) / math.log1p(-p)))
+                
+                # stop at the horizon without the event if it would come after it
+                (horizon, _) = self.stopping_horizon()
+                if horizon < float('inf'):
+                    remaining = max(int(math.ceil((horizon - self.CURRENT_TIMESTEP) / self.DT)), 1)
+                    if skipped >= remaining:
+                        self.increment_timestep(remaining * self.DT, False)
+                        if self.at_equilibrium():
+                            break
+                        continue
+                if skipped > 0:
+                    self.increment_timestep(skipped * self.DT, False)
+                    if self.at_equilibrium():
+                        break
+            
+            # choose a node in proportion to its rate and make it act
+            n = self._choose_by_rate(total)
+            self.asyn_node_action(n, self.DT, 0.0)
+            for m in self.affected_nodes(n):
+                self._set_node_rate(m)
+            events += 1
+            self.increment_timestep(self.DT, True, events = 1)
+            
+            # test for termination
+            if self.at_equilibrium():
+                break
+        return events
+    
+    def _set_node_rate( self, n ):
+        '''Move a node into the class for its current rate.
+        
+        n: the node'''
+        rate = self.node_rate(n)
+        old = self._node_rates.get(n, None)
+        if old == rate:
+            return
+        if (old is not None) and (old > 0.0):
+            ns = self._rate_classes[old]
+            ns.remove(n)
+            if len(ns) == 0:
+                del self._rate_classes[old]
+        self._node_rates[n] = rate
+        if rate > 0.0:
+            if rate not in self._rate_classes:
+                self._rate_classes[rate] = PopulationSet()
+            self._rate_classes[rate].add(n)
+    
+    def _choose_by_rate( self, total ):
+        '''Choose a node with probability in proportion to its rate, by
+        choosing a class in proportion to its total rate and then a node
+        uniformly from the class.
+        
+        total: the total rate of all the nodes
+        returns: the node'''
+        x = self._rng.random() * total
+        for (rate, ns) in self._rate_classes.iteritems():
+            x -= rate * len(ns)
+            if x < 0.0:
+                break
+        return ns[self._rng.randint(len(ns))]
+    
     def asyn_node_action(self, node = 0, dt = 0.0, r = 0.0):
         '''Internal function defining what to do for the node'''
         raise NotYetImplementedError('asyn_node_action()')
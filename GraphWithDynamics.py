@@ -16,6 +16,36 @@ import time
 import pandas
 import pickle
 
+# population containers
+from PopulationSet import *
+
+# random numbers
+from RandomStream import *
+
+# population history
+from Timeline import *
+
+# stopping rules
+from StoppingCriteria import *
+
+# outbreak clustering
+from UnionFind import *
+
+# array-backed networks
+from CompactTopology import *
+
+# counts of neighbours by state
+from NeighbourCounts import *
+
+# cache of generated networks
+from TopologyCache import *
+
+# vectorised network generators
+from TopologyGenerators import *
+
+# snapshots of the state of a simulation
+from Snapshot import *
+
 
 # In[2]:
 
@@ -41,8 +71,23 @@ class GraphWithDynamics(networkx.Graph):
     POPULATION = dict()
     # the current timestep of the simulation
     CURRENT_TIMESTEP = 0
+    # the timestep at which the populations were last recorded
+    RECORDED_TIMESTEP = 0
+    # the number of events so far in the simulation
+    CURRENT_EVENTS = 0
+    # the ways the network can be stored
+    BACKENDS = ['networkx', 'compact']
+    # whether the dynamics adds and removes edges
+    ADAPTIVE = False
+    # the number of unsuitable candidates to draw when choosing a new
+    # neighbour before listing all the suitable ones
+    REWIRE_ATTEMPTS = 16
+    # the state whose nodes are counted among the neighbours of every
+    # node as the dynamics runs, if any
+    COUNTED_STATE = None
 
-    def __init__( self, graph = None , time_limit = 20000, states = [], rates = dict()):
+    def __init__( self, graph = None , time_limit = 20000, states = [], rates = dict(), seed = None,
+                  record = 'event', record_step = 1, stopping = None, backend = 'networkx' ):
         '''Create a graph, optionally with nodes and edges copied from
         the graph given.
         
@@ -50,32 +95,73 @@ class GraphWithDynamics(networkx.Graph):
         time_limit: maximum number of timesteps
         states: list of the possible node states (e.g. susceptible, infected, recovered)
         rates: the probability factors associated with the model
+        seed: seed for the simulation's random numbers (optional)
+        record: how often to record the populations, 'event', 'grid' or 'every' (defaults to 'event')
+        record_step: for 'grid' recording the time between records, for 'every'
+        recording the number of events between records (defaults to 1)
+        stopping: a StoppingCriterion to use instead of the model's own (optional)
+        backend: how to store the network, 'networkx' for a networkx graph or 'compact'
+        for a CompactTopology with array-backed states and occupied edges (defaults to 'networkx')
         '''
-        Graph.__init__(self, graph)
+        if backend not in self.BACKENDS:
+            raise ValueError('Unknown backend {b}'.format(b = backend))
+        self._backend = backend
+        self._topology = None
+        # Set states
+        self.STATES = states
+        if backend == 'compact':
+            Graph.__init__(self)
+        else:
+            Graph.__init__(self, graph)
         # Graph provided, so copy into model
         if graph is not None:
             self.copy_from(graph)
         # Set time limit
         self._time_limit = time_limit
-        # Created the event distribution (ordered by timestep when event occurred)
-        self._event_dist = collections.OrderedDict()
-        # Historical record of each sub-population (to see how diseases spreads)
-        self._pop_dist = dict()
-        # Set states
-        self.STATES = states
-        # For each state, create a population history dictionary
-        for (i) in self.STATES:
-            self._pop_dist[i] = collections.OrderedDict()
+        # Create the simulation's random number stream
+        self._rng = RandomStream(seed)
+        # Historical record of each sub-population and of the events (to see how diseases spreads)
+        self._record = record
+        self._record_step = record_step
+        self._timeline = Timeline(self.STATES, record, record_step)
+        # Set the stopping criterion, if not the model's default
+        self._stopping = stopping
+        self._stop = None
+        # The outbreaks, as sets of nodes joined by occupied edges
+        self._outbreaks = None
+        # The number of neighbours of each node in the counted state
+        self._neighbour_counts = None
         # Add the rates into the statistics    
         for (k) in rates.keys():
             self.STATISTICS[k] = rates[k]
         
     def copy_from( self, g ):
-        '''Copy the nodes and edges from another graph into us.
+        '''Copy the nodes and edges from another graph into us. With the
+        compact backend the graph may also be a CompactTopology, which is
+        used directly rather than copied (unless the model is adaptive, when
+        each simulation has its own DynamicAdjacency, or an OverlayAdjacency
+        over a shared topology), and nodes are relabelled 0 to N - 1.
         g: the graph to copy from
         returns: the graph'''
         
+        if self._backend == 'compact':
+            # replace the node and adjacency dicts with views onto the topology
+            if not isinstance(g, CompactTopology):
+                g = CompactTopology(g)
+            self._topology = g
+            self.node = CompactNodes(g, self.STATES, self.DYNAMICAL_STATE)
+            if self.ADAPTIVE and g.is_shared():
+                self.adj = OverlayAdjacency(g, self.OCCUPIED)
+            elif self.ADAPTIVE:
+                self.adj = DynamicAdjacency(g, self.OCCUPIED)
+            else:
+                self.adj = CompactAdjacency(g, self.OCCUPIED)
+            self.edge = self.adj
+            return self
+        
         # copy in nodes and edges from source network
+        if isinstance(g, CompactTopology):
+            g = g.to_networkx()
         self.add_nodes_from(g.nodes_iter())
         self.add_edges_from(g.edges_iter())
         
@@ -85,18 +171,43 @@ class GraphWithDynamics(networkx.Graph):
         
         return self
     
+    def topology( self ):
+        '''Return the CompactTopology the network is stored in, or None
+        if using the networkx backend.'''
+        return self._topology
+    
     def remove_all_nodes( self ):
         '''Remove all nodes and edges from the graph.'''
-        self.remove_nodes_from(self.nodes())
+        if self._backend == 'compact':
+            self._topology = None
+            self.node = dict()
+            self.adj = dict()
+            self.edge = self.adj
+        else:
+            self.remove_nodes_from(self.nodes())
 
-    def at_equilibrium( self ):
-        '''Test whether the model is an equilibrium. Default is just whether the 
+    def stopping_criterion( self ):
+        '''Return the model's default stopping criterion. Default is just whether the 
         current timestep is greater than the set limit (can be overriden at lower
         level).
         
-        timestep: the current simulation timestep
+        returns: a StoppingCriterion'''
+        return TimeLimit(self._time_limit)
+
+    def at_equilibrium( self ):
+        '''Test whether the model is an equilibrium, using the stopping criterion
+        given when the model was created or else the model's default.
+        
         returns: True if simulation is finished'''
-        return (self.CURRENT_TIMESTEP >= self._time_limit)
+        return self._stop.stop(self)
+
+    def stopping_horizon( self ):
+        '''Return the latest time and number of events the simulation can
+        be moved on to without the stopping criterion being met, for
+        engines that take more than one event at a time.
+        
+        returns: a (time, events) pair, either of which may be infinite'''
+        return self._stop.horizon(self)
 
     def before( self ):
         '''Run the before process. Appends the start time to the stats, then delegates to lower methods.'''
@@ -104,10 +215,9 @@ class GraphWithDynamics(networkx.Graph):
         self.STATISTICS['start_time'] = time.clock()
         # Run the before processes specific to the model
         self._before()
-        # Calculate the initial populations
+        # Calculate and record the initial populations
         self.POPULATION = self.calculate_populations()
-        for (s) in self.STATES:
-            self._pop_dist[s][self.CURRENT_TIMESTEP] = len(self.POPULATION[s])
+        self.record_populations()
         
     def _before( self ):
         '''Internal function defining the process to run before simulation.
@@ -125,15 +235,40 @@ class GraphWithDynamics(networkx.Graph):
         To be overriden at lower level with specifics.'''
         raise NotYetImplementedError('_after()')
         
-    def dynamics( self ):
+    def dynamics( self, resume_from = None ):
         '''Run a number of iterations of the model over the network. 
+        resume_from: a checkpoint file to continue an earlier run from, rather
+        than starting a new one (optional, for models that support checkpoints)
         returns: a dict of statistic'''
         
+        # Start with every node in an outbreak of its own
+        self._outbreaks = UnionFind(self.nodes_iter())
+        
         # Run the before processes
+        self._neighbour_counts = None
         self.before()
         
+        # Continue from the checkpoint, which also holds the stopping criterion
+        if resume_from is not None:
+            self._resume(resume_from)
+        
+        # Count the neighbours of each node in the counted state
+        if self.COUNTED_STATE is not None:
+            self._neighbour_counts = NeighbourCounts(self, self.COUNTED_STATE)
+        
+        # Set up the stopping criterion
+        if resume_from is None:
+            self._stop = self._stopping
+            if self._stop is None:
+                self._stop = self.stopping_criterion()
+            self._stop.reset(self)
+        
         #Run the specific system dynamics, which returns a set of properties relevant to the model chosen
         stats = self._dynamics()
+        self._timeline.finish(self.CURRENT_TIMESTEP)
+        
+        # Add any statistics kept by the stopping criterion
+        self.STATISTICS.update(self._stop.statistics())
         
         # Run the after processes
         self.after()
@@ -141,13 +276,14 @@ class GraphWithDynamics(networkx.Graph):
         # Append those stats to the overall stats
         self.STATISTICS.update(stats)
         
-        # Write the event distribution to stats
-        self.STATISTICS['event_distribution'] = self._event_dist
+        # Write the record times and event distribution to stats
+        self.STATISTICS['times'] = self._timeline.times()
+        self.STATISTICS['event_distribution'] = self._timeline.events()
         
         # Write each of the population distributions to the stats
         for (s) in self.STATES:
             key_string = s + '_distribution'
-            self.STATISTICS[key_string] = self._pop_dist[s]
+            self.STATISTICS[key_string] = self._timeline.counts(s)
         
         return self.STATISTICS
 
@@ -156,6 +292,14 @@ class GraphWithDynamics(networkx.Graph):
         To be overriden at lower level with specifics.'''
         raise NotYetImplementedError('_dynamics()')
     
+    def _resume( self, filename ):
+        '''Internal function restoring the state of a run from a checkpoint,
+        after the before processes. To be overriden at lower level by the
+        dynamics that support checkpoints.
+        
+        filename: the checkpoint file'''
+        raise NotImplementedError('Checkpoints are not supported by {c}'.format(c = self.__class__.__name__))
+    
     def skeletonise( self ):
         '''Remove unoccupied edges from the network.
         returns: the network with unoccupied edges removed'''
@@ -173,19 +317,42 @@ class GraphWithDynamics(networkx.Graph):
         self.remove_edges_from(edges)
         return self
     
+    def occupy_edge( self, n, m, data ):
+        '''Mark an edge as having been used to transfer infection, merging
+        the outbreaks at either end.
+        
+        n: the infecting node
+        m: the infected node
+        data: the edge's data dict'''
+        data[self.OCCUPIED] = True
+        self._outbreaks.union(n, m)
+    
+    def outbreak_statistics( self ):
+        '''Compute the outbreak sizes from the occupied edges, which
+        are tracked as the dynamics runs and so don't need the network to
+        be skeletonised.
+        
+        returns: a dict of outbreak statistics'''
+        stats = dict()
+        stats['mean_outbreak_size'] = self._outbreaks.mean_size(),
+        stats['max_outbreak_size'] = self._outbreaks.max_size(),
+        stats['max_outbreak_proportion'] = (self._outbreaks.max_size() + 0.0) / self.order()
+        stats['outbreak_size_distribution'] = self._outbreaks.size_distribution()
+        return stats
+    
     def calculate_populations( self ):
-        '''Return a count of the number of nodes in each dynamical state.
-        returns: a dict'''
+        '''Return the set of nodes in each dynamical state.
+        returns: a dict of PopulationSet objects'''
         pops = dict()
         
-        # Initialise populations with empty lists
+        # Initialise populations with empty sets
         for s in self.STATES:
-            pops[s] = []
+            pops[s] = PopulationSet()
         
-        # Loop through nodes and add to relevant list based on state
+        # Loop through nodes and add to relevant set based on state
         for n in self.nodes_iter():
             state = self.node[n][self.DYNAMICAL_STATE]
-            pops[state].append(n)
+            pops[state].add(n)
         
         return pops
                 
@@ -193,14 +360,56 @@ class GraphWithDynamics(networkx.Graph):
         '''Placeholder to be run during simulation, Default does nothing.'''
         pass
     
-    def increment_timestep(self, dt = 0.0, update_dist = True):
+    def choose_new_neighbour( self, m, states ):
+        '''Choose a node uniformly at random from those in the given states
+        that are neither m nor already adjacent to it, as a new neighbour for m.
+        Candidates are drawn from the populations and rejected if unsuitable,
+        which takes expected O(1) time unless most nodes are unsuitable. After
+        REWIRE_ATTEMPTS rejections the suitable nodes are listed and one chosen
+        from them, so the choice is always exact.
+        
+        m: the node
+        states: the states the new neighbour may be in
+        returns: the new neighbour, or None if there are no suitable nodes'''
+        pops = [ self.POPULATION[s] for s in states ]
+        total = sum([ len(p) for p in pops ])
+        if total == 0:
+            return None
+        neighbours = self.adj[m]
+        
+        # draw candidates until one is suitable
+        for attempt in xrange(self.REWIRE_ATTEMPTS):
+            i = self._rng.randint(total)
+            for p in pops:
+                if i < len(p):
+                    c = p[i]
+                    break
+                i -= len(p)
+            if (c != m) and (c not in neighbours):
+                return c
+        
+        # too many rejections, so list the suitable nodes
+        candidates = [ c for p in pops for c in p if (c != m) and (c not in neighbours) ]
+        if len(candidates) == 0:
+            return None
+        return candidates[self._rng.randint(len(candidates))]
+    
+    def record_populations(self, events = 0):
+        '''Record the current populations in the timeline.
+        
+        events: the number of events since the last record (defaults to 0)'''
+        self.RECORDED_TIMESTEP = self.CURRENT_TIMESTEP
+        self._timeline.record(self.CURRENT_TIMESTEP, [ len(self.POPULATION[s]) for s in self._timeline.states() ], events)
+    
+    def increment_timestep(self, dt = 0.0, update_dist = True, events = 0):
         '''Increment the time step, and updates the population history if requried
         Flag is needed as some model methods can result in small timestep jumps 
-        where nothing happens. The default is to record the population.'''
+        where nothing happens. The default is to record the population.
+        
+        events: the number of events that happened in the timestep (defaults to 0)'''
         if update_dist:
-            # Loop through states and records
-            for (s) in self.STATES:
-                self._pop_dist[s][self.CURRENT_TIMESTEP] = len(self.POPULATION[s])
+            self.record_populations(events)
+        self.CURRENT_EVENTS += events
         # Increase timestep by amount required
         self.CURRENT_TIMESTEP += dt
         
@@ -211,7 +420,34 @@ class GraphWithDynamics(networkx.Graph):
         # Remove from previous sub-population
         self.POPULATION[state_before].remove(changed_node)
         # Add to new sub-population
-        self.POPULATION[state_after].insert(0, changed_node)
+        self.POPULATION[state_after].add(changed_node)
+        # Update the neighbours' counts
+        if self._neighbour_counts is not None:
+            self._neighbour_counts.state_changed(changed_node, state_before, state_after)
+    
+    def neighbour_count( self, n ):
+        '''Return the number of neighbours of a node in COUNTED_STATE.
+        
+        n: the node'''
+        return self._neighbour_counts[n]
+    
+    def edge_added( self, u, v ):
+        '''Tell the dynamics that an edge has been added, to keep the
+        neighbour counts up to date.
+        
+        u: one end of the edge
+        v: the other end'''
+        if self._neighbour_counts is not None:
+            self._neighbour_counts.edge_added(u, v)
+    
+    def edge_removed( self, u, v ):
+        '''Tell the dynamics that an edge has been removed, to keep the
+        neighbour counts up to date.
+        
+        u: one end of the edge
+        v: the other end'''
+        if self._neighbour_counts is not None:
+            self._neighbour_counts.edge_removed(u, v)
         
     def reset(self):
         ''' For parallel processing. Rather than building a new network
@@ -221,24 +457,227 @@ class GraphWithDynamics(networkx.Graph):
         
         # Clear the nodes
         self.remove_all_nodes()
+        self._reset_dynamics()
+        
+    def _reset_dynamics(self):
+        ''' Clear the record of the dynamics, leaving the network in place.'''
         
         # Remove the population distribution history
-        self._pop_dist = dict()
-        for (i) in self.STATES:
-            self._pop_dist[i] = collections.OrderedDict()
+        self._timeline = Timeline(self.STATES, self._record, self._record_step)
             
         # Clear dictionaries    
         self.STATISTICS.clear()
         self.POPULATION.clear()
+        self._outbreaks = None
+        self._neighbour_counts = None
         
-        # Reset the timestep
+        # Reset the timestep and event count
         self.CURRENT_TIMESTEP = 0
+        self.RECORDED_TIMESTEP = 0
+        self.CURRENT_EVENTS = 0
+        
+    def snapshot( self ):
+        ''' Take a snapshot of the network, the node states, the occupied
+        edges, the clock, and the populations and any other indexes the
+        model keeps, to restore the graph to later. With the compact backend
+        and a dynamics that doesn't change the edges, the snapshot shares
+        the graph's topology and only the states and occupied bitset are
+        copied; otherwise the network is copied into a new CompactTopology.
+        
+        returns: a Snapshot'''
+        if (self._backend == 'compact') and isinstance(self.adj, CompactAdjacency):
+            snapshot = Snapshot(self._topology, self.node.states(), self.node.state_array().copy(),
+                                self.adj.occupied_array().copy(), self.CURRENT_TIMESTEP, self.CURRENT_EVENTS)
+        else:
+            snapshot = self._snapshot_network()
+        
+        # Record the order of the nodes in the populations, if there are any
+        topology = snapshot.topology()
+        if len(self.POPULATION) > 0:
+            snapshot.set_populations(dict([ (s, self._node_indices(topology, self.POPULATION[s])) for s in self.POPULATION.keys() ]))
+        self._snapshot_indexes(snapshot)
+        return snapshot
+        
+    def _snapshot_network( self ):
+        ''' Take a snapshot by copying the network into a new CompactTopology,
+        for networks that aren't already held in one that won't change.
+        
+        returns: the Snapshot, without populations or indexes'''
+        labels = self.nodes()
+        n = len(labels)
+        if sorted(labels) == range(n):
+            index = None
+        else:
+            index = dict([ (l, i) for (i, l) in enumerate(labels) ])
+        
+        # gather the edges and whether they're occupied
+        us = []
+        vs = []
+        occupied = []
+        for (u, v, data) in self.edges_iter(data = True):
+            if index is not None:
+                (u, v) = (index[u], index[v])
+            us.append(u)
+            vs.append(v)
+            occupied.append(data.get(self.OCCUPIED, False) == True)
+        us = numpy.array(us, dtype = numpy.int64)
+        vs = numpy.array(vs, dtype = numpy.int64)
+        occupied = numpy.array(occupied, dtype = bool)
+        topology = CompactTopology.from_edges(n, us, vs, None if index is None else labels)
+        
+        # find the slots of the occupied edges, in both directions, from the sorted rows
+        offsets = topology.offsets()
+        heads = numpy.repeat(numpy.arange(n, dtype = numpy.int64), numpy.diff(offsets))
+        keys = heads * n + topology.neighbour_array()
+        flags = numpy.zeros(len(keys), dtype = bool)
+        flags[numpy.searchsorted(keys, us[occupied] * n + vs[occupied])] = True
+        flags[numpy.searchsorted(keys, vs[occupied] * n + us[occupied])] = True
+        
+        # code the states
+        if self._backend == 'compact':
+            states = self.node.states()
+            codes = self.node.state_array().copy()
+        else:
+            states = list(self.STATES)
+            positions = dict([ (s, i) for (i, s) in enumerate(states) ])
+            codes = numpy.array([ positions.get(self.node[topology.label(i)].get(self.DYNAMICAL_STATE), -1) for i in xrange(n) ],
+                                dtype = numpy.int8)
+        snapshot = Snapshot(topology, states, codes, pack_bits(flags), self.CURRENT_TIMESTEP, self.CURRENT_EVENTS)
+        
+        # keep the order of the neighbours of the compact adjacencies that change
+        if self._backend == 'compact':
+            snapshot.set_rows(numpy.array([ m for i in xrange(n) for m in self.adj.neighbours(i) ], dtype = numpy.int32))
+        return snapshot
         
-    def rebuild_barabasi_albert(self, N, M):
+    def _node_indices( self, topology, nodes ):
+        ''' Return an array of the indices in a topology of some nodes, in order.
+        
+        topology: the topology
+        nodes: the nodes'''
+        return numpy.array([ topology.index(l) for l in nodes ], dtype = numpy.int64)
+        
+    def _snapshot_indexes( self, snapshot ):
+        ''' Record any indexes the model keeps in a snapshot. This is a
+        placeholder to be re-defined by sub-classes that keep indexes.
+        
+        snapshot: the Snapshot'''
+        pass
+        
+    def restore( self, snapshot ):
+        ''' Restore the graph to a snapshot, clearing the record of any
+        dynamics run since. With the compact backend, if the snapshot shares
+        the graph's topology and the dynamics doesn't change the edges, the
+        arrays of states and occupied edges are copied back in place;
+        otherwise the graph is laid over the snapshot's topology, which for
+        the compact backend is still done without copying the topology. With
+        the networkx backend the node and edge attributes are set in place,
+        unless the dynamics changes the edges or the number of nodes or edges
+        has changed (as after skeletonise()), when the graph is built again.
+        
+        snapshot: the Snapshot'''
+        self._reset_dynamics()
+        topology = snapshot.topology()
+        
+        if self._backend == 'compact':
+            if not ((self._topology is topology) and isinstance(self.adj, CompactAdjacency)):
+                self.copy_from(topology)
+                if snapshot.rows() is not None:
+                    # lay out the neighbours in the order they were in
+                    self.adj = DynamicAdjacency(topology, self.OCCUPIED, snapshot.rows())
+                    self.edge = self.adj
+            self.node.state_array()[:] = snapshot.codes_for(self.node.states())
+            if isinstance(self.adj, CompactAdjacency):
+                self.adj.occupied_array()[:] = snapshot.occupied()
+            else:
+                # the adjacency numbers the edges as the topology does
+                bits = pack_bits(snapshot.occupied_edges())
+                self.adj.occupied_array()[:len(bits)] = bits
+        else:
+            if self.ADAPTIVE or (self.order() != topology.order()) or (self.size() != topology.size()):
+                self.remove_all_nodes()
+                self.copy_from(topology)
+            states = snapshot.states()
+            for (i, c) in enumerate(snapshot.codes().tolist()):
+                data = self.node[topology.label(i)]
+                if c >= 0:
+                    data[self.DYNAMICAL_STATE] = states[c]
+                else:
+                    data.pop(self.DYNAMICAL_STATE, None)
+            occupied = snapshot.occupied_slots()
+            neighbours = topology.neighbour_array()
+            offsets = topology.offsets()
+            for i in xrange(topology.order()):
+                for k in xrange(offsets[i], offsets[i + 1]):
+                    j = int(neighbours[k])
+                    if i < j:
+                        self.adj[topology.label(i)][topology.label(j)][self.OCCUPIED] = bool(occupied[k])
+        
+        # Restore the clock, the populations and the model's indexes
+        self.CURRENT_TIMESTEP = snapshot.timestep()
+        self.RECORDED_TIMESTEP = snapshot.timestep()
+        self.CURRENT_EVENTS = snapshot.events()
+        populations = snapshot.populations()
+        if populations is not None:
+            self.POPULATION = dict([ (s, PopulationSet([ topology.label(i) for i in populations[s].tolist() ])) for s in populations.keys() ])
+        self._restore_indexes(snapshot)
+        
+    def _restore_indexes( self, snapshot ):
+        ''' Restore any indexes the model keeps from a snapshot. This is a
+        placeholder to be re-defined by sub-classes that keep indexes.
+        
+        snapshot: the Snapshot'''
+        pass
+        
+    def rebuild_barabasi_albert(self, N, M, seed = None, cache = None):
         ''' For parallelism. Allows the building of a new Barabasi-Albert
-        network to serve as the basis for the graph.'''
-        # Create BA network
-        graph = barabasi_albert_graph(N,M)
+        network to serve as the basis for the graph. A network with a
+        given seed can be kept in a TopologyCache and loaded from there
+        rather than being built again.
+        
+        N: the number of nodes
+        M: the number of edges added with each node
+        seed: the seed for the network (optional, defaults to a new random network)
+        cache: a TopologyCache to use for seeded networks (optional)'''
+        self._rebuild('barabasi_albert', dict(n = N, m = M), seed, cache,
+                      lambda: barabasi_albert_topology(N, M, seed = seed))
+        
+    def rebuild_configuration_model(self, N, alpha, k_min = 1, k_max = None, seed = None, cache = None):
+        ''' Build a new network with a power-law degree distribution,
+        by the configuration model, to serve as the basis for the graph.
+        
+        N: the number of nodes
+        alpha: the exponent of the power law
+        k_min: the smallest degree (defaults to 1)
+        k_max: the largest degree (defaults to N - 1)
+        seed: the seed for the network (optional, defaults to a new random network)
+        cache: a TopologyCache to use for seeded networks (optional)'''
+        self._rebuild('configuration_model', dict(n = N, alpha = alpha, k_min = k_min, k_max = k_max), seed, cache,
+                      lambda: configuration_model_topology(N, alpha, k_min, k_max, seed = seed))
+        
+    def rebuild_erdos_renyi(self, N, p, seed = None, cache = None):
+        ''' Build a new Erdos-Renyi network to serve as the basis for the graph.
+        
+        N: the number of nodes
+        p: the probability of each edge
+        seed: the seed for the network (optional, defaults to a new random network)
+        cache: a TopologyCache to use for seeded networks (optional)'''
+        self._rebuild('erdos_renyi', dict(n = N, p = p), seed, cache,
+                      lambda: erdos_renyi_topology(N, p, seed = seed))
+        
+    def _rebuild(self, generator, params, seed, cache, build):
+        ''' Build a network and copy it into the graph, loading it from
+        the cache instead if it's seeded and there is one.
+        
+        generator: the name of the generator
+        params: a dict of the generator's parameters
+        seed: the seed for the network
+        cache: a TopologyCache, or None
+        build: a function taking no arguments that builds the network'''
+        if (cache is not None) and (seed is not None):
+            # Load the network, building it if needed
+            graph = cache.topology(generator, params, seed, build)
+        else:
+            graph = build()
         # Copy from it
         self.copy_from(graph)
 
@@ -4,6 +4,10 @@
 # In[1]:
 
 from GraphWithDynamics import *
+from SIEdgeIndex import *
+from SumTree import *
+from IndexedPriorityQueue import *
+from Checkpoint import *
 
 
 # In[2]:
@@ -12,15 +16,242 @@ class GraphWithStochasticDynamics(GraphWithDynamics):
     '''A graph with a dynamics that runs stochastically, whereby
     the next expected event to happen is calculated based on the 
     transition rates and the model then jumps to that step and 
-    performs an action on a node'''
+    performs an action on a node.
+    
+    Models register their transitions as rate channels using
+    add_transition(), and keep the rates up to date with set_rate() as
+    the dynamics proceeds. Models that instead define transitions() have
+    their transition vector loaded into the channels at every event.
+    
+    Two engines are available. The 'direct' engine is Gillespie's direct
+    method, drawing the time to and choice of the next event afresh at
+    each step. The 'nrm' engine is Gibson and Bruck's next reaction method,
+    which keeps a putative firing time for every channel in an indexed
+    priority queue: when an event fires, only the channels whose rates
+    it changed (through set_rate()) have their firing times adjusted.
+    
+    The 'tau' engine is an approximate tau-leaping method, which fires
+    Poisson-distributed batches of events over a leap of time chosen
+    using the Cao-Gillespie-Petzold criterion, so that no population
+    changes by more than a fraction tau_tolerance of its size. This
+    uses the population changes declared for each channel when it is
+    registered, which may include the number of SI edges as well as the
+    node populations. Exact steps are taken instead whenever a population
+    consumed by a transition is small, or the leap would be no longer
+    than a few exact steps. Leaps are also kept within the horizon of the
+    stopping criterion, so they don't overshoot a time limit or event
+    budget. The channels fire in a random order over the leap, and a
+    channel registered with a bulk function makes all its transitions in
+    one call, with the indexes updated once rather than per event. While
+    the events of a leap are performed the rates are held back rather than
+    written into the transition selector, which is updated once with the
+    final rates when the leap is complete.
+    
+    A long run can write checkpoints of its complete state to a file
+    every so many events or seconds, and a run that is stopped can then
+    be continued from its last checkpoint with dynamics(resume_from = file),
+    following exactly the trajectory it would have followed. Resuming
+    is exact with the compact backend; with the networkx backend it is
+    exact if the graph is built in the same way before resuming, as the
+    order in which the neighbours of a node are visited depends on how
+    its dict was built. Adaptive dynamics, which change the edges, build
+    those dicts as they go, so they can only be checkpointed with the
+    compact backend, and asking for checkpoints of them with the networkx
+    backend raises a ValueError.'''
+    
+    # the class used to select the next transition in proportion to its rate
+    TRANSITION_SELECTOR = SumTree
+    
+    # the available simulation engines
+    ENGINES = ['direct', 'nrm', 'tau']
+    
+    # the pseudo-population of SI edges, whose changes can be declared for tau-leaping
+    SI_EDGES = 'si_edges'
+    
+    # tau-leaping: populations below this size are simulated exactly
+    TAU_CRITICAL_POPULATION = 10
+    # tau-leaping: leaps shorter than this many mean exact steps aren't worth taking
+    TAU_EXACT_THRESHOLD = 10.0
+    # tau-leaping: number of exact steps to take when not leaping
+    TAU_EXACT_STEPS = 100
+    
+    # checkpoints: the real time between checkpoints if no interval is given
+    CHECKPOINT_SECONDS = 600.0
         
-    def __init__( self, graph = None, time_limit = 10000, states = [], rates = dict() ):
+    def __init__( self, graph = None, time_limit = 10000, states = [], rates = dict(), engine = 'direct',
+                  tau_tolerance = 0.03, checkpoint = None, checkpoint_events = None, checkpoint_seconds = None, **kwargs ):
         '''Create a graph, optionally with nodes and edges copied from
         the graph given.
         
         grpah: graph to copy (optional)
-        time_limit: maximum number of timesteps(optional)'''
-        GraphWithDynamics.__init__(self, graph, time_limit, states = states, rates = rates)
+        time_limit: maximum number of timesteps(optional)
+        engine: the simulation engine, 'direct', 'nrm' or 'tau' (defaults to 'direct')
+        tau_tolerance: for tau-leaping, the largest relative change in any population over a leap (defaults to 0.03)
+        checkpoint: a file to write checkpoints of the run to (optional)
+        checkpoint_events: the number of events between checkpoints (optional)
+        checkpoint_seconds: the real time between checkpoints, in seconds (optional,
+        defaults to CHECKPOINT_SECONDS if a file is given and no interval is)
+        kwargs: options for the graph dynamics, e.g. seed or record (optional)'''
+        GraphWithDynamics.__init__(self, graph, time_limit, states = states, rates = rates, **kwargs)
+        if engine not in self.ENGINES:
+            raise ValueError('Unknown stochastic engine {e}'.format(e = engine))
+        self._engine = engine
+        self._tau_tolerance = tau_tolerance
+        self._queue = None
+        self._deferred = None
+        self.clear_transitions()
+        if checkpoint is not None:
+            self._check_checkpoints()
+        if (checkpoint is not None) and (checkpoint_events is None) and (checkpoint_seconds is None):
+            checkpoint_seconds = self.CHECKPOINT_SECONDS
+        self._checkpoint = checkpoint
+        self._checkpoint_events = checkpoint_events
+        self._checkpoint_seconds = checkpoint_seconds
+        self._resumed = None
+
+    def clear_transitions( self ):
+        '''Remove all the transition channels.'''
+        self._transition_functions = []
+        self._transition_changes = []
+        self._transition_bulk = []
+        self._rates = self.TRANSITION_SELECTOR()
+        self._legacy_transitions = False
+
+    def add_transition( self, f, rate = 0.0, changes = dict(), bulk = None ):
+        '''Register a transition channel.
+        
+        f: the function called, with no arguments, to make the transition happen
+        rate: the initial rate of the transition (defaults to 0.0)
+        changes: dict of the change in each population caused by the transition,
+        used for tau-leaping, which may include SI_EDGES (optional)
+        bulk: a function called with a number k to make up to k transitions
+        at once when tau-leaping, returning the number made (optional,
+        defaults to calling f k times)
+        returns: the channel index, used to update the rate'''
+        self._transition_functions.append(f)
+        self._transition_changes.append(changes)
+        self._transition_bulk.append(bulk)
+        return self._rates.append(rate)
+
+    def set_rate( self, k, rate ):
+        '''Update the rate of a transition channel.
+        
+        k: the channel index
+        rate: the new rate'''
+        if self._deferred is not None:
+            # held back until the end of a leap
+            self._deferred[k] = rate
+            return
+        old_rate = self._rates[k]
+        if rate == old_rate:
+            return
+        if self._queue is not None:
+            self._reschedule(k, old_rate, rate)
+        self._rates.update(k, rate)
+
+    def rate( self, k ):
+        '''Return the current rate of a transition channel.'''
+        if (self._deferred is not None) and (k in self._deferred):
+            return self._deferred[k]
+        return self._rates[k]
+
+    def _snapshot_indexes( self, snapshot ):
+        '''Record the order of the edges in the SI index, if the model keeps one.
+        
+        snapshot: the Snapshot'''
+        si = getattr(self, '_si', None)
+        if si is not None:
+            topology = snapshot.topology()
+            snapshot.set_index('si', numpy.array([ (topology.index(n), topology.index(m)) for (n, m, _) in si ],
+                                                 dtype = numpy.int64).reshape((-1, 2)))
+
+    def _restore_indexes( self, snapshot ):
+        '''Restore the SI index from a snapshot, if it was recorded.
+        
+        snapshot: the Snapshot'''
+        si = snapshot.index('si')
+        if si is not None:
+            topology = snapshot.topology()
+            self._si = SIEdgeIndex()
+            for (i, j) in si.tolist():
+                (n, m) = (topology.label(i), topology.label(j))
+                self._si.add(n, m, self.adj[n][m])
+
+    def _check_checkpoints( self ):
+        '''Refuse checkpoints for adaptive dynamics with the networkx
+        backend, which couldn't be resumed exactly.'''
+        if self.ADAPTIVE and (self._backend != 'compact'):
+            raise ValueError('Checkpoints of {m} need the compact backend, as it changes the edges'.format(m = self.__class__.__name__))
+
+    def write_checkpoint( self, filename, events = 0 ):
+        '''Write a checkpoint of the complete state of the run to a file.
+        This is called by the engines between events, when a checkpoint is due.
+        
+        filename: the file
+        events: the number of events the engine has run (defaults to 0)'''
+        self._check_checkpoints()
+        engine = dict()
+        engine['engine'] = self._engine
+        engine['events'] = events
+        engine['rng'] = self._rng.get_state()
+        engine['timeline'] = self._timeline
+        engine['outbreaks'] = self._outbreaks
+        engine['stop'] = self._stop
+        engine['rates'] = [ self._rates[k] for k in xrange(len(self._rates)) ]
+        if self._queue is not None:
+            engine['firing_times'] = [ self._queue.priority(k) for k in xrange(len(self._rates)) ]
+        Checkpoint(self.snapshot(), engine).save(filename)
+
+    def _start_checkpoints( self, events ):
+        '''Set when the first checkpoint of a run is due.
+        
+        events: the number of events the engine has run'''
+        if self._checkpoint_events is not None:
+            self._next_checkpoint_events = events + self._checkpoint_events
+        if self._checkpoint_seconds is not None:
+            self._next_checkpoint_time = time.time() + self._checkpoint_seconds
+
+    def _checkpoint_if_due( self, events ):
+        '''Write a checkpoint if one is due, by events or by real time.
+        
+        events: the number of events the engine has run'''
+        if self._checkpoint is None:
+            return
+        due = False
+        if (self._checkpoint_events is not None) and (events >= self._next_checkpoint_events):
+            due = True
+        if (self._checkpoint_seconds is not None) and (time.time() >= self._next_checkpoint_time):
+            due = True
+        if due:
+            self.write_checkpoint(self._checkpoint, events)
+            self._start_checkpoints(events)
+
+    def _resume( self, filename ):
+        '''Restore the state of a run from a checkpoint, after the before
+        processes have built the transition channels.
+        
+        filename: the checkpoint file'''
+        self._check_checkpoints()
+        checkpoint = Checkpoint.load(filename)
+        engine = checkpoint.engine()
+        if engine['engine'] != self._engine:
+            raise ValueError('Checkpoint {f} is of the {e} engine, not {g}'.format(f = filename, e = engine['engine'], g = self._engine))
+        if len(engine['rates']) != len(self._rates):
+            raise ValueError('Checkpoint {f} has {k} transition channels, not {l}'.format(f = filename, k = len(engine['rates']), l = len(self._rates)))
+        
+        # restore the network and indexes, keeping the statistics from before()
+        statistics = dict(self.STATISTICS)
+        self.restore(checkpoint.snapshot())
+        self.STATISTICS.update(statistics)
+        
+        # restore the engine
+        self._timeline = engine['timeline']
+        self._outbreaks = engine['outbreaks']
+        self._stop = engine['stop']
+        self._rng.set_state(engine['rng'])
+        for (k, r) in enumerate(engine['rates']):
+            self._rates.update(k, r)
+        self._resumed = engine
 
     def transitions( self, t ):
         '''Return the transition vector, a sequence of (r, f) pairs
@@ -32,78 +263,333 @@ class GraphWithStochasticDynamics(GraphWithDynamics):
         in the vector, even though the rates (and indeed functions) can
         change over time.
         
+        This is only used by models that don't register their transitions
+        with add_transition().
+        
         t: timestep for which we want the transitions
         returns: the transition vector'''
         raise NotYetImplementedError('transitions()')
+
+    def _load_transitions( self ):
+        '''Load the transition vector into the transition channels.'''
+        for (k, (r, f)) in enumerate(self.transitions()):
+            self.set_rate(k, r)
+            self._transition_functions[k] = f
+
+    def _reschedule( self, k, old_rate, new_rate ):
+        '''Adjust the putative firing time of a channel whose rate has changed,
+        for the next reaction method. The time remaining to the firing is
+        scaled by the ratio of the rates, so no new random number is needed
+        unless the channel was previously disabled.
         
-    def _dynamics( self ):
-        '''Stochastic dynamics.
+        k: the channel index
+        old_rate: the rate before the change
+        new_rate: the rate after the change'''
+        if k == self._firing:
+            # the firing channel is re-drawn once the event is complete
+            return
+        now = self._now
+        if new_rate <= 0.0:
+            t = float('inf')
+        else:
+            t = self._queue.priority(k)
+            if (old_rate <= 0.0) or (t == float('inf')):
+                t = now + self._rng.exponential() / new_rate
+            else:
+                t = now + (old_rate / new_rate) * (t - now)
+        self._queue.update(k, t)
+
+    def _schedule( self, k, now ):
+        '''Draw a fresh putative firing time for a channel.
         
-        returns: a dict of simulation properties'''
-        properties = dict()
+        k: the channel index
+        now: the current simulation time'''
+        r = self._rates[k]
+        if r > 0.0:
+            self._queue.update(k, now + self._rng.exponential() / r)
+        else:
+            self._queue.update(k, float('inf'))
+
+    def _fire( self, k ):
+        '''Perform the transition on channel k.'''
+        if self._legacy_transitions:
+            self._transition_functions[k](self.CURRENT_TIMESTEP)
+        else:
+            self._transition_functions[k]()
         
-        # set up the priority list
-        transitions = self.transitions()
-        pr = range(len(transitions))
+    def _direct_step( self ):
+        '''Perform a single event using Gillespie's direct method.
         
-        # run the dynamics
-        events = 0
+        returns: False if no transition can happen, True otherwise'''
+            
+        # pull the transition dynamics, if not maintained by the model
+        if self._legacy_transitions:
+            self._load_transitions()
+        # Total transition rate
+        tot = self._rates.total()
+        if tot <= 0.0:
+            return False
+            
+        # calculate the timestep delta
+        tau = self._rng.exponential() / tot
+        
+        # calculate which transition happens 
+        # Generate random number between 0 and tot
+        x = self._rng.random() * tot
+        k = self._rates.find(x)
+        
+        # perform the transition
+        self._fire(k)
+        
+        # Increment the timestep by the delta, recording the event
+        self.increment_timestep(tau, events = 1)
+        return True
+
+    def _direct_method( self, events = 0 ):
+        '''Run the dynamics using Gillespie's direct method.
+        
+        events: the number of events already run, when resuming (defaults to 0)
+        returns: the number of events'''
         
         # Run continuously until equilibrium reached
-        while True:
+        while self._direct_step():
+            # Increment event total
+            events += 1
+            
+            # check for termination
+            if self.at_equilibrium():
+                break
+            self._checkpoint_if_due(events)
+        
+        return events
+
+    def _next_reaction_method( self, events = 0, firing_times = None ):
+        '''Run the dynamics using Gibson and Bruck's next reaction method.
+        
+        events: the number of events already run, when resuming (defaults to 0)
+        firing_times: the firing time of each channel, when resuming (optional,
+        defaults to drawing them afresh)
+        returns: the number of events'''
+        
+        # draw initial firing times for all the channels
+        self._now = self.CURRENT_TIMESTEP
+        self._firing = None
+        if self._legacy_transitions:
+            self._load_transitions()
+        self._queue = IndexedPriorityQueue()
+        for k in xrange(len(self._transition_functions)):
+            if firing_times is None:
+                self._schedule(k, self._now)
+            else:
+                self._queue.update(k, firing_times[k])
+        
+        try:
+            # Run continuously until equilibrium reached
+            while True:
+                
+                # find the channel that fires next
+                (k, t) = self._queue.top()
+                if t == float('inf'):
+                    # no transition can happen
+                    break
+                
+                # perform the transition, which will update the firing times
+                # of any channels whose rates it changes
+                self._now = t
+                self._firing = k
+                self._fire(k)
+                if self._legacy_transitions:
+                    self._load_transitions()
+                self._firing = None
                 
-            # pull the transition dynamics
-            transitions = self.transitions()
-            # Sum up total transition rate
-            tot = 0.0
-            for (r, _) in transitions:
-                tot = tot + r
+                # draw a new firing time for the channel that fired
+                self._schedule(k, t)
                 
-            # calculate the timestep delta
-            x = numpy.random.random()
-            tau = (1.0 / tot) * math.log(1.0 / x)
+                # Increment the timestep up to the firing time, recording the event
+                self.increment_timestep(t - self.CURRENT_TIMESTEP, events = 1)
+                # Increment event total
+                events += 1
             
-            # calculate which transition happens 
-            # Generate random number between 0 and tot
-            x = numpy.random.random() * tot
-            k = 0
-            # Pull the first transition
-            (xs, f) = transitions[pr[k]]
-            while xs < x:
-                # Keep processing transitions until the random number is hit
-                k = k + 1
-                (xsp, f) = transitions[pr[k]]
-                xs = xs + xsp
+                # check for termination
+                if self.at_equilibrium():
+                    break
+                self._checkpoint_if_due(events)
+        finally:
+            self._queue = None
+        
+        return events
+        
+    def tracked_size( self, s ):
+        '''Return the size of a population tracked for tau-leaping.
+        
+        s: the state, or SI_EDGES for the number of SI edges
+        returns: the size'''
+        if s == self.SI_EDGES:
+            return len(self._si)
+        return len(self.POPULATION[s])
+    
+    def _leap_size( self ):
+        '''Choose the size of a tau-leap using the Cao-Gillespie-Petzold
+        criterion, bounding the expected change and the standard deviation
+        of the change in each population by a fraction of its size. The
+        highest order of any transition is taken to be 2, as infection
+        involves both a susceptible and an infected node.
+        
+        returns: the leap size, or None if the dynamics should be simulated exactly'''
+        mean = dict()
+        variance = dict()
+        consumed = set()
+        for (k, changes) in enumerate(self._transition_changes):
+            r = self._rates[k]
+            if r <= 0.0:
+                continue
+            for (s, v) in changes.items():
+                mean[s] = mean.get(s, 0.0) + v * r
+                variance[s] = variance.get(s, 0.0) + v * v * r
+                if v < 0:
+                    consumed.add(s)
+        if len(mean) == 0:
+            return None
+        
+        tau = float('inf')
+        for s in mean.keys():
+            x = self.tracked_size(s)
+            if (s in consumed) and (x < self.TAU_CRITICAL_POPULATION):
+                # small population, leaping could drive it negative
+                return None
+            bound = max(self._tau_tolerance * x / 2.0, 1.0)
+            if mean[s] != 0.0:
+                tau = min(tau, bound / abs(mean[s]))
+            if variance[s] > 0.0:
+                tau = min(tau, (bound * bound) / variance[s])
+        return tau
+
+    def _tau_leaping( self, events = 0 ):
+        '''Run the dynamics using adaptive tau-leaping, falling back to
+        exact steps of the direct method when leaping isn't appropriate.
+        
+        events: the number of events already run, when resuming (defaults to 0)
+        returns: the number of events'''
+        
+        # Run continuously until equilibrium reached
+        while True:
             
-            # perform the transition
-            f(self.CURRENT_TIMESTEP)
+            # pull the transition dynamics, if not maintained by the model
+            if self._legacy_transitions:
+                self._load_transitions()
+            tot = self._rates.total()
+            if tot <= 0.0:
+                # no transition can happen
+                break
             
-            # if we used a low-priority transition, swap it up the priority queue
-            if k > 0:
-                p = pr[k - 1]
-                pr[k - 1] = pr[k]
-                pr[k] = p
+            # don't expect to use more than half the events left before
+            # the stopping criterion could be met
+            (horizon, budget) = self.stopping_horizon()
+            budget -= self.CURRENT_EVENTS
+            tau = self._leap_size()
+            if (tau is not None) and (tot * tau > budget / 2.0):
+                tau = budget / (2.0 * tot)
+            if (tau is None) or (tau < self.TAU_EXACT_THRESHOLD / tot):
+                # take a batch of exact steps
+                stopped = False
+                for i in xrange(self.TAU_EXACT_STEPS):
+                    if not self._direct_step():
+                        stopped = True
+                        break
+                    events += 1
+                    if self.at_equilibrium():
+                        stopped = True
+                        break
+                if stopped:
+                    break
+                self._checkpoint_if_due(events)
+                continue
             
-            # Record the event
-            self._event_dist[self.CURRENT_TIMESTEP] = 1
-            # Increment the timestep by the delta
-            self.increment_timestep(tau)
-            # Increment event total
-            events += 1
+            # don't leap past the time at which the simulation could stop
+            if self.CURRENT_TIMESTEP + tau > horizon:
+                tau = max(horizon - self.CURRENT_TIMESTEP, 0.0)
+            
+            # draw the number of times each transition fires over the leap,
+            # and put the channels into a random order
+            rates = dict()
+            counts = []
+            for k in xrange(len(self._transition_functions)):
+                r = self._rates[k]
+                if r > 0.0:
+                    rates[k] = r
+                    counts.append((k, self._rng.poisson(r * tau)))
+            order = numpy.argsort(self._rng.random_sample(len(counts))).tolist()
+            
+            # perform the transitions, skipping any that have become impossible
+            # during the leap and never going beyond the event budget, holding
+            # back the changes to the rates until the leap is complete
+            leap_events = 0
+            self._deferred = rates
+            try:
+                for i in order:
+                    (k, c) = counts[i]
+                    c = int(min(c, budget - leap_events))
+                    if (c <= 0) or (rates[k] <= 0.0):
+                        continue
+                    if self._transition_bulk[k] is not None:
+                        leap_events += self._transition_bulk[k](c)
+                    else:
+                        for j in xrange(c):
+                            if self._legacy_transitions:
+                                self._load_transitions()
+                            if rates[k] <= 0.0:
+                                break
+                            self._fire(k)
+                            leap_events += 1
+            finally:
+                self._deferred = None
+            for (k, r) in rates.iteritems():
+                self.set_rate(k, r)
+            
+            # Increment the timestep by the leap, recording the events
+            self.increment_timestep(tau, events = leap_events)
+            events += leap_events
             
             # check for termination
             if self.at_equilibrium():
                 break
+            self._checkpoint_if_due(events)
+        
+        return events
+        
+    def _dynamics( self ):
+        '''Stochastic dynamics.
+        
+        returns: a dict of simulation properties'''
+        properties = dict()
+        
+        # if the model hasn't registered its transition channels, create
+        # them from its transition vector
+        if self._legacy_transitions or (len(self._transition_functions) == 0):
+            self.clear_transitions()
+            for (r, f) in self.transitions():
+                self.add_transition(f, r)
+            self._legacy_transitions = True
+        
+        # pick up from the checkpoint, if resuming
+        events = 0
+        firing_times = None
+        if self._resumed is not None:
+            events = self._resumed['events']
+            firing_times = self._resumed.get('firing_times')
+            self._resumed = None
+        self._start_checkpoints(events)
         
-        # compute the limits and means
-        cs = sorted(networkx.connected_components(self.skeletonise()), key = len, reverse = True)
-        max_outbreak_size = len(cs[0])
-        max_outbreak_proportion = (max_outbreak_size + 0.0) / self.order()
-        mean_outbreak_size = numpy.mean([ len(c) for c in cs ])
+        # run the dynamics using the chosen engine
+        if self._engine == 'nrm':
+            events = self._next_reaction_method(events, firing_times)
+        elif self._engine == 'tau':
+            events = self._tau_leaping(events)
+        else:
+            events = self._direct_method(events)
         
-        properties['mean_outbreak_size'] = mean_outbreak_size,
-        properties['max_outbreak_size'] = max_outbreak_size,
-        properties['max_outbreak_proportion'] = max_outbreak_proportion
+        # compute the outbreak sizes
+        properties.update(self.outbreak_statistics())
         
         # complete statistics
         properties['timesteps'] = self.CURRENT_TIMESTEP
@@ -12,11 +12,24 @@ class GraphWithSynchronousDynamics(GraphWithDynamics):
     '''A graph with a dynamics that runs synchronously,
     incrementing the timestep by 1 each time and running
     through every single node in the network appying
-    the necessary dynamics.'''
+    the necessary dynamics.
+    
+    Two kernels are available for running the steps:
+    'python': apply model() to nodes one at a time
+    'sparse': apply the whole step as vector operations over arrays of
+    node states and the CSR adjacency, for models that provide it'''
+    
+    # the kernels
+    KERNELS = ['python', 'sparse']
+        
+    def __init__( self, graph = None, time_limit = 10000, states = [], rates = dict(), kernel = 'python', **kwargs ):
+        '''Create a graph, delegates to superclass
         
-    def __init__( self, graph = None, time_limit = 10000, states = [], rates = dict() ):
-        '''Create a graph, delegates to superclass'''
-        GraphWithDynamics.__init__(self, graph, time_limit, states = states, rates = rates)
+        kernel: the kernel used to run the steps, 'python' or 'sparse' (defaults to 'python')'''
+        if kernel not in self.KERNELS:
+            raise ValueError('Unknown kernel {k}'.format(k = kernel))
+        GraphWithDynamics.__init__(self, graph, time_limit, states = states, rates = rates, **kwargs)
+        self._kernel = kernel
         
     def model( self, node ):
         '''The dynamics function that's run over the network. This
@@ -37,6 +50,17 @@ class GraphWithSynchronousDynamics(GraphWithDynamics):
             events = events + self.model(i)
         return events    
     
+    def _sparse_before( self ):
+        '''Set up the arrays used by the sparse kernel. To be overridden
+        by models that provide a sparse kernel.'''
+        raise NotImplementedError('The {m} model has no sparse kernel'.format(m = self.__class__.__name__))
+    
+    def _sparse_step( self ):
+        '''Run a single step of the model over the network using the sparse kernel.
+        
+        returns: the number of dynamic events that happened in this timestep'''
+        raise NotImplementedError('The {m} model has no sparse kernel'.format(m = self.__class__.__name__))
+    
     def _dynamics( self ):
         '''Synchronous dynamics. We apply _dynamics_step() at each timestep
         and then check for completion using at_equilibrium().
@@ -50,35 +74,33 @@ class GraphWithSynchronousDynamics(GraphWithDynamics):
         events = 0
         timestep_events = 0
         
+        # set up the kernel
+        if self._kernel == 'sparse':
+            self._sparse_before()
+            step = self._sparse_step
+        else:
+            step = self._dynamics_step
+        
         # Run continuously until equilibrium reached
         while True:
             # run a step
-            new_events = self._dynamics_step()
+            new_events = step()
             # If events have happened, update
             if new_events > 0:
                 events += new_events
                 timestep_events += 1
-                # Record event distribution history
-                self._event_dist[self.CURRENT_TIMESTEP] = new_events
         
-            # Increment timestep (synchronous maps each step, so increment by 1)
-            self.increment_timestep(1)
+            # Increment timestep (synchronous maps each step, so increment by 1), recording the events
+            self.increment_timestep(1, events = new_events)
             
             # test for termination
             if self.at_equilibrium():
                 break
         
         # Calculate outbreak sizes
-        cs = sorted(networkx.connected_components(self.skeletonise()), key = len, reverse = True)
-        max_outbreak_size = len(cs[0])
-        max_outbreak_proportion = (max_outbreak_size + 0.0) / self.order()
-        mean_outbreak_size = numpy.mean([ len(c) for c in cs ])
-        
         # add parameters and metrics for this simulation run
         properties['number_of_nodes'] = self.order(),
-        properties['mean_outbreak_size'] = mean_outbreak_size,
-        properties['max_outbreak_size'] = max_outbreak_size,
-        properties['max_outbreak_proportion'] = max_outbreak_proportion
+        properties.update(self.outbreak_statistics())
         
         # return the simulation-level results
         properties['timesteps'] = self.CURRENT_TIMESTEP
@@ -0,0 +1,99 @@
+
+# coding: utf-8
+
+# In[1]:
+
+class IndexedPriorityQueue(object):
+    '''A binary min-heap of keys ordered by priority, with a map from
+    each key to its position in the heap so that the priority of any
+    key can be changed in O(log n). Used to hold the putative firing
+    times of transition channels.'''
+
+    def __init__( self ):
+        '''Create an empty queue.'''
+        # the heap of keys, and the priority of each key
+        self._heap = []
+        self._priority = dict()
+        # position of each key in the heap
+        self._position = dict()
+
+    def __len__( self ):
+        return len(self._heap)
+
+    def __contains__( self, key ):
+        return key in self._position
+
+    def priority( self, key ):
+        '''Return the priority of a key.'''
+        return self._priority[key]
+
+    def top( self ):
+        '''Return the (key, priority) pair with the smallest priority,
+        without removing it.'''
+        key = self._heap[0]
+        return (key, self._priority[key])
+
+    def update( self, key, priority ):
+        '''Set the priority of a key, adding the key if it isn't already queued.
+
+        key: the key
+        priority: the new priority'''
+        if key not in self._position:
+            self._position[key] = len(self._heap)
+            self._heap.append(key)
+            self._priority[key] = priority
+            self._sift_up(len(self._heap) - 1)
+        else:
+            old = self._priority[key]
+            self._priority[key] = priority
+            if priority < old:
+                self._sift_up(self._position[key])
+            else:
+                self._sift_down(self._position[key])
+
+    def remove( self, key ):
+        '''Remove a key from the queue.'''
+        i = self._position.pop(key)
+        del self._priority[key]
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._position[last] = i
+            self._sift_up(i)
+            self._sift_down(self._position[last])
+
+    def clear( self ):
+        '''Remove all keys.'''
+        self._heap = []
+        self._priority.clear()
+        self._position.clear()
+
+    def _swap( self, i, j ):
+        '''Swap two heap entries.'''
+        heap = self._heap
+        (heap[i], heap[j]) = (heap[j], heap[i])
+        self._position[heap[i]] = i
+        self._position[heap[j]] = j
+
+    def _sift_up( self, i ):
+        '''Move the entry at i towards the root until the heap is ordered.'''
+        while i > 0:
+            p = (i - 1) // 2
+            if self._priority[self._heap[i]] < self._priority[self._heap[p]]:
+                self._swap(i, p)
+                i = p
+            else:
+                break
+
+    def _sift_down( self, i ):
+        '''Move the entry at i towards the leaves until the heap is ordered.'''
+        n = len(self._heap)
+        while True:
+            smallest = i
+            for c in (2 * i + 1, 2 * i + 2):
+                if (c < n) and (self._priority[self._heap[c]] < self._priority[self._heap[smallest]]):
+                    smallest = c
+            if smallest == i:
+                break
+            self._swap(i, smallest)
+            i = smallest
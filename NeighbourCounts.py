@@ -0,0 +1,91 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import array
+
+
+# In[2]:
+
+class NeighbourCounts(object):
+    '''For every node of a network, the number of its neighbours that are
+    in a given state, typically infected. The counts are held in an array
+    and kept up to date as nodes change state and edges are added and
+    removed, so a node's count is available in O(1) rather than by looking
+    at all its neighbours. A change of state costs O(k) for a node of degree
+    k, and adding or removing an edge O(1). The counts have to be told of
+    every change.'''
+
+    def __init__( self, g, state ):
+        '''Count the neighbours of every node of a graph with dynamics.
+
+        g: the graph with dynamics
+        state: the state to count'''
+        self._g = g
+        self._state = state
+        if g.topology() is not None:
+            # the compact backend already labels nodes 0 to N - 1
+            self._index = None
+        else:
+            self._index = dict([ (n, i) for (i, n) in enumerate(g.nodes_iter()) ])
+        self._counts = array.array('i', [ 0 ] * g.order())
+        for n in g.nodes_iter():
+            if g.node[n][g.DYNAMICAL_STATE] == state:
+                for m in g.neighbors_iter(n):
+                    self._counts[self._position(m)] += 1
+
+    def _position( self, n ):
+        '''Return the position of a node in the array of counts.'''
+        if self._index is None:
+            return n
+        return self._index[n]
+
+    def __getitem__( self, n ):
+        '''Return the number of neighbours of a node in the state.
+
+        n: the node'''
+        return self._counts[self._position(n)]
+
+    def counts( self ):
+        '''Return the array of counts.'''
+        return self._counts
+
+    def state_changed( self, n, state_before, state_after ):
+        '''Update the counts of a node's neighbours when it changes state.
+
+        n: the node
+        state_before: its previous state
+        state_after: its new state'''
+        if state_before == state_after:
+            return
+        if state_before == self._state:
+            delta = -1
+        elif state_after == self._state:
+            delta = 1
+        else:
+            return
+        for m in self._g.neighbors_iter(n):
+            self._counts[self._position(m)] += delta
+
+    def edge_added( self, u, v ):
+        '''Update the counts when an edge is added.
+
+        u: one end of the edge
+        v: the other end'''
+        self._edge_changed(u, v, 1)
+
+    def edge_removed( self, u, v ):
+        '''Update the counts when an edge is removed.
+
+        u: one end of the edge
+        v: the other end'''
+        self._edge_changed(u, v, -1)
+
+    def _edge_changed( self, u, v, delta ):
+        '''Adjust the counts of the ends of an edge by the states of the other ends.'''
+        g = self._g
+        if g.node[u][g.DYNAMICAL_STATE] == self._state:
+            self._counts[self._position(v)] += delta
+        if g.node[v][g.DYNAMICAL_STATE] == self._state:
+            self._counts[self._position(u)] += delta
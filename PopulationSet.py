@@ -0,0 +1,59 @@
+
+# coding: utf-8
+
+# In[1]:
+
+class PopulationSet(object):
+    '''The set of nodes in a particular dynamical state. Nodes are kept in a
+    list, with a map from node to position in the list, which gives O(1)
+    addition, removal (by swapping the removed node with the last one),
+    membership testing and positional access for uniform random sampling.'''
+
+    def __init__( self, nodes = [] ):
+        '''Create a population, optionally containing the given nodes.
+
+        nodes: the initial members (optional)'''
+        # the member nodes, in no particular order
+        self._nodes = []
+        # position of each node in the list
+        self._position = dict()
+        for n in nodes:
+            self.add(n)
+
+    def __len__( self ):
+        return len(self._nodes)
+
+    def __getitem__( self, i ):
+        '''Return the i'th node. Positions are not stable under removal.'''
+        return self._nodes[i]
+
+    def __iter__( self ):
+        return iter(self._nodes)
+
+    def __contains__( self, n ):
+        return n in self._position
+
+    def add( self, n ):
+        '''Add a node to the population. Adding a member again does nothing.
+
+        n: the node'''
+        if n not in self._position:
+            self._position[n] = len(self._nodes)
+            self._nodes.append(n)
+
+    def remove( self, n ):
+        '''Remove a node from the population, raising KeyError if it is
+        not a member.
+
+        n: the node'''
+        i = self._position.pop(n)
+        last = self._nodes.pop()
+        if i < len(self._nodes):
+            # move the last node into the hole
+            self._nodes[i] = last
+            self._position[last] = i
+
+    def clear( self ):
+        '''Remove all nodes from the population.'''
+        self._nodes = []
+        self._position.clear()
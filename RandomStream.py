@@ -0,0 +1,123 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import numpy
+
+
+# In[2]:
+
+class RandomStream(object):
+    '''A source of random numbers for a single simulation. Rather than
+    calling numpy once per number, uniform and exponential variates are
+    drawn in large blocks from a seedable numpy RandomState and served one
+    at a time from the buffers, which are refilled transparently when they
+    run out.'''
+
+    def __init__( self, seed = None, block_size = 65536 ):
+        '''Create a stream.
+
+        seed: seed for the underlying generator (optional, defaults to a random seed)
+        block_size: number of variates to draw at a time (defaults to 65536)'''
+        self._block_size = block_size
+        self.seed(seed)
+
+    def seed( self, seed = None ):
+        '''Re-seed the stream, discarding any buffered variates.
+
+        seed: the seed (optional, defaults to a random seed)'''
+        self._state = numpy.random.RandomState(seed)
+        self._uniforms = []
+        self._next_uniform = 0
+        self._exponentials = []
+        self._next_exponential = 0
+        # the generator's state when each buffer was drawn, to checkpoint the stream
+        self._uniforms_from = None
+        self._exponentials_from = None
+
+    def random( self ):
+        '''Return a uniform random number in [0, 1).'''
+        i = self._next_uniform
+        if i == len(self._uniforms):
+            self._uniforms_from = self._state.get_state()
+            self._uniforms = self._state.random_sample(self._block_size).tolist()
+            i = 0
+        self._next_uniform = i + 1
+        return self._uniforms[i]
+
+    def get_state( self ):
+        '''Return the complete state of the stream, from which set_state()
+        continues the stream exactly. Rather than the buffered variates
+        themselves, the state holds the generator's state when each buffer
+        was drawn and the position in it, so it stays small.
+
+        returns: the state, as a tuple'''
+        return (self._state.get_state(),
+                self._uniforms_from, len(self._uniforms), self._next_uniform,
+                self._exponentials_from, len(self._exponentials), self._next_exponential)
+
+    def set_state( self, state ):
+        '''Continue the stream from a state returned by get_state(),
+        drawing the buffers again from the generator's earlier states.
+
+        state: the state'''
+        (generator, uniforms_from, uniforms, next_uniform, exponentials_from, exponentials, next_exponential) = state
+        self._uniforms = []
+        if uniforms_from is not None:
+            self._state.set_state(uniforms_from)
+            self._uniforms = self._state.random_sample(uniforms).tolist()
+        self._uniforms_from = uniforms_from
+        self._next_uniform = next_uniform
+        self._exponentials = []
+        if exponentials_from is not None:
+            self._state.set_state(exponentials_from)
+            self._exponentials = self._state.standard_exponential(exponentials).tolist()
+        self._exponentials_from = exponentials_from
+        self._next_exponential = next_exponential
+        self._state.set_state(generator)
+
+    def randint( self, n ):
+        '''Return a uniform random integer in [0, n).
+
+        n: the upper bound (exclusive)'''
+        return int(self.random() * n)
+
+    def sample( self, n, k ):
+        '''Return k distinct uniform random integers in [0, n), using
+        Floyd's algorithm so that only k random numbers are drawn.
+
+        n: the upper bound (exclusive)
+        k: the number of integers, no more than n
+        returns: a list of the integers'''
+        chosen = set()
+        for j in xrange(n - k, n):
+            t = self.randint(j + 1)
+            if t in chosen:
+                t = j
+            chosen.add(t)
+        return list(chosen)
+
+    def exponential( self ):
+        '''Return an exponentially-distributed random number with mean 1.'''
+        i = self._next_exponential
+        if i == len(self._exponentials):
+            self._exponentials_from = self._state.get_state()
+            self._exponentials = self._state.standard_exponential(self._block_size).tolist()
+            i = 0
+        self._next_exponential = i + 1
+        return self._exponentials[i]
+
+    def random_sample( self, size ):
+        '''Return an array of uniform random numbers in [0, 1), for vectorised
+        code. These are drawn directly rather than from the buffer.
+
+        size: the number of random numbers'''
+        return self._state.random_sample(size)
+
+    def poisson( self, lam ):
+        '''Return a Poisson-distributed random integer. These aren't
+        buffered, as the mean generally changes from call to call.
+
+        lam: the mean'''
+        return int(self._state.poisson(lam))
@@ -0,0 +1,138 @@
+
+# coding: utf-8
+
+# In[1]:
+
+class SIEdgeIndex(object):
+    '''An index of the SI edges of a network, i.e. the edges connecting an
+    infected node to a susceptible node. Edges are held as (n, m, data) tuples,
+    where n is the infected end and m the susceptible end.
+
+    The edges are kept in a list so that one can be drawn uniformly at random
+    by position. A position map keyed by edge allows an edge to be removed in
+    O(1) by swapping it with the last edge in the list, and per-node incidence
+    sets allow all the SI edges of a node to be removed in O(degree) rather
+    than by scanning the whole index.'''
+
+    def __init__( self ):
+        '''Create an empty index.'''
+        # the (n, m, data) edges, in no particular order
+        self._edges = []
+        # position of each edge in the list, keyed by (n, m)
+        self._position = dict()
+        # keys of the SI edges incident on each node
+        self._incident = dict()
+
+    def __len__( self ):
+        return len(self._edges)
+
+    def __getitem__( self, i ):
+        '''Return the i'th edge. Positions are not stable under removal.'''
+        return self._edges[i]
+
+    def __iter__( self ):
+        return iter(self._edges)
+
+    def __contains__( self, edge ):
+        '''Test whether the edge (n, m), n infected and m susceptible, is in the index.'''
+        return (edge[0], edge[1]) in self._position
+
+    def add( self, n, m, data ):
+        '''Add an SI edge. Adding an edge that is already present does nothing.
+
+        n: the infected node
+        m: the susceptible node
+        data: the edge's data'''
+        key = (n, m)
+        if key in self._position:
+            return
+        self._position[key] = len(self._edges)
+        self._edges.append((n, m, data))
+        self._incident.setdefault(n, set()).add(key)
+        self._incident.setdefault(m, set()).add(key)
+
+    def remove( self, n, m ):
+        '''Remove an SI edge by swapping it with the last edge in the list.
+
+        n: the infected node
+        m: the susceptible node
+        returns: the (n, m, data) edge removed'''
+        key = (n, m)
+        i = self._position.pop(key)
+        edge = self._edges[i]
+
+        # move the last edge into the hole
+        last = self._edges.pop()
+        if i < len(self._edges):
+            self._edges[i] = last
+            self._position[(last[0], last[1])] = i
+
+        # unlink from both ends
+        self._unlink(n, key)
+        self._unlink(m, key)
+        return edge
+
+    def pop( self, i ):
+        '''Remove and return the i'th edge.'''
+        (n, m, _) = self._edges[i]
+        return self.remove(n, m)
+
+    def remove_node( self, n ):
+        '''Remove all SI edges incident on a node, at either end. The edges
+        are removed from the end of the list backwards, so that the order
+        of the edges left depends only on the list and not on the order
+        of the incidence set, which can differ between equal indexes.
+
+        n: the node'''
+        if n in self._incident:
+            for i in sorted([ self._position[k] for k in self._incident[n] ], reverse = True):
+                (np, mp, _) = self._edges[i]
+                self.remove(np, mp)
+
+    def remove_nodes( self, ns ):
+        '''Remove all SI edges incident on any of a collection of nodes,
+        in one pass over their positions from the end of the list
+        backwards. This leaves the same edges as calling remove_node() on
+        each node in turn, but doesn't unlink each edge from the nodes
+        being removed one at a time.
+
+        ns: the nodes'''
+        position = self._position
+        edges = self._edges
+        incident = self._incident
+        keys = set()
+        for n in ns:
+            keys.update(incident.pop(n, ()))
+        for i in sorted([ position[k] for k in keys ], reverse = True):
+            (np, mp, _) = edges[i]
+            key = (np, mp)
+            del position[key]
+
+            # move the last edge into the hole, which can't be one of
+            # those being removed as they're all earlier in the list
+            last = edges.pop()
+            if i < len(edges):
+                edges[i] = last
+                position[(last[0], last[1])] = i
+
+            # unlink from whichever ends are staying
+            for x in (np, mp):
+                if x in incident:
+                    self._unlink(x, key)
+
+    def edges_of( self, n ):
+        '''Return a list of the SI edges incident on a node.'''
+        return [ self._edges[self._position[k]] for k in self._incident.get(n, ()) ]
+
+    def clear( self ):
+        '''Remove all edges from the index.'''
+        self._edges = []
+        self._position.clear()
+        self._incident.clear()
+
+    def _unlink( self, n, key ):
+        '''Remove an edge key from a node's incidence set, dropping empty sets.'''
+        keys = self._incident[n]
+        keys.discard(key)
+        if len(keys) == 0:
+            del self._incident[n]
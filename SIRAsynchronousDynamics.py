@@ -18,25 +18,29 @@ class SIRAsynchronousDynamics(GraphWithAsynchronousDynamics):
     INFECTED = 'infected'
     RECOVERED = 'recovered'
     
+    # count the infected neighbours of every node
+    COUNTED_STATE = INFECTED
+    
     # list of infected nodes, the sites of all the dynamics
     _infected = []
     _susceptible = []
     _recovered = []
     
     
-    def __init__( self, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, graph = None ):
+    def __init__( self, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, graph = None, **kwargs ):
         '''Generate a graph with dynamics for the given parameters.
         
         pInfect: infection probability (defaults to 0.0)
         pRecover: probability of recovery (defaults to 1.0)
         pInfected: initial infection probability (defaults to 0.0)
-        g: the graph to copy from (optional)'''
+        g: the graph to copy from (optional)
+        kwargs: options for the dynamics, e.g. seed or record (optional)'''
         states = {self.SUSCEPTIBLE,self.INFECTED,self.RECOVERED}
         rates = dict()
         rates['p_infect'] = p_infect
         rates['p_recover'] = p_recover
         rates['p_infected'] = p_infected
-        GraphWithAsynchronousDynamics.__init__(self, time_limit = time_limit, graph = graph, states = states, rates = rates)
+        GraphWithAsynchronousDynamics.__init__(self, time_limit = time_limit, graph = graph, states = states, rates = rates, **kwargs)
         self._p_infect = p_infect
         self._p_recover = p_recover
         self._p_infected = p_infected
@@ -46,7 +50,7 @@ class SIRAsynchronousDynamics(GraphWithAsynchronousDynamics):
         as unoccupied by the dynamics.'''
         self._infected = []       # in case we re-run from a dirty intermediate state
         for n in self.node.keys():
-            if numpy.random.random() <= self._p_infected:
+            if self._rng.random() <= self._p_infected:
                 self.node[n][self.DYNAMICAL_STATE] = self.INFECTED
             else:
                 self.node[n][self.DYNAMICAL_STATE] = self.SUSCEPTIBLE
@@ -61,21 +65,27 @@ class SIRAsynchronousDynamics(GraphWithAsynchronousDynamics):
         or the max node degree * the infection rate. Timestep will be 1 over this value'''
         max_degree = max(self.degree().values())
         return max(max_degree*self._p_infect, self._p_recover)
+    
+    def node_rate( self, n ):
+        '''Infected nodes recover at the recovery rate, and susceptible
+        nodes are infected at the infection rate for each infected neighbour.
+        
+        n: the node
+        returns: the rate'''
+        state = self.node[n][self.DYNAMICAL_STATE]
+        if state == self.INFECTED:
+            return self._p_recover
+        elif state == self.SUSCEPTIBLE:
+            return self._p_infect * self.neighbour_count(n)
+        return 0.0
      
-    def at_equilibrium( self ):
+    def stopping_criterion( self ):
         '''SIR dynamics is at equilibrium if there are no more
         infected nodes left in the network or if we've exceeded
         the default simulation length.
         
-        returns: True if the model has stopped'''
-        
-        '''if(t%1000 == 0.0):
-            print("Processing timestep ",t)'''
-        
-        if self.CURRENT_TIMESTEP >= self._time_limit:
-            return True
-        else:
-            return (len(self.POPULATION[self.INFECTED]) == 0)
+        returns: the stopping criterion'''
+        return TimeLimit(self._time_limit) | Extinction(self.INFECTED)
             
     
     def asyn_node_action(self, node = 0, dt = 0.0, r = 0.0):
@@ -89,11 +99,7 @@ class SIRAsynchronousDynamics(GraphWithAsynchronousDynamics):
                 return True
         # If chosen node is susceptible
         elif(self.node[node][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE):
-            infected_neighbours = 0
-            # Count neighbours - TODO - better way to do this? Have to count the neighbours each time
-            for (_, mp, datap) in self.edges_iter(node, data = True):
-                if self.node[mp][self.DYNAMICAL_STATE] == self.INFECTED:
-                        infected_neighbours += 1
+            infected_neighbours = self.neighbour_count(node)
             # If random number lower than Number of nodes x rate infection * timestep * infected_neighbours
             if(r < self.order()*self._p_infect*dt*infected_neighbours):
                 # Node gets infected
@@ -4,6 +4,8 @@
 # In[4]:
 
 from GraphWithStochasticDynamics import *
+from DegreeIndex import *
+import copy
 import operator
 import csv
 
@@ -17,166 +19,257 @@ class SIRStochasticDynamicsRewireDegree(GraphWithStochasticDynamics):
     SUSCEPTIBLE = 'susceptible'
     INFECTED = 'infected'
     RECOVERED = 'recovered'
-    degree_dict = dict()
     
-    # list of SI edges connecting a susceptible to an infected node
-    _si = []
+    # the dynamics changes the edges of the network
+    ADAPTIVE = True
+    
+    # index of SI edges connecting a susceptible to an infected node
+    _si = None
+    
+    # index of nodes by state and degree
+    _degrees = None
         
-    def __init__( self, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, graph = None, p_rewire = 0.0 ):
+    def __init__( self, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, graph = None, p_rewire = 0.0, **kwargs ):
         '''Generate a graph with dynamics for the given parameters.
         
         p_infect: infection probability (defaults to 0.0)
         p_recover: probability of recovery (defaults to 1.0)
         p_infected: initial infection probability (defaults to 0.0)
-        graph: the graph to copy from (optional)'''
+        graph: the graph to copy from (optional)
+        kwargs: options for the stochastic engine, e.g. engine = 'nrm', seed or record (optional)'''
         states = {self.SUSCEPTIBLE,self.INFECTED,self.RECOVERED}
         rates = dict()
         rates['p_infect'] = p_infect
         rates['p_recover'] = p_recover
         rates['p_infected'] = p_infected
         rates['p_rewire'] = p_rewire
-        GraphWithStochasticDynamics.__init__(self, time_limit = time_limit, graph = graph, states = states, rates = rates)
+        GraphWithStochasticDynamics.__init__(self, time_limit = time_limit, graph = graph, states = states, rates = rates, **kwargs)
         self.p_infected = p_infected
         self.p_infect = p_infect
         self.p_recover = p_recover
         self.p_rewire = p_rewire
-        
-        for i in self.nodes():
-            self.degree_dict[i] = self.degree(i)
-            
-        
+
     def before( self ):
         '''Seed the network with infected nodes, extract the initial set of
         SI nodes, and mark all edges as unoccupied by the dynamics.'''
-        self._si = []
+        self._si = SIEdgeIndex()
         
         # infect nodes
         for n in self.node.keys():
-            if numpy.random.random() <= self.p_infected:
+            if self._rng.random() <= self.p_infected:
                 self.node[n][self.DYNAMICAL_STATE] = self.INFECTED
             else:
                 self.node[n][self.DYNAMICAL_STATE] = self.SUSCEPTIBLE
                 
         self.POPULATION = self.calculate_populations()        
         
+        # index the nodes by state and degree
+        self._degrees = DegreeIndex()
+        for n in self.nodes_iter():
+            self._degrees.add(n, self.node[n][self.DYNAMICAL_STATE], self.degree(n))
+        
         # extract the initial set of SI edges
         for (n, m, data) in self.edges_iter(self.POPULATION[self.INFECTED], data = True):
             if self.node[m][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE:
-                self._si.insert(0, (n, m, data))
+                self._si.add(n, m, data)
         
         # mark all edges as unoccupied
         for (n, m, data) in self.edges_iter(data = True):
             data[self.OCCUPIED] = False
+        
+        # build the transition table
+        self.clear_transitions()
+        self._infect_channel = self.add_transition(self.infect, changes = { self.SUSCEPTIBLE: -1, self.INFECTED: 1 },
+                                                   bulk = self.infect_many)
+        self._recover_channel = self.add_transition(self.recover, changes = { self.INFECTED: -1, self.RECOVERED: 1 },
+                                                    bulk = self.recover_many)
+        self._rewire_channel = self.add_transition(self.rewire, changes = { self.SI_EDGES: -1 },
+                                                   bulk = self.rewire_many)
+        self._update_rates()
             
     def after(self):
         pass
     
-    def at_equilibrium( self):
+    def stopping_criterion( self ):
         '''SIR dynamics is at equilibrium if there are no more infected nodes left
-        in the network, no susceptible nodes adjacent to infected nodes, or if we've
-        exceeded the default simulation length.
+        in the network, or if we've exceeded the default simulation length.
         
-        returns: True if the model has stopped
+        returns: the stopping criterion
         
         Extension: stop once the infection population drops below 80% of the current maximum
         '''
-        if len(self.POPULATION[self.INFECTED]) < (0.8 * max(self._pop_dist[self.INFECTED].values())):
-            self.STATISTICS['peak_infection'] = max(self._pop_dist[self.INFECTED].iteritems(), key=operator.itemgetter(1))
-            return True
-        
-        if self.CURRENT_TIMESTEP >= self._time_limit:
-            self.STATISTICS['peak_infection'] = max(self._pop_dist[self.INFECTED].iteritems(), key=operator.itemgetter(1))
-            return True
-        else:
-            return ((len(self.POPULATION[self.INFECTED]) == 0))
-                    # or (len(self._si) == 0))
+        return (TimeLimit(self._time_limit) | Extinction(self.INFECTED) |
+                DropFromPeak(self.INFECTED, 0.8, statistic = 'peak_infection'))
+
+    def _snapshot_indexes( self, snapshot ):
+        '''Record the SI index and a copy of the degree index in a snapshot.'''
+        GraphWithStochasticDynamics._snapshot_indexes(self, snapshot)
+        if self._degrees is not None:
+            snapshot.set_index('degrees', copy.deepcopy(self._degrees))
+        
+    def _restore_indexes( self, snapshot ):
+        '''Restore the SI index and the degree index from a snapshot.'''
+        GraphWithStochasticDynamics._restore_indexes(self, snapshot)
+        degrees = snapshot.index('degrees')
+        if degrees is not None:
+            self._degrees = copy.deepcopy(degrees)
+        
+    def update_node( self, changed_node = 0, state_before = 'before', state_after = 'after' ):
+        '''Change a node from one state to another, and update the
+        populations and the degree index.'''
+        GraphWithStochasticDynamics.update_node(self, changed_node, state_before, state_after)
+        self._degrees.set_state(changed_node, state_after)
 
     def infect( self ):
         '''Infect a node chosen at random from the SI edges.'''
          
         # choose an SI edge
-        i = numpy.random.randint(len(self._si))
+        i = self._rng.randint(len(self._si))
         (n, m, data) = self._si[i]
         
         # infect the susceptible end
         self.update_node(m,self.SUSCEPTIBLE,self.INFECTED)
         
         # label the edge we traversed as occupied
-        data[self.OCCUPIED] = True
+        self.occupy_edge(n, m, data)
         
-        # remove all edges in the SI list from an infected node to this one
-        self._si = [ (np, mp, data) for (np, mp, data) in self._si if m != mp ]
+        # remove all edges in the SI index from an infected node to this one
+        self._si.remove_node(m)
         
         # add all the edges incident on this node connected to susceptible nodes
         for (_, mp, datap) in self.edges_iter(m, data = True):
             if self.node[mp][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE:
-                self._si.insert(0, (m, mp, datap))
+                self._si.add(m, mp, datap)
+        
+        # update the transition rates
+        self._update_rates()
+        
+    def infect_many( self, k ):
+        '''Infect up to k nodes at once for tau-leaping, chosen at random
+        from the SI edges drawn without replacement. An edge whose
+        susceptible end is infected through an earlier edge in the draw is
+        skipped. The SI index is updated once all the nodes are infected.
+        
+        k: the number of infections
+        returns: the number of nodes infected'''
+        
+        # choose the SI edges and infect their susceptible ends
+        infected = []
+        for i in self._rng.sample(len(self._si), min(k, len(self._si))):
+            (n, m, data) = self._si[i]
+            if self.node[m][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE:
+                self.update_node(m,self.SUSCEPTIBLE,self.INFECTED)
+                self.occupy_edge(n, m, data)
+                infected.append(m)
+        
+        # remove all edges in the SI index to the newly-infected nodes, and
+        # then add their edges to nodes that are still susceptible
+        self._si.remove_nodes(infected)
+        for m in infected:
+            for (_, mp, datap) in self.edges_iter(m, data = True):
+                if self.node[mp][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE:
+                    self._si.add(m, mp, datap)
+        
+        # update the transition rates
+        self._update_rates()
+        return len(infected)
         
     def recover( self ):
         '''Cause a node to recover.'''
         
         # choose an infected node at random
-        i = numpy.random.randint(len(self.POPULATION[self.INFECTED]))
+        i = self._rng.randint(len(self.POPULATION[self.INFECTED]))
         n = self.POPULATION[self.INFECTED][i]
         
         # mark the node as recovered
         self.update_node(n,self.INFECTED,self.RECOVERED)
         
-        # remove all edges in the SI list incident on this node
-        self._si = [ (np, m, e) for (np, m, e) in self._si if np != n ]
-    
+        # remove all edges in the SI index incident on this node
+        self._si.remove_node(n)
+        
+        # update the transition rates
+        self._update_rates()
+        
+    def recover_many( self, k ):
+        '''Cause up to k nodes chosen at random to recover at once, for
+        tau-leaping.
+        
+        k: the number of recoveries
+        returns: the number of nodes recovered'''
+        
+        # choose the infected nodes and mark them as recovered
+        infected = self.POPULATION[self.INFECTED]
+        recovered = [ infected[i] for i in self._rng.sample(len(infected), min(k, len(infected))) ]
+        for n in recovered:
+            self.update_node(n,self.INFECTED,self.RECOVERED)
+        
+        # remove all edges in the SI index incident on these nodes
+        self._si.remove_nodes(recovered)
+        
+        # update the transition rates
+        self._update_rates()
+        return len(recovered)
+        
     def rewire( self ):
         '''Cause a node to rewire.'''
        
         # choose an SI edge
-        i = numpy.random.randint(len(self._si))
-        # remove the edge from the si list and from the overall graph structure
+        i = self._rng.randint(len(self._si))
+        # remove the edge from the si index, and rewire it
         (n, m, data) = self._si.pop(i)
+        self._rewire(n, m)
+        
+        # update the transition rates
+        self._update_rates()
+        
+    def rewire_many( self, k ):
+        '''Rewire up to k SI edges at once for tau-leaping, chosen at
+        random without replacement.
+        
+        k: the number of edges to rewire
+        returns: the number of edges rewired'''
+        
+        # choose the SI edges, then remove each from the si index and rewire it
+        edges = [ self._si[i] for i in self._rng.sample(len(self._si), min(k, len(self._si))) ]
+        for (n, m, data) in edges:
+            self._si.remove(n, m)
+            self._rewire(n, m)
+        
+        # update the transition rates
+        self._update_rates()
+        return len(edges)
+        
+    def _rewire( self, n, m ):
+        '''Rewire an SI edge that has been removed from the si index.
+        
+        n: the infected node
+        m: the susceptible node'''
         
         previous_degree = self.degree(n)
         
+        # remove the edge from the overall graph structure
         self.remove_edges_from([(n, m)])
-        self.degree_dict[n] -= 1
-        
-        # Add a link to a new node
-        
-        # Clone the list of susceptible and recovered nodes - these will be the candidates for the new link
-        candidates = list(self.POPULATION[self.SUSCEPTIBLE])
-        candidates.extend(list(self.POPULATION[self.RECOVERED]))                
-                        
-        # Remove the current node (don't want self loops)
-        if m in candidates:
-            candidates.remove(m)
-        
-        # Remove neighbours from candidates        
-        neighbours = self.neighbors(m)
-        candidates = [c for c in candidates if c not in neighbours]
-        
-        # Create a dict to store how far away each candidate is in terms of degree from the disconnected node
-        pref_cand = dict()
-        for c in candidates:
-            pref_cand[c] = abs(self.degree_dict[c] - previous_degree)
-        
-        # Reduce the candidates down to only those who are nearest to the disconncected node in terms of degree
-        min_distance = min(pref_cand.values()) 
-        candidates = [c for c in pref_cand if pref_cand[c] == min_distance]
-        
-        # Pick a candidate
-        if(len(candidates) >= 1):
-            new_neighb_index = numpy.random.randint(len(candidates))
-            self.add_edge(m, candidates[new_neighb_index])
-            self.degree_dict[candidates[new_neighb_index]] += 1
-            
+        self.edge_removed(n, m)
+        self._degrees.change_degree(n, -1)
+        self._degrees.change_degree(m, -1)
         
-    def transitions( self ):
-        '''Return the transition vector for the dynamics.
+        # Add a link to a new node, chosen from the susceptible and recovered nodes
+        # whose degree is nearest the disconnected node's, excluding the current
+        # node (don't want self loops) and its neighbours
+        c = self._degrees.nearest(previous_degree, [ self.SUSCEPTIBLE, self.RECOVERED ], [ m ] + self.neighbors(m), self._rng)
+        if c is not None:
+            self.add_edge(m, c)
+            self.edge_added(m, c)
+            self._degrees.change_degree(m, 1)
+            self._degrees.change_degree(c, 1)
         
-        returns: the transition vector'''
+    def _update_rates( self ):
+        '''Update the rates of the transition channels from the current
+        numbers of SI edges and infected nodes.'''
         
         # transitions are expressed as rates, whereas we're specified
         # in terms of probabilities, so we convert the latter to the former.
-        return [ (len(self._si) * self.p_infect,        lambda t: self.infect()),
-                 (len(self.POPULATION[self.INFECTED]) * self.p_recover, lambda t: self.recover()),
-                 (len(self._si) * self.p_rewire,        lambda t: self.rewire())]
-            
+        self.set_rate(self._infect_channel, len(self._si) * self.p_infect)
+        self.set_rate(self._recover_channel, len(self.POPULATION[self.INFECTED]) * self.p_recover)
+        self.set_rate(self._rewire_channel, len(self._si) * self.p_rewire)
 
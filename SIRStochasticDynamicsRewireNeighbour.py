@@ -4,6 +4,7 @@
 # In[1]:
 
 from GraphWithStochasticDynamics import *
+from TwoHopSampler import *
 import operator
 import csv
 
@@ -17,45 +18,47 @@ class SIRStochasticDynamicsRewireNeighbour(GraphWithStochasticDynamics):
     SUSCEPTIBLE = 'susceptible'
     INFECTED = 'infected'
     RECOVERED = 'recovered'
-    NEIGHBOURHOODS = dict()
     
-    # list of SI edges connecting a susceptible to an infected node
-    _si = []
+    # the dynamics changes the edges of the network
+    ADAPTIVE = True
+    
+    # index of SI edges connecting a susceptible to an infected node
+    _si = None
+    
+    # sampler for the neighbours of neighbours of a node, and the number
+    # of neighbourhoods it may cache
+    _two_hop = None
+    NEIGHBOURHOOD_CACHE_SIZE = 0
         
-    def __init__( self, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, graph = None, p_rewire = 0.0 ):
+    def __init__( self, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, graph = None, p_rewire = 0.0, **kwargs ):
         '''Generate a graph with dynamics for the given parameters.
         
         p_infect: infection probability (defaults to 0.0)
         p_recover: probability of recovery (defaults to 1.0)
         p_infected: initial infection probability (defaults to 0.0)
-        graph: the graph to copy from (optional)'''
+        graph: the graph to copy from (optional)
+        kwargs: options for the stochastic engine, e.g. engine = 'nrm', seed or record (optional)'''
         states = {self.SUSCEPTIBLE,self.INFECTED,self.RECOVERED}
         rates = dict()
         rates['p_infect'] = p_infect
         rates['p_recover'] = p_recover
         rates['p_infected'] = p_infected
         rates['p_rewire'] = p_rewire
-        GraphWithStochasticDynamics.__init__(self, time_limit = time_limit, graph = graph, states = states, rates = rates)
+        GraphWithStochasticDynamics.__init__(self, time_limit = time_limit, graph = graph, states = states, rates = rates, **kwargs)
         self.p_infected = p_infected
         self.p_infect = p_infect
         self.p_recover = p_recover
         self.p_rewire = p_rewire
-        
-        # Create a dictionary of all nodes 2 steps away from each node (i.e. neighbours of neighbours)
-        for i in self.nodes():
-            self.NEIGHBOURHOODS[i] = []
-            for j in self.neighbors(i):
-                self.NEIGHBOURHOODS[i].extend(self.neighbors(j))
-            self.NEIGHBOURHOODS[i] = [c for c in list(set(self.NEIGHBOURHOODS[i])) if c != i]
-        
+
     def before( self ):
         '''Seed the network with infected nodes, extract the initial set of
         SI nodes, and mark all edges as unoccupied by the dynamics.'''
-        self._si = []
+        self._si = SIEdgeIndex()
+        self._two_hop = TwoHopSampler(self, self._rng, cache_size = self.NEIGHBOURHOOD_CACHE_SIZE)
         
         # infect nodes
         for n in self.node.keys():
-            if numpy.random.random() <= self.p_infected:
+            if self._rng.random() <= self.p_infected:
                 self.node[n][self.DYNAMICAL_STATE] = self.INFECTED
             else:
                 self.node[n][self.DYNAMICAL_STATE] = self.SUSCEPTIBLE
@@ -65,111 +68,181 @@ class SIRStochasticDynamicsRewireNeighbour(GraphWithStochasticDynamics):
         # extract the initial set of SI edges
         for (n, m, data) in self.edges_iter(self.POPULATION[self.INFECTED], data = True):
             if self.node[m][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE:
-                self._si.insert(0, (n, m, data))
+                self._si.add(n, m, data)
         
         # mark all edges as unoccupied
         for (n, m, data) in self.edges_iter(data = True):
             data[self.OCCUPIED] = False
+        
+        # build the transition table
+        self.clear_transitions()
+        self._infect_channel = self.add_transition(self.infect, changes = { self.SUSCEPTIBLE: -1, self.INFECTED: 1 },
+                                                   bulk = self.infect_many)
+        self._recover_channel = self.add_transition(self.recover, changes = { self.INFECTED: -1, self.RECOVERED: 1 },
+                                                    bulk = self.recover_many)
+        self._rewire_channel = self.add_transition(self.rewire, changes = { self.SI_EDGES: -1 },
+                                                   bulk = self.rewire_many)
+        self._update_rates()
             
     def after(self):
         pass
     
-    def at_equilibrium( self):
+    def stopping_criterion( self ):
         '''SIR dynamics is at equilibrium if there are no more infected nodes left
-        in the network, no susceptible nodes adjacent to infected nodes, or if we've
-        exceeded the default simulation length.
+        in the network, or if we've exceeded the default simulation length.
         
-        returns: True if the model has stopped
+        returns: the stopping criterion
         
         Extension: stop once the infection population drops below 90% of the current maximum
         '''
-        if len(self.POPULATION[self.INFECTED]) < (0.9 * max(self._pop_dist[self.INFECTED].values())):
-            self.STATISTICS['peak_infection'] = max(self._pop_dist[self.INFECTED].iteritems(), key=operator.itemgetter(1))
-            return True
-        
-        if self.CURRENT_TIMESTEP >= self._time_limit:
-            self.STATISTICS['peak_infection'] = max(self._pop_dist[self.INFECTED].iteritems(), key=operator.itemgetter(1))
-            return True
-        else:
-            return ((len(self.POPULATION[self.INFECTED]) == 0))
-                    # or (len(self._si) == 0))
+        return (TimeLimit(self._time_limit) | Extinction(self.INFECTED) |
+                DropFromPeak(self.INFECTED, 0.9, statistic = 'peak_infection'))
 
     def infect( self ):
         '''Infect a node chosen at random from the SI edges.'''
          
         # choose an SI edge
-        i = numpy.random.randint(len(self._si))
+        i = self._rng.randint(len(self._si))
         (n, m, data) = self._si[i]
         
         # infect the susceptible end
         self.update_node(m,self.SUSCEPTIBLE,self.INFECTED)
         
         # label the edge we traversed as occupied
-        data[self.OCCUPIED] = True
+        self.occupy_edge(n, m, data)
         
-        # remove all edges in the SI list from an infected node to this one
-        self._si = [ (np, mp, data) for (np, mp, data) in self._si if m != mp ]
+        # remove all edges in the SI index from an infected node to this one
+        self._si.remove_node(m)
         
         # add all the edges incident on this node connected to susceptible nodes
         for (_, mp, datap) in self.edges_iter(m, data = True):
             if self.node[mp][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE:
-                self._si.insert(0, (m, mp, datap))
+                self._si.add(m, mp, datap)
+        
+        # update the transition rates
+        self._update_rates()
+        
+    def infect_many( self, k ):
+        '''Infect up to k nodes at once for tau-leaping, chosen at random
+        from the SI edges drawn without replacement. An edge whose
+        susceptible end is infected through an earlier edge in the draw is
+        skipped. The SI index is updated once all the nodes are infected.
+        
+        k: the number of infections
+        returns: the number of nodes infected'''
+        
+        # choose the SI edges and infect their susceptible ends
+        infected = []
+        for i in self._rng.sample(len(self._si), min(k, len(self._si))):
+            (n, m, data) = self._si[i]
+            if self.node[m][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE:
+                self.update_node(m,self.SUSCEPTIBLE,self.INFECTED)
+                self.occupy_edge(n, m, data)
+                infected.append(m)
+        
+        # remove all edges in the SI index to the newly-infected nodes, and
+        # then add their edges to nodes that are still susceptible
+        self._si.remove_nodes(infected)
+        for m in infected:
+            for (_, mp, datap) in self.edges_iter(m, data = True):
+                if self.node[mp][self.DYNAMICAL_STATE] == self.SUSCEPTIBLE:
+                    self._si.add(m, mp, datap)
+        
+        # update the transition rates
+        self._update_rates()
+        return len(infected)
         
     def recover( self ):
         '''Cause a node to recover.'''
         
         # choose an infected node at random
-        i = numpy.random.randint(len(self.POPULATION[self.INFECTED]))
+        i = self._rng.randint(len(self.POPULATION[self.INFECTED]))
         n = self.POPULATION[self.INFECTED][i]
         
         # mark the node as recovered
         self.update_node(n,self.INFECTED,self.RECOVERED)
         
-        # remove all edges in the SI list incident on this node
-        self._si = [ (np, m, e) for (np, m, e) in self._si if np != n ]
-    
+        # remove all edges in the SI index incident on this node
+        self._si.remove_node(n)
+        
+        # update the transition rates
+        self._update_rates()
+        
+    def recover_many( self, k ):
+        '''Cause up to k nodes chosen at random to recover at once, for
+        tau-leaping.
+        
+        k: the number of recoveries
+        returns: the number of nodes recovered'''
+        
+        # choose the infected nodes and mark them as recovered
+        infected = self.POPULATION[self.INFECTED]
+        recovered = [ infected[i] for i in self._rng.sample(len(infected), min(k, len(infected))) ]
+        for n in recovered:
+            self.update_node(n,self.INFECTED,self.RECOVERED)
+        
+        # remove all edges in the SI index incident on these nodes
+        self._si.remove_nodes(recovered)
+        
+        # update the transition rates
+        self._update_rates()
+        return len(recovered)
+        
     def rewire( self ):
         '''Cause a node to rewire.'''
        
         # choose an SI edge
-        i = numpy.random.randint(len(self._si))
-        # remove the edge from the si list and from the overall graph structure
+        i = self._rng.randint(len(self._si))
+        # remove the edge from the si index, and rewire it
         (n, m, data) = self._si.pop(i)
-        self.remove_edges_from([(n, m)])
+        self._rewire(n, m)
         
-        # Add a link to a new node
+        # update the transition rates
+        self._update_rates()
         
-        # Candidate nodes are those 2 steps away (neighbours of neighbours) who are not infected
-        candidates = [c for c in list(set(self.NEIGHBOURHOODS[m])) if self.node[c][self.DYNAMICAL_STATE] != self.INFECTED]
+    def rewire_many( self, k ):
+        '''Rewire up to k SI edges at once for tau-leaping, chosen at
+        random without replacement.
         
-        # Pick a candidate
-        if(len(candidates) >= 1):
-            new_neighb_index = numpy.random.randint(len(candidates))
-            
-            # Recalculate neighbourhoods
-            # Recalculate for susceptible node
-            self.NEIGHBOURHOODS[m] = []
-            for j in self.neighbors(m):
-                self.NEIGHBOURHOODS[m].extend(self.neighbors(j))
-            self.NEIGHBOURHOODS[m] = [c for c in list(set(self.NEIGHBOURHOODS[m])) if c != m]
-            
-            # Add suscpetible node to the neighbourhoods of those adjacent to the new node
-            for k in self.neighbors(candidates[new_neighb_index]):
-                if m not in self.NEIGHBOURHOODS[k]:
-                    self.NEIGHBOURHOODS[k].append(m)
-            
-            self.add_edge(m, candidates[new_neighb_index])
-            
+        k: the number of edges to rewire
+        returns: the number of edges rewired'''
         
-    def transitions( self ):
-        '''Return the transition vector for the dynamics.
+        # choose the SI edges, then remove each from the si index and rewire it
+        edges = [ self._si[i] for i in self._rng.sample(len(self._si), min(k, len(self._si))) ]
+        for (n, m, data) in edges:
+            self._si.remove(n, m)
+            self._rewire(n, m)
         
-        returns: the transition vector'''
+        # update the transition rates
+        self._update_rates()
+        return len(edges)
+        
+    def _rewire( self, n, m ):
+        '''Rewire an SI edge that has been removed from the si index.
+        
+        n: the infected node
+        m: the susceptible node'''
+        
+        # remove the edge from the overall graph structure
+        self.remove_edges_from([(n, m)])
+        self.edge_removed(n, m)
+        self._two_hop.edge_changed(n, m)
+        
+        # Add a link to a new node, chosen from those 2 steps away (neighbours
+        # of neighbours) who are not infected
+        c = self._two_hop.sample(m, lambda c: self.node[c][self.DYNAMICAL_STATE] != self.INFECTED)
+        if c is not None:
+            self.add_edge(m, c)
+            self.edge_added(m, c)
+            self._two_hop.edge_changed(m, c)
+        
+    def _update_rates( self ):
+        '''Update the rates of the transition channels from the current
+        numbers of SI edges and infected nodes.'''
         
         # transitions are expressed as rates, whereas we're specified
         # in terms of probabilities, so we convert the latter to the former.
-        return [ (len(self._si) * self.p_infect,        lambda t: self.infect()),
-                 (len(self.POPULATION[self.INFECTED]) * self.p_recover, lambda t: self.recover()),
-                 (len(self._si) * self.p_rewire,        lambda t: self.rewire())]
-            
+        self.set_rate(self._infect_channel, len(self._si) * self.p_infect)
+        self.set_rate(self._recover_channel, len(self.POPULATION[self.INFECTED]) * self.p_recover)
+        self.set_rate(self._rewire_channel, len(self._si) * self.p_rewire)
 
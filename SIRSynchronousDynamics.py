@@ -4,6 +4,7 @@
 # In[1]:
 
 from GraphWithSynchronousDynamics import *
+import numpy
 
 
 # In[2]:
@@ -18,20 +19,24 @@ class SIRSynchronousDynamics(GraphWithSynchronousDynamics):
     INFECTED = 'infected'
     RECOVERED = 'recovered'
     
+    # state codes used by the sparse kernel
+    SPARSE_STATES = [ SUSCEPTIBLE, INFECTED, RECOVERED ]
     
-    def __init__( self, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, graph = None ):
+    
+    def __init__( self, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, graph = None, **kwargs ):
         '''Generate a graph with dynamics for the given parameters.
         
         p_infect: infection probability (defaults to 0.0)
         p_recover: probability of recovery (defaults to 1.0)
         p_infected: initial infection probability (defaults to 0.0)
-        graph: the graph to copy from (optional)'''
+        graph: the graph to copy from (optional)
+        kwargs: options for the dynamics, e.g. seed or record (optional)'''
         states = {self.SUSCEPTIBLE,self.INFECTED,self.RECOVERED}
         rates = dict()
         rates['p_infect'] = p_infect
         rates['p_recover'] = p_recover
         rates['p_infected'] = p_infected
-        GraphWithSynchronousDynamics.__init__(self, time_limit = time_limit, graph = graph, states = states, rates = rates)
+        GraphWithSynchronousDynamics.__init__(self, time_limit = time_limit, graph = graph, states = states, rates = rates, **kwargs)
         self.p_infected = p_infected
         self.p_infect = p_infect
         self.p_recover = p_recover
@@ -42,7 +47,7 @@ class SIRSynchronousDynamics(GraphWithSynchronousDynamics):
         as unoccupied by the dynamics.'''
         self._infected = []       # in case we re-run from a dirty intermediate state
         for n in self.node.keys():
-            if numpy.random.random() <= self.p_infected:
+            if self._rng.random() <= self.p_infected:
                 self.node[n][self.DYNAMICAL_STATE] = self.INFECTED
             else:
                 self.node[n][self.DYNAMICAL_STATE] = self.SUSCEPTIBLE
@@ -60,8 +65,9 @@ class SIRSynchronousDynamics(GraphWithSynchronousDynamics):
         returns: the number of events that happened in this timestep'''
         events = 0
         
-        # run model dynamics on all infected nodes
-        for n in self.POPULATION[self.INFECTED]:
+        # run model dynamics on all infected nodes, taking a copy of the
+        # infected population as the model changes it as it goes
+        for n in list(self.POPULATION[self.INFECTED]):
             events += self.model(n)
         return events
             
@@ -76,32 +82,111 @@ class SIRSynchronousDynamics(GraphWithSynchronousDynamics):
         # infect susceptible neighbours with probability pInfect
         for (_, neighbour, data) in self.edges_iter(node_selected, data = True):
             if self.node[neighbour][self.DYNAMICAL_STATE] is self.SUSCEPTIBLE:
-                if numpy.random.random() <= self.p_infect:
+                if self._rng.random() <= self.p_infect:
                     events += 1
                     
                     # infect the node
                     self.update_node(neighbour,self.SUSCEPTIBLE,self.INFECTED)
                         
                     # label the edge we traversed as occupied
-                    data[self.OCCUPIED] = True
+                    self.occupy_edge(node_selected, neighbour, data)
     
         # recover with probability pRecover
-        if numpy.random.random() <= self.p_recover:
+        if self._rng.random() <= self.p_recover:
             # recover the node
             events = events + 1
             self.update_node(node_selected,self.INFECTED,self.RECOVERED)
                 
         return events
+    
+    def _sparse_before( self ):
+        '''Build the arrays used by the sparse kernel: the CSR adjacency,
+        taken from the compact backend or built from the networkx graph,
+        and an array of node states coded as indices into SPARSE_STATES.'''
+        topology = self.topology()
+        if topology is None:
+            topology = CompactTopology(self)
+            self._sparse_labels = [ topology.label(i) for i in xrange(topology.order()) ]
+        else:
+            # the compact backend already labels nodes 0 to N - 1
+            self._sparse_labels = None
+        self._sparse_offsets = topology.offsets().astype(numpy.int64)
+        self._sparse_neighbours = topology.neighbour_array()
+        codes = dict([ (s, i) for (i, s) in enumerate(self.SPARSE_STATES) ])
+        self._sparse_state = numpy.array([ codes[self.node[self._sparse_label(i)][self.DYNAMICAL_STATE]]
+                                           for i in xrange(topology.order()) ], dtype = numpy.int8)
+    
+    def _sparse_label( self, i ):
+        '''Return the node with index i in the sparse kernel's arrays.'''
+        if self._sparse_labels is None:
+            return i
+        return self._sparse_labels[i]
+    
+    def _sparse_step( self ):
+        '''Run a step of the SIR dynamics as vector operations. Every edge
+        out of an infected node to a susceptible node is tried at once, and
+        a susceptible node infected along several edges takes one of them
+        at random as the one that's occupied; every infected node then
+        tries to recover.
+        Only the nodes that change state are then updated in the network,
+        so the populations, outbreaks and stopping criteria see the same
+        changes as they would from model().
+        
+        returns: the number of events that happened in this timestep'''
+        state = self._sparse_state
+        offsets = self._sparse_offsets
+        infected = numpy.flatnonzero(state == 1)
+        if len(infected) == 0:
+            return 0
+        
+        # gather the edges out of the infected nodes
+        starts = offsets[infected]
+        degrees = offsets[infected + 1] - starts
+        total = int(degrees.sum())
+        sources = numpy.repeat(infected, degrees)
+        slots = numpy.arange(total) - numpy.repeat(numpy.cumsum(degrees) - degrees, degrees) + numpy.repeat(starts, degrees)
+        targets = self._sparse_neighbours[slots]
+        
+        # try to infect the susceptible ends
+        susceptible = (state[targets] == 0)
+        (sources, targets) = (sources[susceptible], targets[susceptible])
+        slots = slots[susceptible]
+        transmitted = (self._rng.random_sample(len(targets)) <= self.p_infect)
+        (sources, targets, slots) = (sources[transmitted], targets[transmitted], slots[transmitted])
+        
+        # a node infected along several edges takes one of them at random
+        shuffle = numpy.argsort(self._rng.random_sample(len(targets)))
+        (sources, targets, slots) = (sources[shuffle], targets[shuffle], slots[shuffle])
+        (targets, first) = numpy.unique(targets, return_index = True)
+        (sources, slots) = (sources[first], slots[first])
+        
+        # recover infected nodes
+        recovered = infected[self._rng.random_sample(len(infected)) <= self.p_recover]
+        
+        # apply the changes to the arrays and the network
+        state[targets] = 1
+        state[recovered] = 2
+        if self._sparse_labels is None:
+            # on the compact backend the occupied edges can be marked all at once
+            self.adj.occupy_slots(slots)
+            for (u, v) in zip(sources.tolist(), targets.tolist()):
+                self.update_node(v, self.SUSCEPTIBLE, self.INFECTED)
+                self._outbreaks.union(u, v)
+        else:
+            for (u, v) in zip(sources.tolist(), targets.tolist()):
+                n = self._sparse_labels[u]
+                m = self._sparse_labels[v]
+                self.update_node(m, self.SUSCEPTIBLE, self.INFECTED)
+                self.occupy_edge(n, m, self.adj[n][m])
+        for u in recovered.tolist():
+            self.update_node(self._sparse_label(u), self.INFECTED, self.RECOVERED)
+        return len(targets) + len(recovered)
             
-    def at_equilibrium( self ):
+    def stopping_criterion( self ):
         '''SIR dynamics is at equilibrium if there are no more
         infected nodes left in the network or if we've exceeded
         the default simulation length.
         
-        returns: True if the model has stopped'''
-        
-        if self.CURRENT_TIMESTEP >= self._time_limit:
-            return True
-        else:
-            return (len(self.POPULATION[self.INFECTED]) == 0)
+        returns: the stopping criterion'''
+        return TimeLimit(self._time_limit) | Extinction(self.INFECTED)
 
@@ -0,0 +1,34 @@
+
+# coding: utf-8
+
+# In[1]:
+
+from SynchronousEnsemble import *
+
+
+# In[2]:
+
+class SIRSynchronousEnsemble(SynchronousEnsemble):
+    '''An ensemble of replicas of SIR dynamics run synchronously, with
+    the same dynamics as SIRSynchronousDynamics.'''
+
+    # the possible dynamics states of a node for SIR dynamics
+    SUSCEPTIBLE = 'susceptible'
+    INFECTED = 'infected'
+    RECOVERED = 'recovered'
+    STATES = [ SUSCEPTIBLE, INFECTED, RECOVERED ]
+    REMOVED = RECOVERED
+
+    def _step( self, infected ):
+        '''Infect susceptible neighbours with probability p_infect, and
+        recover infected nodes with probability p_recover.
+
+        infected: the flat indices of the infected nodes
+        returns: the infections and recoveries'''
+        (sources, targets) = self._infections(infected)
+        recovered = infected[self._rng.random_sample(len(infected)) <= self.p_recover]
+
+        state = self._state.ravel()
+        state[targets] = self.code(self.INFECTED)
+        state[recovered] = self.code(self.RECOVERED)
+        return (sources, targets, [ (self.INFECTED, self.RECOVERED, recovered) ])
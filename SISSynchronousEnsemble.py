@@ -0,0 +1,35 @@
+
+# coding: utf-8
+
+# In[1]:
+
+from SynchronousEnsemble import *
+
+
+# In[2]:
+
+class SISSynchronousEnsemble(SynchronousEnsemble):
+    '''An ensemble of replicas of SIS dynamics run synchronously. At each
+    timestep infected nodes infect their susceptible neighbours and then
+    may recover, becoming susceptible again.'''
+
+    # the possible dynamics states of a node for SIS dynamics
+    SUSCEPTIBLE = 'susceptible'
+    INFECTED = 'infected'
+    STATES = [ SUSCEPTIBLE, INFECTED ]
+    # nodes are never removed, so the epidemic's size is its final prevalence
+    REMOVED = INFECTED
+
+    def _step( self, infected ):
+        '''Infect susceptible neighbours with probability p_infect, and
+        return infected nodes to susceptible with probability p_recover.
+
+        infected: the flat indices of the infected nodes
+        returns: the infections and recoveries'''
+        (sources, targets) = self._infections(infected)
+        recovered = infected[self._rng.random_sample(len(infected)) <= self.p_recover]
+
+        state = self._state.ravel()
+        state[targets] = self.code(self.INFECTED)
+        state[recovered] = self.code(self.SUSCEPTIBLE)
+        return (sources, targets, [ (self.INFECTED, self.SUSCEPTIBLE, recovered) ])
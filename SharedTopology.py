@@ -0,0 +1,64 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import os
+import shutil
+import tempfile
+
+# array-backed networks
+from CompactTopology import *
+
+
+# In[2]:
+
+class SharedTopology(object):
+    '''A handle on a CompactTopology published into shared memory, so that
+    one network can be used by many simulations in many worker processes
+    without each building or copying it. The driver publishes the CSR
+    arrays (and the edge numbers) once as files, in /dev/shm where there
+    is one, and the handle, which only holds the names of the files,
+    is passed to the workers, which attach to the arrays read-only by
+    mapping them into memory. Each simulation then layers its own state
+    over the shared arrays: CompactNodes and CompactAdjacency for the
+    states and occupied edges, and an OverlayAdjacency for models that
+    change the edges. The driver unlinks the files when it's finished.'''
+
+    # the topologies attached in this process, by directory
+    _attached = dict()
+
+    def __init__( self, topology, directory = None ):
+        '''Publish a topology.
+
+        topology: the topology, or a networkx graph to make one from
+        directory: the directory to publish into (defaults to a new
+        directory in /dev/shm if there is one, else in the temporary directory)'''
+        if not isinstance(topology, CompactTopology):
+            topology = CompactTopology(topology)
+        if directory is None:
+            shm = '/dev/shm'
+            directory = tempfile.mkdtemp(prefix = 'topology-', dir = shm if os.path.isdir(shm) else None)
+        self._directory = directory
+        topology.save(directory)
+
+    def directory( self ):
+        '''Return the directory the topology is published in.'''
+        return self._directory
+
+    def attach( self ):
+        '''Return the topology, mapping its arrays read-only into memory. A
+        process only maps a topology once, however many times it's attached.
+
+        returns: the CompactTopology'''
+        topology = self._attached.get(self._directory)
+        if topology is None:
+            topology = CompactTopology.load(self._directory)
+            self._attached[self._directory] = topology
+        return topology
+
+    def unlink( self ):
+        '''Remove the published files. Processes that have already attached
+        keep their mappings until they exit.'''
+        self._attached.pop(self._directory, None)
+        shutil.rmtree(self._directory, ignore_errors = True)
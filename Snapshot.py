@@ -0,0 +1,152 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import numpy
+
+# array-backed networks
+from CompactTopology import *
+
+
+# In[2]:
+
+def pack_bits( flags ):
+    '''Pack an array of booleans into a bitset, bit k being bit (k & 7)
+    of byte (k >> 3), as in the occupied bitsets of the compact adjacencies.
+
+    flags: the booleans
+    returns: a numpy uint8 array of the bits'''
+    flags = numpy.asarray(flags, dtype = numpy.uint8)
+    padded = numpy.zeros(((len(flags) + 7) // 8) * 8, dtype = numpy.uint8)
+    padded[:len(flags)] = flags
+    return numpy.packbits(padded.reshape((-1, 8))[:, ::-1], axis = 1).ravel()
+
+def unpack_bits( bits, n ):
+    '''Unpack the first n bits of a bitset packed by pack_bits().
+
+    bits: the bitset, as a numpy uint8 array
+    n: the number of bits
+    returns: a numpy boolean array'''
+    bits = numpy.asarray(bits, dtype = numpy.uint8)
+    return numpy.unpackbits(bits.reshape((-1, 1)), axis = 1)[:, ::-1].ravel()[:n].astype(bool)
+
+
+class Snapshot(object):
+    '''A copy of the state of a graph with dynamics, held in arrays, from
+    which the graph can be restored. A snapshot holds the network as a
+    CompactTopology, the state of each node as an array of codes, the
+    occupied edges as a bitset over the slots of the topology, the
+    simulation clock, and the order of the nodes in each population and
+    of any other indexes the model keeps, so that a restored simulation
+    draws the same nodes and edges as the original would have. For the
+    same reason, when a dynamics has changed the edges, the order of the
+    neighbours of each node is kept as well as the sorted topology.
+
+    Taking a snapshot before running the dynamics and restoring it before
+    each repetition lets repetitions on a fixed network cost only the
+    dynamics: with the compact backend, restoring a snapshot of a network
+    the graph is still using copies the arrays of states and occupied
+    edges in place, rather than building the graph again.'''
+
+    def __init__( self, topology, states, codes, occupied, timestep = 0.0, events = 0 ):
+        '''Create a snapshot. Snapshots are usually taken by
+        GraphWithDynamics.snapshot() rather than created directly.
+
+        topology: the network, as a CompactTopology
+        states: the list of states, in the order of their codes
+        codes: the state code of each node, or -1 for a node without a state
+        occupied: the occupied bitset over the slots of the topology
+        timestep: the simulation time (defaults to 0.0)
+        events: the number of events so far (defaults to 0)'''
+        self._topology = topology
+        self._states = list(states)
+        self._codes = codes
+        self._occupied = occupied
+        self._timestep = timestep
+        self._events = events
+        self._rows = None
+        self._populations = None
+        self._indexes = dict()
+
+    def topology( self ):
+        '''Return the network.'''
+        return self._topology
+
+    def states( self ):
+        '''Return the list of states, in the order of their codes.'''
+        return list(self._states)
+
+    def codes( self ):
+        '''Return the array of state codes of the nodes.'''
+        return self._codes
+
+    def codes_for( self, states ):
+        '''Return the array of state codes of the nodes for a different
+        ordering of the states.
+
+        states: the list of states in the new order
+        returns: the array of codes'''
+        if list(states) == self._states:
+            return self._codes
+        positions = dict([ (s, i) for (i, s) in enumerate(states) ])
+        recode = numpy.array([ positions[s] for s in self._states ] + [ -1 ], dtype = numpy.int8)
+        return recode[self._codes]
+
+    def occupied( self ):
+        '''Return the occupied bitset over the slots of the topology.'''
+        return self._occupied
+
+    def occupied_slots( self ):
+        '''Return an array of booleans for the slots of the topology.'''
+        return unpack_bits(self._occupied, len(self._topology.neighbour_array()))
+
+    def occupied_edges( self ):
+        '''Return an array of booleans for the edges of the topology,
+        numbered as by CompactTopology.edge_ids().'''
+        flags = numpy.zeros(self._topology.size(), dtype = bool)
+        flags[self._topology.edge_ids()] = self.occupied_slots()
+        return flags
+
+    def set_rows( self, rows ):
+        '''Record the order of the neighbours of each node.
+
+        rows: the neighbours of each node in order, in the rows of the topology'''
+        self._rows = rows
+
+    def rows( self ):
+        '''Return the neighbours of each node in order, in the rows of the
+        topology, or None if the order is that of the topology.'''
+        return self._rows
+
+    def timestep( self ):
+        '''Return the simulation time.'''
+        return self._timestep
+
+    def events( self ):
+        '''Return the number of events so far.'''
+        return self._events
+
+    def set_populations( self, populations ):
+        '''Record the order of the nodes in each population.
+
+        populations: a dict from state to an array of node indices'''
+        self._populations = populations
+
+    def populations( self ):
+        '''Return a dict from state to an array of the indices of the nodes
+        in the population, in order, or None if the populations weren't recorded.'''
+        return self._populations
+
+    def set_index( self, name, a ):
+        '''Record an index kept by the model, as an array or another picklable object.
+
+        name: the name of the index
+        a: the index'''
+        self._indexes[name] = a
+
+    def index( self, name ):
+        '''Return an index kept by the model, or None if it wasn't recorded.
+
+        name: the name of the index'''
+        return self._indexes.get(name)
@@ -0,0 +1,219 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import time
+import math
+
+
+# In[2]:
+
+class StoppingCriterion(object):
+    '''A test of whether a simulation should stop. Criteria are evaluated
+    after every event, so each keeps only O(1) running state, which is
+    reset at the start of each simulation. Criteria can be combined
+    using & (stop when all of them are met) and | (stop when any of
+    them is met).
+
+    Engines that move the simulation on by more than one event at a
+    time, such as tau-leaping, ask the criterion for its horizon, the
+    latest time and event count that can be reached without the
+    criterion being met, so as not to overshoot it. Criteria that can't
+    bound when they'll be met are simply tested after every move.'''
+
+    # no bound on when a criterion will be met
+    UNBOUNDED = (float('inf'), float('inf'))
+
+    def reset( self, g ):
+        '''Reset the running state at the start of a simulation.
+
+        g: the graph with dynamics'''
+        pass
+
+    def stop( self, g ):
+        '''Test whether the simulation should stop.
+
+        g: the graph with dynamics
+        returns: True if the simulation should stop'''
+        raise NotImplementedError('stop()')
+
+    def horizon( self, g ):
+        '''Return the latest simulation time and total number of events
+        that the simulation can be moved on to without this criterion
+        being met, assuming each event moves at most one node between
+        states. A criterion that is already met places no bound on the
+        others it's combined with. Defaults to no bound.
+
+        g: the graph with dynamics
+        returns: a (time, events) pair'''
+        return self.UNBOUNDED
+
+    def statistics( self ):
+        '''Return a dict of statistics computed from the running state.'''
+        return dict()
+
+    def __and__( self, other ):
+        return AllOf(self, other)
+
+    def __or__( self, other ):
+        return AnyOf(self, other)
+
+
+class TimeLimit(StoppingCriterion):
+    '''Stop once the simulation time reaches a limit.'''
+
+    def __init__( self, limit ):
+        '''limit: the time limit'''
+        self._limit = limit
+
+    def stop( self, g ):
+        return (g.CURRENT_TIMESTEP >= self._limit)
+
+    def horizon( self, g ):
+        if g.CURRENT_TIMESTEP >= self._limit:
+            return self.UNBOUNDED
+        return (self._limit, float('inf'))
+
+
+class Extinction(StoppingCriterion):
+    '''Stop once there are no nodes left in a state.'''
+
+    def __init__( self, state ):
+        '''state: the state, typically infected'''
+        self._state = state
+
+    def stop( self, g ):
+        return (len(g.POPULATION[self._state]) == 0)
+
+
+class DropFromPeak(StoppingCriterion):
+    '''Stop once the population of a state drops below a fraction of the
+    largest population it has reached so far. The peak and the time it
+    was first reached are reported as a statistic. Criteria are evaluated
+    after the clock has moved on past an event, so the time of the peak is
+    the time at which its population was recorded, as in the timeline.'''
+
+    def __init__( self, state, fraction, statistic = None ):
+        '''state: the state, typically infected
+        fraction: the fraction of the peak population
+        statistic: name of the peak statistic (defaults to 'peak_' followed by the state)'''
+        self._state = state
+        self._fraction = fraction
+        if statistic is None:
+            statistic = 'peak_' + state
+        self._statistic = statistic
+        self._peak = 0
+        self._peak_time = 0.0
+
+    def reset( self, g ):
+        self._peak = len(g.POPULATION[self._state])
+        self._peak_time = g.RECORDED_TIMESTEP
+
+    def stop( self, g ):
+        n = len(g.POPULATION[self._state])
+        if n > self._peak:
+            self._peak = n
+            self._peak_time = g.RECORDED_TIMESTEP
+        return (n < self._fraction * self._peak)
+
+    def horizon( self, g ):
+        # the population can only drop by one per event
+        n = len(g.POPULATION[self._state])
+        if n < self._fraction * self._peak:
+            return self.UNBOUNDED
+        return (float('inf'), g.CURRENT_EVENTS + int(math.floor(n - self._fraction * self._peak)))
+
+    def peak( self ):
+        '''Return the (time, population) of the peak so far.'''
+        return (self._peak_time, self._peak)
+
+    def statistics( self ):
+        return { self._statistic: self.peak() }
+
+
+class EventBudget(StoppingCriterion):
+    '''Stop once a given number of events have happened.'''
+
+    def __init__( self, events ):
+        '''events: the number of events'''
+        self._events = events
+
+    def stop( self, g ):
+        return (g.CURRENT_EVENTS >= self._events)
+
+    def horizon( self, g ):
+        if g.CURRENT_EVENTS >= self._events:
+            return self.UNBOUNDED
+        return (float('inf'), self._events)
+
+
+class WallClockBudget(StoppingCriterion):
+    '''Stop once the simulation has run for a given length of real time.
+    To keep the test cheap the clock is only read every few evaluations.'''
+
+    def __init__( self, seconds, check_every = 1000 ):
+        '''seconds: the real time allowed
+        check_every: number of evaluations between readings of the clock (defaults to 1000)'''
+        self._seconds = seconds
+        self._check_every = check_every
+        self._start = time.time()
+        self._calls = 0
+
+    def reset( self, g ):
+        self._start = time.time()
+        self._calls = 0
+
+    def stop( self, g ):
+        self._calls += 1
+        if self._calls < self._check_every:
+            return False
+        self._calls = 0
+        return (time.time() - self._start >= self._seconds)
+
+
+class AnyOf(StoppingCriterion):
+    '''Stop when any of a set of criteria is met. All the criteria are
+    evaluated every time, so that their running state stays up to date.'''
+
+    def __init__( self, *criteria ):
+        '''criteria: the criteria'''
+        self._criteria = list(criteria)
+
+    def reset( self, g ):
+        for c in self._criteria:
+            c.reset(g)
+
+    def stop( self, g ):
+        stopped = False
+        for c in self._criteria:
+            if c.stop(g):
+                stopped = True
+        return stopped
+
+    def horizon( self, g ):
+        # the earliest of the horizons, which is also safe when all must be met
+        (t, e) = self.UNBOUNDED
+        for c in self._criteria:
+            (tc, ec) = c.horizon(g)
+            t = min(t, tc)
+            e = min(e, ec)
+        return (t, e)
+
+    def statistics( self ):
+        stats = dict()
+        for c in self._criteria:
+            stats.update(c.statistics())
+        return stats
+
+
+class AllOf(AnyOf):
+    '''Stop when all of a set of criteria are met. All the criteria are
+    evaluated every time, so that their running state stays up to date.'''
+
+    def stop( self, g ):
+        stopped = True
+        for c in self._criteria:
+            if not c.stop(g):
+                stopped = False
+        return stopped
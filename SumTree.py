@@ -0,0 +1,93 @@
+
+# coding: utf-8
+
+# In[1]:
+
+class SumTree(object):
+    '''A binary sum-tree over a vector of non-negative rates, used to select
+    transitions in proportion to their rates. The rates are held at the leaves
+    of a complete binary tree laid out in a flat list, with each internal node
+    holding the sum of its children. Updating a rate and selecting a leaf
+    are both O(log K) for K rates, and the total rate is O(1).
+
+    Any object offering the same append(), update(), total() and find()
+    operations can be used as a transition selector.'''
+
+    def __init__( self, capacity = 4 ):
+        '''Create an empty tree.
+
+        capacity: initial number of leaves to allocate (optional)'''
+        self._capacity = 1
+        while self._capacity < capacity:
+            self._capacity *= 2
+        self._tree = [ 0.0 ] * (2 * self._capacity)
+        self._size = 0
+
+    def __len__( self ):
+        return self._size
+
+    def __getitem__( self, i ):
+        '''Return the i'th rate.'''
+        if i >= self._size:
+            raise IndexError(i)
+        return self._tree[self._capacity + i]
+
+    def append( self, rate = 0.0 ):
+        '''Add a new rate, growing the tree if needed.
+
+        rate: the rate
+        returns: the index of the new rate'''
+        if self._size == self._capacity:
+            self._grow()
+        i = self._size
+        self._size += 1
+        self.update(i, rate)
+        return i
+
+    def update( self, i, rate ):
+        '''Change the i'th rate, and the sums above it.
+
+        i: the index
+        rate: the new rate'''
+        j = self._capacity + i
+        tree = self._tree
+        tree[j] = rate
+        j = j // 2
+        while j >= 1:
+            tree[j] = tree[2 * j] + tree[2 * j + 1]
+            j = j // 2
+
+    def total( self ):
+        '''Return the sum of all the rates.'''
+        return self._tree[1]
+
+    def find( self, x ):
+        '''Find the index i such that the sum of the rates before i is
+        at most x, and the sum up to and including i exceeds x.
+
+        x: a number between 0 and total()
+        returns: the index'''
+        tree = self._tree
+        j = 1
+        while j < self._capacity:
+            left = tree[2 * j]
+            if (x < left) or (tree[2 * j + 1] <= 0.0):
+                j = 2 * j
+            else:
+                x -= left
+                j = 2 * j + 1
+        return j - self._capacity
+
+    def clear( self ):
+        '''Remove all rates.'''
+        self._tree = [ 0.0 ] * (2 * self._capacity)
+        self._size = 0
+
+    def _grow( self ):
+        '''Double the number of leaves, rebuilding the internal sums.'''
+        leaves = self._tree[self._capacity:self._capacity + self._size]
+        self._capacity *= 2
+        self._tree = [ 0.0 ] * (2 * self._capacity)
+        self._tree[self._capacity:self._capacity + len(leaves)] = leaves
+        for j in xrange(self._capacity - 1, 0, -1):
+            self._tree[j] = self._tree[2 * j] + self._tree[2 * j + 1]
@@ -0,0 +1,242 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import numpy
+import networkx
+import time
+
+# random numbers
+from RandomStream import *
+
+# array-backed networks
+from CompactTopology import *
+
+
+# In[2]:
+
+class SynchronousEnsemble(object):
+    '''A number of replicas of a synchronous dynamics on one network, run in
+    lock-step. Rather than building and running a graph with dynamics once
+    per repetition, the replicas share a single CompactTopology and their
+    node states are held together in an R x N matrix of state codes, so
+    each timestep is applied to every replica at once by array operations
+    and the Python overhead of a step is paid once rather than R times.
+
+    Each replica stops when it has no infected nodes left, and the ensemble
+    stops when all the replicas have stopped or the time limit is reached.
+    Replicas that have stopped take no further part, and their populations
+    are carried forward unchanged. The results are the same statistics a
+    single simulation returns, but as arrays with one entry per replica,
+    together with the (time, population) of each replica's peak of
+    infection and its final size, as r_infinity.
+
+    This is the base class for ensembles of particular dynamics, which
+    define the states and the step.'''
+
+    # the possible dynamical states of a node, in the order of their codes
+    STATES = []
+    # the state that nodes that are infected are in
+    INFECTED = None
+    # the state whose final proportion of the network is the size of the epidemic
+    REMOVED = None
+
+    def __init__( self, graph, replicas = 1, time_limit = 10000, p_infect = 0.0, p_recover = 1.0, p_infected = 0.0, seed = None ):
+        '''Create an ensemble on a network.
+
+        graph: the network, a networkx graph or a CompactTopology
+        replicas: the number of replicas (defaults to 1)
+        time_limit: maximum number of timesteps (defaults to 10000)
+        p_infect: infection probability (defaults to 0.0)
+        p_recover: probability of recovery (defaults to 1.0)
+        p_infected: initial infection probability (defaults to 0.0)
+        seed: seed for the ensemble's random numbers (optional)'''
+        if not isinstance(graph, CompactTopology):
+            graph = CompactTopology(graph)
+        self._topology = graph
+        self._replicas = replicas
+        self._time_limit = time_limit
+        self.p_infect = p_infect
+        self.p_recover = p_recover
+        self.p_infected = p_infected
+        self._rng = RandomStream(seed)
+        self._codes = dict([ (s, i) for (i, s) in enumerate(self.STATES) ])
+
+    def topology( self ):
+        '''Return the network the replicas share.'''
+        return self._topology
+
+    def replicas( self ):
+        '''Return the number of replicas.'''
+        return self._replicas
+
+    def code( self, s ):
+        '''Return the code used for a state in the state matrix.
+
+        s: the state'''
+        return self._codes[s]
+
+    def _before( self ):
+        '''Seed every replica with infected nodes, each node being infected
+        independently with probability p_infected.'''
+        r = self._replicas
+        n = self._topology.order()
+        seeded = (self._rng.random_sample(r * n) <= self.p_infected).reshape((r, n))
+        self._state = numpy.where(seeded, self.code(self.INFECTED), self.code(self.STATES[0])).astype(numpy.int8)
+
+    def _step( self, infected ):
+        '''Run a single timestep in all the replicas, changing the state
+        matrix. This is a placeholder to be re-defined by sub-classes.
+
+        infected: the flat indices of the infected nodes in the state matrix
+        returns: a tuple of the flat indices of the infecting and infected
+        nodes of each infection, and a list of (from, to, flat indices)
+        for the other changes of state'''
+        raise NotImplementedError('_step()')
+
+    def _infections( self, infected ):
+        '''Choose the infections made in a timestep. Every edge from an
+        infected node to a susceptible node in the same replica is tried at
+        once, and a node infected along several edges takes one at random.
+
+        infected: the flat indices of the infected nodes in the state matrix
+        returns: the flat indices of the infecting and infected nodes'''
+        n = self._topology.order()
+        offsets = self._offsets
+        (replicas, nodes) = numpy.divmod(infected, n)
+
+        # gather the edges out of the infected nodes
+        starts = offsets[nodes]
+        degrees = offsets[nodes + 1] - starts
+        total = int(degrees.sum())
+        sources = numpy.repeat(infected, degrees)
+        slots = numpy.arange(total) - numpy.repeat(numpy.cumsum(degrees) - degrees, degrees) + numpy.repeat(starts, degrees)
+        targets = numpy.repeat(replicas * n, degrees) + self._neighbours[slots]
+
+        # try to infect the susceptible ends
+        susceptible = (self._state.ravel()[targets] == self.code(self.STATES[0]))
+        (sources, targets) = (sources[susceptible], targets[susceptible])
+        transmitted = (self._rng.random_sample(len(targets)) <= self.p_infect)
+        (sources, targets) = (sources[transmitted], targets[transmitted])
+
+        # a node infected along several edges takes one of them at random
+        shuffle = numpy.argsort(self._rng.random_sample(len(targets)))
+        (sources, targets) = (sources[shuffle], targets[shuffle])
+        (targets, first) = numpy.unique(targets, return_index = True)
+        return (sources[first], targets)
+
+    def dynamics( self ):
+        '''Run all the replicas to completion.
+
+        returns: a dict of statistics, with an array of one entry per
+        replica for each per-simulation statistic'''
+        start_time = time.clock()
+        r = self._replicas
+        n = self._topology.order()
+        self._offsets = self._topology.offsets().astype(numpy.int64)
+        self._neighbours = self._topology.neighbour_array()
+        self._before()
+        infected_code = self.code(self.INFECTED)
+
+        # populations of each replica, recorded at every timestep
+        counts = numpy.zeros((r, len(self.STATES)), dtype = numpy.int64)
+        for (i, s) in enumerate(self.STATES):
+            counts[:, i] = (self._state == i).sum(axis = 1)
+        history = [ counts.copy() ]
+        events = numpy.zeros(r, dtype = numpy.int64)
+        timesteps = numpy.zeros(r, dtype = numpy.int64)
+        active = (counts[:, infected_code] > 0)
+
+        # the infections, as edges between flat indices, for the outbreaks
+        infectors = []
+        infectees = []
+
+        t = 0
+        while active.any() and (t < self._time_limit):
+            infected = numpy.flatnonzero(self._state.ravel() == infected_code)
+            (sources, targets, changes) = self._step(infected)
+            t += 1
+
+            # update the populations and event counts of each replica
+            infectors.append(sources)
+            infectees.append(targets)
+            changes = [ (self.STATES[0], self.INFECTED, targets) ] + changes
+            for (before, after, nodes) in changes:
+                k = numpy.bincount(nodes // n, minlength = r)
+                counts[:, self.code(before)] -= k
+                counts[:, self.code(after)] += k
+                events += k
+            history.append(counts.copy())
+
+            # replicas that are still running take this timestep
+            timesteps[active] = t
+            active = (counts[:, infected_code] > 0)
+        end_time = time.clock()
+
+        # construct the statistics
+        stats = dict()
+        stats['replicas'] = r
+        stats['number_of_nodes'] = n
+        stats['start_time'] = start_time
+        stats['end_time'] = end_time
+        stats['duration'] = end_time - start_time
+        stats['timesteps'] = timesteps
+        stats['events'] = events
+        stats['times'] = numpy.arange(t + 1)
+        history = numpy.array(history)
+        for (i, s) in enumerate(self.STATES):
+            stats[s + '_distribution'] = history[:, :, i].T
+        infecteds = stats[self.INFECTED + '_distribution']
+        stats['peak_infection'] = (infecteds.argmax(axis = 1), infecteds.max(axis = 1))
+        stats['r_infinity'] = (counts[:, self.code(self.REMOVED)] + 0.0) / n
+        stats.update(self._outbreak_statistics(numpy.concatenate(infectors), numpy.concatenate(infectees)))
+        return stats
+
+    def _outbreak_statistics( self, us, vs ):
+        '''Compute the outbreak sizes of every replica from the infections.
+
+        us: the flat indices of the infecting nodes
+        vs: the flat indices of the infected nodes
+        returns: a dict of outbreak statistics, one entry per replica'''
+        r = self._replicas
+        n = self._topology.order()
+        sizes = numpy.bincount(self._components(r * n, us, vs), minlength = r * n).reshape((r, n))
+        outbreaks = (sizes > 0).sum(axis = 1)
+
+        stats = dict()
+        stats['mean_outbreak_size'] = (n + 0.0) / outbreaks
+        stats['max_outbreak_size'] = sizes.max(axis = 1)
+        stats['max_outbreak_proportion'] = (sizes.max(axis = 1) + 0.0) / n
+        distributions = []
+        for i in xrange(r):
+            (size, number) = numpy.unique(sizes[i][sizes[i] > 0], return_counts = True)
+            distributions.append(dict(zip(size.tolist(), number.tolist())))
+        stats['outbreak_size_distribution'] = distributions
+        return stats
+
+    def _components( self, n, us, vs ):
+        '''Label the connected components of a set of edges by the smallest
+        node in each. Every node takes the smallest label of its neighbours,
+        as does the node its label points to, and labels are then followed
+        to their ends, until no label changes.
+
+        n: the number of nodes
+        us: the first endpoint of each edge
+        vs: the second endpoint of each edge
+        returns: an array of the component label of each node'''
+        labels = numpy.arange(n)
+        while True:
+            (lu, lv) = (labels[us], labels[vs])
+            smallest = numpy.minimum(lu, lv)
+            hooked = labels.copy()
+            for ends in (us, vs, lu, lv):
+                numpy.minimum.at(hooked, ends, smallest)
+            while True:
+                jumped = hooked[hooked]
+                if (jumped == hooked).all():
+                    break
+                hooked = jumped
+            if (hooked == labels).all():
+                return labels
+            labels = hooked
@@ -0,0 +1,137 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import numpy
+
+
+# In[2]:
+
+class Timeline(object):
+    '''A record of the populations of each state over the course of a
+    simulation, held in growable numpy arrays: one column of times, one
+    column of event counts, and one column of population counts per state.
+
+    Three recording modes are available:
+    'event': record a row every time the populations are recorded
+    'grid': record a row at each multiple of a fixed time step, carrying
+    the last recorded populations forward to the grid points
+    'every': record a row every k'th time the populations are recorded
+
+    In the 'grid' and 'every' modes, the event count in each row is the
+    total number of events since the previous row.'''
+
+    # the recording modes
+    MODES = ['event', 'grid', 'every']
+
+    def __init__( self, states, mode = 'event', step = 1, capacity = 1024 ):
+        '''Create an empty timeline.
+
+        states: the states whose populations are recorded
+        mode: the recording mode, 'event', 'grid' or 'every' (defaults to 'event')
+        step: for 'grid' mode the time between rows, for 'every' mode the
+        number of records per row (defaults to 1)
+        capacity: initial number of rows to allocate (optional)'''
+        if mode not in self.MODES:
+            raise ValueError('Unknown recording mode {m}'.format(m = mode))
+        self._states = list(states)
+        self._columns = dict([ (s, i) for (i, s) in enumerate(self._states) ])
+        self._mode = mode
+        self._step = step
+        self._times = numpy.zeros(capacity)
+        self._events = numpy.zeros(capacity, dtype = numpy.int64)
+        self._counts = numpy.zeros((capacity, len(self._states)), dtype = numpy.int64)
+        self._size = 0
+
+        # pending state for the 'grid' and 'every' modes
+        self._next_grid_time = 0.0
+        self._last_time = 0.0
+        self._last_counts = None
+        self._pending_events = 0
+        self._calls = 0
+
+    def __len__( self ):
+        return self._size
+
+    def states( self ):
+        '''Return the states in column order.'''
+        return list(self._states)
+
+    def record( self, t, counts, events = 0 ):
+        '''Record the populations at a given time.
+
+        t: the time
+        counts: the population of each state, in the order of states()
+        events: the number of events since the last record (defaults to 0)'''
+        if self._mode == 'event':
+            self._append(t, counts, events)
+        elif self._mode == 'grid':
+            # fill in the grid points up to now with the last populations
+            while (self._last_counts is not None) and (self._next_grid_time < t):
+                self._append(self._next_grid_time, self._last_counts, self._pending_events)
+                self._pending_events = 0
+                self._next_grid_time += self._step
+            self._last_counts = tuple(counts)
+            self._pending_events += events
+        else:
+            self._pending_events += events
+            if self._calls % self._step == 0:
+                self._append(t, counts, self._pending_events)
+                self._pending_events = 0
+            else:
+                self._last_time = t
+                self._last_counts = tuple(counts)
+            self._calls += 1
+
+    def finish( self, t ):
+        '''Complete the timeline at the end of a simulation, filling in any
+        grid points up to and including the final time, or recording the
+        last populations if events have happened since the last row.
+
+        t: the final time'''
+        if (self._mode == 'grid') and (self._last_counts is not None):
+            while self._next_grid_time <= t:
+                self._append(self._next_grid_time, self._last_counts, self._pending_events)
+                self._pending_events = 0
+                self._next_grid_time += self._step
+        elif (self._mode == 'every') and (self._pending_events > 0):
+            self._append(self._last_time, self._last_counts, self._pending_events)
+            self._pending_events = 0
+
+    def times( self ):
+        '''Return the array of record times.'''
+        return self._times[:self._size]
+
+    def events( self ):
+        '''Return the array of event counts.'''
+        return self._events[:self._size]
+
+    def counts( self, s ):
+        '''Return the array of populations of a state.
+
+        s: the state'''
+        return self._counts[:self._size, self._columns[s]]
+
+    def peak( self, s ):
+        '''Return the (time, population) at which a state's population was
+        first at its largest, or None if nothing has been recorded.
+
+        s: the state'''
+        if self._size == 0:
+            return None
+        i = numpy.argmax(self.counts(s))
+        return (float(self._times[i]), int(self._counts[i, self._columns[s]]))
+
+    def _append( self, t, counts, events ):
+        '''Add a row, doubling the arrays if they are full.'''
+        if self._size == len(self._times):
+            capacity = 2 * len(self._times)
+            self._times = numpy.resize(self._times, capacity)
+            self._events = numpy.resize(self._events, capacity)
+            self._counts = numpy.resize(self._counts, (capacity, len(self._states)))
+        i = self._size
+        self._times[i] = t
+        self._events[i] = events
+        self._counts[i] = counts
+        self._size = i + 1
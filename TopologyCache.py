@@ -0,0 +1,168 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import os
+import shutil
+import tempfile
+import hashlib
+
+# array-backed networks
+from CompactTopology import *
+
+
+# In[2]:
+
+class TopologyCache(object):
+    '''A cache on disk of generated networks, so that a network built by
+    a random generator with given parameters and seed is only built once
+    across any number of sweeps and worker processes, and is then loaded
+    by mapping its CSR arrays into memory.
+
+    Each network is held in a directory named by a hash of the generator's
+    name, its parameters and the seed, in the format of CompactTopology.save().
+    A network is written into a temporary directory and then renamed into
+    place, which is atomic, so a concurrent reader sees either all of a
+    network or none of it; if two workers build the same network at once,
+    the first to rename wins and the other discards its copy. When the
+    cache grows beyond its budget, the least recently used networks are
+    removed, again by renaming them out of the way first.'''
+
+    # changed whenever the format on disk or the generators change, to ignore older entries
+    VERSION = 2
+
+    def __init__( self, directory, budget = 2 ** 30 ):
+        '''Create a cache, or open an existing one.
+
+        directory: the directory holding the cache
+        budget: the most bytes the cache may use (defaults to 1GB)'''
+        self._directory = directory
+        self._budget = budget
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another process got there first
+                if not os.path.isdir(directory):
+                    raise
+
+    def key( self, generator, params, seed ):
+        '''Return the key of a network.
+
+        generator: the name of the generator
+        params: a dict of the generator's parameters
+        seed: the seed
+        returns: the key'''
+        description = repr((self.VERSION, generator, sorted(params.items()), seed))
+        return hashlib.sha1(description).hexdigest()
+
+    def _entry( self, key ):
+        '''Return the directory of an entry.'''
+        return os.path.join(self._directory, key)
+
+    def get( self, generator, params, seed ):
+        '''Return a network from the cache, mapped read-only into memory.
+
+        generator: the name of the generator
+        params: a dict of the generator's parameters
+        seed: the seed
+        returns: the CompactTopology, or None if it isn't in the cache'''
+        entry = self._entry(self.key(generator, params, seed))
+        try:
+            topology = CompactTopology.load(entry)
+            # mark as recently used
+            os.utime(entry, None)
+            return topology
+        except (IOError, OSError):
+            # not there, or removed as we looked
+            return None
+
+    def put( self, generator, params, seed, topology ):
+        '''Add a network to the cache, and then remove the least recently
+        used networks if the cache is over its budget.
+
+        generator: the name of the generator
+        params: a dict of the generator's parameters
+        seed: the seed
+        topology: the network, as a CompactTopology'''
+        entry = self._entry(self.key(generator, params, seed))
+        temporary = tempfile.mkdtemp(prefix = '.new-', dir = self._directory)
+        topology.save(temporary)
+        try:
+            os.rename(temporary, entry)
+        except OSError:
+            # another process has already added it
+            shutil.rmtree(temporary, ignore_errors = True)
+        self.evict(keep = entry)
+
+    def topology( self, generator, params, seed, build ):
+        '''Return a network from the cache, building and adding it if it
+        isn't there.
+
+        generator: the name of the generator
+        params: a dict of the generator's parameters
+        seed: the seed
+        build: a function taking no arguments that builds the network, as
+        a CompactTopology or a networkx graph
+        returns: the CompactTopology, mapped read-only into memory'''
+        topology = self.get(generator, params, seed)
+        if topology is None:
+            topology = build()
+            if not isinstance(topology, CompactTopology):
+                topology = CompactTopology(topology)
+            self.put(generator, params, seed, topology)
+            cached = self.get(generator, params, seed)
+            if cached is not None:
+                topology = cached
+        return topology
+
+    def entries( self ):
+        '''Return a list of (last use, bytes, directory) for the networks in
+        the cache, least recently used first.'''
+        entries = []
+        for name in os.listdir(self._directory):
+            if name.startswith('.'):
+                continue
+            entry = self._entry(name)
+            try:
+                size = sum([ os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry) ])
+                entries.append((os.path.getmtime(entry), size, entry))
+            except OSError:
+                # removed as we looked
+                pass
+        entries.sort()
+        return entries
+
+    def size( self ):
+        '''Return the number of bytes used by the cache.'''
+        return sum([ size for (_, size, _) in self.entries() ])
+
+    def evict( self, keep = None ):
+        '''Remove the least recently used networks until the cache is
+        within its budget. Processes that have a removed network mapped
+        into memory keep it until they're done with it.
+
+        keep: a directory not to remove (optional)'''
+        entries = self.entries()
+        total = sum([ size for (_, size, _) in entries ])
+        for (_, size, entry) in entries:
+            if total <= self._budget:
+                break
+            if entry == keep:
+                continue
+            doomed = tempfile.mkdtemp(prefix = '.old-', dir = self._directory)
+            try:
+                os.rename(entry, os.path.join(doomed, 'entry'))
+                total -= size
+            except OSError:
+                # removed by another process
+                pass
+            shutil.rmtree(doomed, ignore_errors = True)
+
+    def clear( self ):
+        '''Remove every network from the cache.'''
+        budget = self._budget
+        self._budget = 0
+        self.evict()
+        self._budget = budget
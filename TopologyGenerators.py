@@ -0,0 +1,166 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import numpy
+
+# array-backed networks
+from CompactTopology import *
+
+
+# In[2]:
+
+def barabasi_albert_topology( n, m, seed = None ):
+    '''Build a Barabasi-Albert network by preferential attachment, as
+    networkx.barabasi_albert_graph() does but with array operations, so
+    that networks of millions of nodes take seconds rather than minutes.
+
+    The network starts with m nodes, and each node after that is joined
+    to m distinct earlier nodes chosen with probability proportional to
+    their degree. As in networkx, nodes are chosen from the list of the
+    ends of all the edges so far, in which each node is repeated once per
+    edge. The list is preallocated, with two positions per edge: the even
+    position holds the new node, and the odd position the node it chose,
+    which is itself drawn as a uniformly random earlier position. Rather
+    than filling the list in order, every edge draws its position at once
+    and the chains of odd positions are followed back to an even one (or
+    to the first node's edges) all together, so the whole network is built
+    in a few passes. A node that chooses the same node twice redraws,
+    until every node has m distinct neighbours.
+
+    n: the number of nodes
+    m: the number of edges added with each node
+    seed: the seed for the network (optional, defaults to a random network)
+    returns: the network, as a CompactTopology'''
+    if (m < 1) or (m >= n):
+        raise ValueError('Barabasi-Albert networks need 1 <= m < n, not m = {m}, n = {n}'.format(m = m, n = n))
+    rng = numpy.random.RandomState(seed)
+    edges = m * (n - m)
+
+    # the node that adds each edge, and the number of positions before it
+    sources = m + numpy.arange(edges, dtype = numpy.int64) // m
+    earlier = 2 * m * (sources - m)
+
+    # the first node joins all the starting nodes; the rest draw positions
+    positions = numpy.zeros(edges, dtype = numpy.int64)
+    targets = numpy.arange(edges, dtype = numpy.int64)
+    redraw = numpy.arange(m, edges)
+    while len(redraw) > 0:
+        positions[redraw] = (rng.random_sample(len(redraw)) * earlier[redraw]).astype(numpy.int64)
+        targets = _follow_positions(positions, m)
+
+        # redraw the repeated choices of each node
+        chosen = targets[m:].reshape((n - m - 1, m))
+        order = numpy.argsort(chosen, axis = 1, kind = 'mergesort')
+        ranked = chosen[numpy.arange(n - m - 1)[:, numpy.newaxis], order]
+        repeats = numpy.zeros(chosen.shape, dtype = bool)
+        repeats[:, 1:] = (ranked[:, 1:] == ranked[:, :-1])
+        rows = numpy.nonzero(repeats)[0]
+        redraw = m + rows * m + order[repeats]
+    return CompactTopology.from_edges(n, sources, targets)
+
+
+def _follow_positions( positions, m ):
+    '''Find the node chosen by each edge of a Barabasi-Albert network
+    from the positions the edges drew, by following chains of odd
+    positions back to even positions, or to the first node's edges.
+
+    positions: the position drawn by each edge
+    m: the number of edges added with each node
+    returns: the node chosen by each edge'''
+    targets = numpy.arange(len(positions), dtype = numpy.int64)
+    pending = numpy.arange(m, len(positions))
+    p = positions[pending]
+    while len(pending) > 0:
+        (e, odd) = numpy.divmod(p, 2)
+
+        # an even position holds the node that added the edge
+        even = (odd == 0)
+        targets[pending[even]] = m + e[even] // m
+
+        # the first node's edges chose the starting nodes
+        first = ~even & (e < m)
+        targets[pending[first]] = e[first]
+
+        # any other odd position holds whatever its own edge chose
+        chained = ~(even | first)
+        pending = pending[chained]
+        p = positions[e[chained]]
+    return targets
+
+
+def configuration_model_topology( n, alpha, k_min = 1, k_max = None, seed = None ):
+    '''Build a network with a power-law degree distribution by the
+    configuration model. Each node's degree is drawn independently with
+    probability proportional to k^-alpha for k_min <= k <= k_max, and
+    the ends of the edges ("stubs") are then shuffled and paired up.
+    Self-loops and repeated edges are dropped, so the degrees of the
+    largest hubs may come out a little lower than drawn.
+
+    n: the number of nodes
+    alpha: the exponent of the power law
+    k_min: the smallest degree (defaults to 1)
+    k_max: the largest degree (defaults to n - 1)
+    seed: the seed for the network (optional, defaults to a random network)
+    returns: the network, as a CompactTopology'''
+    if k_max is None:
+        k_max = n - 1
+    if (k_min < 1) or (k_max < k_min):
+        raise ValueError('Configuration models need 1 <= k_min <= k_max, not k_min = {a}, k_max = {b}'.format(a = k_min, b = k_max))
+    rng = numpy.random.RandomState(seed)
+
+    # draw the degrees by inverting the cumulative distribution
+    ks = numpy.arange(k_min, k_max + 1)
+    cdf = numpy.cumsum(ks.astype(numpy.float64) ** -alpha)
+    cdf /= cdf[-1]
+    degrees = ks[numpy.minimum(numpy.searchsorted(cdf, rng.random_sample(n), side = 'right'), len(ks) - 1)]
+
+    # the stubs have to pair up, so re-draw a degree until there's an even number
+    while degrees.sum() % 2 == 1:
+        i = rng.randint(n)
+        degrees[i] = ks[min(numpy.searchsorted(cdf, rng.random_sample(), side = 'right'), len(ks) - 1)]
+
+    # pair up the shuffled stubs
+    stubs = numpy.repeat(numpy.arange(n, dtype = numpy.int64), degrees)
+    rng.shuffle(stubs)
+    return CompactTopology.from_edges(n, stubs[0::2], stubs[1::2])
+
+
+def erdos_renyi_topology( n, p, seed = None ):
+    '''Build an Erdos-Renyi network, in which each of the n(n - 1)/2
+    possible edges is present independently with probability p. Rather
+    than testing every pair, the gaps between successive edges in a list
+    of all the pairs are drawn from the geometric distribution, so the
+    cost is proportional to the number of edges rather than of pairs.
+
+    n: the number of nodes
+    p: the probability of each edge
+    seed: the seed for the network (optional, defaults to a random network)
+    returns: the network, as a CompactTopology'''
+    if (p < 0.0) or (p > 1.0):
+        raise ValueError('Edge probabilities must be in [0, 1], not {p}'.format(p = p))
+    rng = numpy.random.RandomState(seed)
+    pairs = n * (n - 1) // 2
+
+    # skip along the list of pairs, in blocks of about the expected number of edges
+    found = []
+    if p > 0.0:
+        last = -1
+        while last < pairs:
+            remaining = (pairs - last) * p
+            skips = rng.geometric(p, size = int(remaining + 3 * numpy.sqrt(remaining)) + 16)
+            ks = last + numpy.cumsum(skips)
+            found.append(ks[ks < pairs])
+            last = ks[-1]
+    ks = numpy.concatenate(found) if len(found) > 0 else numpy.zeros(0, dtype = numpy.int64)
+
+    # pair k is (v, w) with w < v and k = v(v - 1)/2 + w
+    vs = ((1 + numpy.sqrt(1 + 8 * ks.astype(numpy.float64))) / 2).astype(numpy.int64)
+    ws = ks - vs * (vs - 1) // 2
+    # correct for rounding in the square root
+    vs[ws < 0] -= 1
+    ws = ks - vs * (vs - 1) // 2
+    vs[ws >= vs] += 1
+    ws = ks - vs * (vs - 1) // 2
+    return CompactTopology.from_edges(n, vs, ws)
@@ -0,0 +1,176 @@
+
+# coding: utf-8
+
+# In[1]:
+
+import itertools
+import collections
+
+
+# In[2]:
+
+class TwoHopSampler(object):
+    '''Chooses nodes uniformly at random from the two-hop neighbourhood of a
+    node (the neighbours of its neighbours, other than itself and its own
+    neighbours) without building the neighbourhood, which would take
+    O(sum of k^2) memory over the network.
+
+    A candidate is found by a random walk of length two, choosing the
+    intermediate node in proportion to its degree so that each node is
+    reached in proportion to the number of paths to it. Rather than adding
+    up the degrees of the neighbours, the intermediate node is chosen
+    uniformly and accepted with probability its degree over a bound on
+    their degrees: the largest of them for a node with few neighbours, or
+    else the largest degree in the network, which is kept up to date from
+    a count of the nodes of each degree. The second step then indexes
+    straight into the intermediate node's neighbours, in O(1) with the
+    compact backends. The candidate is accepted with probability one over
+    the number of paths to it, which makes the choice uniform, and rejected
+    if it isn't two hops away or isn't suitable. After a number of
+    rejections the neighbourhood is listed and a node chosen from it
+    exactly. Listed neighbourhoods can be kept in a bounded cache. The
+    sampler must be told about every edge that is added or removed, so
+    that it can keep the largest degree and discard the neighbourhoods
+    that change.'''
+
+    # nodes with at most this many neighbours bound their degrees by looking at them all
+    LOCAL_DEGREES = 64
+
+    def __init__( self, g, rng, attempts = 16, cache_size = 0 ):
+        '''Create a sampler.
+
+        g: the network
+        rng: the random stream
+        attempts: number of walks before listing the neighbourhood (defaults to 16)
+        cache_size: number of neighbourhoods to cache (defaults to 0, no cache)'''
+        self._g = g
+        self._rng = rng
+        self._attempts = attempts
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._degree_counts = None
+        self._largest = 0
+
+    def sample( self, m, suitable ):
+        '''Choose a node uniformly at random from those two hops from m that
+        are suitable.
+
+        m: the node
+        suitable: a function taking a node and returning True if it may be chosen
+        returns: the node, or None if there are no suitable nodes'''
+        adj = self._g.adj
+        neighbours = adj[m]
+        ns = list(neighbours)
+        if len(ns) == 0:
+            return None
+
+        # a bound on the degrees of the neighbours, to choose the middle of the walk
+        if len(ns) <= self.LOCAL_DEGREES:
+            largest = max([ len(adj[j]) for j in ns ])
+        else:
+            largest = self._largest_degree()
+
+        for attempt in xrange(self._attempts):
+            # walk two steps, choosing the middle in proportion to its degree
+            while True:
+                j = ns[self._rng.randint(len(ns))]
+                k = len(adj[j])
+                if self._rng.random() * largest < k:
+                    break
+            c = self._neighbour(adj, j, self._rng.randint(k))
+
+            # reject nodes that aren't two hops away or aren't suitable
+            if (c == m) or (c in neighbours) or not suitable(c):
+                continue
+
+            # accept in inverse proportion to the number of paths to the node
+            if self._rng.random() * self._common_neighbours(neighbours, adj[c]) < 1.0:
+                return c
+
+        # too many rejections, so list the neighbourhood
+        candidates = [ c for c in self.neighbourhood(m) if suitable(c) ]
+        if len(candidates) == 0:
+            return None
+        return candidates[self._rng.randint(len(candidates))]
+
+    def _largest_degree( self ):
+        '''Return the largest degree in the network, counting the nodes of
+        each degree the first time it's needed.'''
+        if self._degree_counts is None:
+            adj = self._g.adj
+            self._degree_counts = collections.Counter([ len(adj[n]) for n in adj ])
+            self._largest = max(self._degree_counts.keys() + [ 0 ])
+        return self._largest
+
+    def _degree_changed( self, old, new ):
+        '''Move a node between the counts of nodes of each degree, when its
+        degree changes by one.
+
+        old: the degree before
+        new: the degree after'''
+        counts = self._degree_counts
+        counts[old] -= 1
+        if counts[old] == 0:
+            del counts[old]
+        counts[new] += 1
+        if new > self._largest:
+            self._largest = new
+        elif (old == self._largest) and (old not in counts):
+            self._largest = new
+
+    def _neighbour( self, adj, j, i ):
+        '''Return the i'th neighbour of j, indexing into the rows of the
+        compact backends, or stepping through the neighbour dict otherwise.'''
+        neighbour = getattr(adj, 'neighbour', None)
+        if neighbour is not None:
+            return neighbour(j, i)
+        return next(itertools.islice(adj[j], i, None))
+
+    def _common_neighbours( self, a, b ):
+        '''Count the nodes in both of two neighbour dicts.'''
+        if len(a) > len(b):
+            (a, b) = (b, a)
+        return len([ x for x in a if x in b ])
+
+    def neighbourhood( self, m ):
+        '''Return a list of the nodes two hops from m, that aren't m or its neighbours.
+
+        m: the node'''
+        if m in self._cache:
+            ns = self._cache.pop(m)
+            self._cache[m] = ns
+            return ns
+
+        adj = self._g.adj
+        neighbours = adj[m]
+        twohop = set()
+        for j in neighbours:
+            twohop.update(adj[j])
+        ns = [ c for c in twohop if (c != m) and (c not in neighbours) ]
+
+        if self._cache_size > 0:
+            if len(self._cache) >= self._cache_size:
+                self._cache.popitem(last = False)
+            self._cache[m] = ns
+        return ns
+
+    def edge_changed( self, u, v ):
+        '''Tell the sampler that an edge between u and v has been added or
+        removed, updating the count of nodes of each degree and discarding
+        the cached neighbourhoods that change, which are those of u, v and
+        their neighbours.
+
+        u: one end of the edge
+        v: the other end'''
+        adj = self._g.adj
+        if self._degree_counts is not None:
+            change = 1 if v in adj[u] else -1
+            for n in (u, v):
+                k = len(adj[n])
+                self._degree_changed(k - change, k)
+        if len(self._cache) == 0:
+            return
+        for n in (u, v):
+            self._cache.pop(n, None)
+            for j in adj[n]:
+                self._cache.pop(j, None)
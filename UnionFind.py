@@ -0,0 +1,107 @@
+
+# coding: utf-8
+
+# In[1]:
+
+class UnionFind(object):
+    '''A disjoint-set forest over the nodes of a network, used to track
+    outbreaks as the edges that transmit infection are occupied. Merging
+    two sets is near O(1) (union by size with path halving), and a
+    histogram of set sizes and the size of the largest set are kept up
+    to date as sets merge, so the outbreak statistics are available at
+    the end of a simulation without walking the graph.'''
+
+    def __init__( self, elements = [] ):
+        '''Create a forest with each element in a set on its own.
+
+        elements: the elements (optional)'''
+        self._parent = dict()
+        self._size = dict()
+        # number of sets of each size
+        self._histogram = dict()
+        self._sets = 0
+        self._max = 0
+        for e in elements:
+            self.add(e)
+
+    def __len__( self ):
+        return len(self._parent)
+
+    def __contains__( self, e ):
+        return e in self._parent
+
+    def add( self, e ):
+        '''Add an element in a set on its own, if it isn't already present.
+
+        e: the element'''
+        if e not in self._parent:
+            self._parent[e] = e
+            self._size[e] = 1
+            self._count(1, 1)
+            self._sets += 1
+            if self._max < 1:
+                self._max = 1
+
+    def find( self, e ):
+        '''Return the representative of the set containing an element.
+
+        e: the element'''
+        parent = self._parent
+        while parent[e] != e:
+            parent[e] = parent[parent[e]]
+            e = parent[e]
+        return e
+
+    def union( self, e, f ):
+        '''Merge the sets containing two elements.
+
+        e: the first element
+        f: the second element
+        returns: True if the sets were different'''
+        r = self.find(e)
+        s = self.find(f)
+        if r == s:
+            return False
+        if self._size[r] < self._size[s]:
+            (r, s) = (s, r)
+        self._parent[s] = r
+        self._count(self._size[r], -1)
+        self._count(self._size[s], -1)
+        self._size[r] += self._size.pop(s)
+        self._count(self._size[r], 1)
+        self._sets -= 1
+        if self._size[r] > self._max:
+            self._max = self._size[r]
+        return True
+
+    def size( self, e ):
+        '''Return the size of the set containing an element.
+
+        e: the element'''
+        return self._size[self.find(e)]
+
+    def sets( self ):
+        '''Return the number of sets.'''
+        return self._sets
+
+    def max_size( self ):
+        '''Return the size of the largest set.'''
+        return self._max
+
+    def mean_size( self ):
+        '''Return the mean size of the sets.'''
+        if self._sets == 0:
+            return 0.0
+        return (len(self._parent) + 0.0) / self._sets
+
+    def size_distribution( self ):
+        '''Return a dict mapping each set size to the number of sets of that size.'''
+        return dict(self._histogram)
+
+    def _count( self, size, delta ):
+        '''Adjust the number of sets of a given size.'''
+        n = self._histogram.get(size, 0) + delta
+        if n == 0:
+            del self._histogram[size]
+        else:
+            self._histogram[size] = n
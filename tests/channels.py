@@ -0,0 +1,43 @@
+# coding: utf-8
+
+from GraphWithStochasticDynamics import *
+
+
+class ChannelCounts(GraphWithStochasticDynamics):
+    '''A stochastic dynamics with no network effects, whose transition
+    channels have fixed rates and just count how often they fire, for
+    testing the engines. The channels declare that they don't change the
+    population, so that tau-leaping can leap over them.'''
+
+    STATE = 'node'
+
+    def __init__( self, rates, events = 10000, **kwargs ):
+        '''rates: the rate of each channel
+        events: the number of events to run (defaults to 10000)
+        kwargs: options for the stochastic engine'''
+        g = networkx.empty_graph(1)
+        GraphWithStochasticDynamics.__init__(self, graph = g, states = [ self.STATE ], **kwargs)
+        self._channel_rates = rates
+        self._events = events
+        self.fired = None
+
+    def before( self ):
+        for n in self.node.keys():
+            self.node[n][self.DYNAMICAL_STATE] = self.STATE
+        self.POPULATION = self.calculate_populations()
+        self.fired = [ 0 ] * len(self._channel_rates)
+        self.clear_transitions()
+        for (k, r) in enumerate(self._channel_rates):
+            self.add_transition(self._counter(k), r, changes = { self.STATE: 0 })
+
+    def _counter( self, k ):
+        '''Return a transition function that counts firings of channel k.'''
+        def fire():
+            self.fired[k] += 1
+        return fire
+
+    def after( self ):
+        pass
+
+    def stopping_criterion( self ):
+        return EventBudget(self._events)
@@ -0,0 +1,143 @@
+# coding: utf-8
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy
+
+from Checkpoint import *
+from TopologyGenerators import barabasi_albert_topology
+from SIRStochasticDynamics import SIRStochasticDynamics
+from SISStochasticDynamics import SISStochasticDynamics
+from SISStochasticDynamicsRewire import SISStochasticDynamicsRewire
+from SISStochasticDynamicsDisconnect import SISStochasticDynamicsDisconnect
+from SIRStochasticDynamicsRewireDegree import SIRStochasticDynamicsRewireDegree
+from SIRStochasticDynamicsRewireNeighbour import SIRStochasticDynamicsRewireNeighbour
+from SIRSynchronousDynamics import SIRSynchronousDynamics
+
+
+class Crash(Exception):
+    '''Raised to stop a run part-way through, as if its process had died.'''
+    pass
+
+
+def summary( stats ):
+    '''Return the parts of a run's statistics that should repeat exactly.'''
+    s = dict()
+    for k in [ 'events', 'timesteps', 'mean_outbreak_size', 'max_outbreak_size' ]:
+        s[k] = stats.get(k)
+    for k in stats.keys():
+        if k.endswith('_distribution') or (k == 'times'):
+            s[k] = numpy.asarray(stats[k]).tolist()
+    return s
+
+
+class CheckpointTest(unittest.TestCase):
+    '''Tests that a run that crashes can be resumed from its last checkpoint
+    and then follows exactly the trajectory it would have followed.'''
+
+    ADAPTIVE = [ (SISStochasticDynamicsRewire, dict(p_rewire = 0.3)),
+                 (SISStochasticDynamicsDisconnect, dict(p_rewire = 0.3)),
+                 (SIRStochasticDynamicsRewireDegree, dict(p_rewire = 0.3)),
+                 (SIRStochasticDynamicsRewireNeighbour, dict(p_rewire = 0.3, p_recover = 0.05)) ]
+    FIXED = [ (SISStochasticDynamics, dict()),
+              (SIRStochasticDynamics, dict()) ]
+
+    def setUp( self ):
+        self._directory = tempfile.mkdtemp()
+        self._file = os.path.join(self._directory, 'run.checkpoint')
+        self._t = barabasi_albert_topology(600, 3, seed = 11)
+
+    def tearDown( self ):
+        shutil.rmtree(self._directory)
+
+    def _model( self, cls, backend, engine, **kwargs ):
+        params = dict(p_infect = 0.2, p_recover = 0.5, p_infected = 0.05, time_limit = 20)
+        params.update(kwargs)
+        g = cls(engine = engine, backend = backend, seed = 3, **params)
+        if backend == 'compact':
+            g.copy_from(self._t)
+        else:
+            g.copy_from(self._t.to_networkx())
+        return g
+
+    def _crash( self, g, after ):
+        '''Make a model crash just after writing a number of checkpoints.'''
+        write = g.write_checkpoint
+        written = []
+        def write_then_crash( filename, events = 0 ):
+            write(filename, events)
+            written.append(events)
+            if len(written) == after:
+                raise Crash()
+        g.write_checkpoint = write_then_crash
+
+    def _check_resume( self, cls, backend, engine, **kwargs ):
+        expected = summary(self._model(cls, backend, engine, **kwargs).dynamics())
+
+        # crash after the second of about five checkpoints
+        every = max(expected['events'] // 5, 1)
+        g = self._model(cls, backend, engine, checkpoint = self._file, checkpoint_events = every, **kwargs)
+        self._crash(g, 2)
+        self.assertRaises(Crash, g.dynamics)
+
+        resumed = summary(self._model(cls, backend, engine, **kwargs).dynamics(resume_from = self._file))
+        self.assertEqual(resumed, expected, (cls.__name__, backend, engine))
+        self.assertEqual(os.listdir(self._directory), [ 'run.checkpoint' ])
+
+    def test_adaptive_compact( self ):
+        for engine in [ 'direct', 'nrm', 'tau' ]:
+            for (cls, kwargs) in self.ADAPTIVE:
+                self._check_resume(cls, 'compact', engine, **kwargs)
+
+    def test_fixed( self ):
+        for backend in [ 'networkx', 'compact' ]:
+            for engine in [ 'direct', 'nrm', 'tau' ]:
+                for (cls, kwargs) in self.FIXED:
+                    self._check_resume(cls, backend, engine, **kwargs)
+
+    def test_checkpointing_does_not_change_the_run( self ):
+        for (cls, kwargs) in self.ADAPTIVE[:1] + self.FIXED[:1]:
+            expected = summary(self._model(cls, 'compact', 'direct', **kwargs).dynamics())
+            g = self._model(cls, 'compact', 'direct', checkpoint = self._file, checkpoint_events = 100, **kwargs)
+            self.assertEqual(summary(g.dynamics()), expected)
+
+    def test_adaptive_networkx_refused( self ):
+        for (cls, kwargs) in self.ADAPTIVE:
+            self.assertRaises(ValueError, self._model, cls, 'networkx', 'direct', checkpoint = self._file, **kwargs)
+
+            # a checkpoint of a compact run can't be resumed with the networkx backend either
+            g = self._model(cls, 'compact', 'direct', checkpoint = self._file, checkpoint_events = 10, **kwargs)
+            self._crash(g, 1)
+            self.assertRaises(Crash, g.dynamics)
+            g = self._model(cls, 'networkx', 'direct', **kwargs)
+            self.assertRaises(ValueError, g.dynamics, resume_from = self._file)
+            self.assertRaises(ValueError, g.write_checkpoint, self._file)
+
+    def test_mismatched_engine( self ):
+        (cls, kwargs) = self.FIXED[0]
+        g = self._model(cls, 'compact', 'direct', checkpoint = self._file, checkpoint_events = 200, **kwargs)
+        self._crash(g, 1)
+        self.assertRaises(Crash, g.dynamics)
+        self.assertRaises(ValueError, self._model(cls, 'compact', 'nrm', **kwargs).dynamics, resume_from = self._file)
+
+    def test_unsupported_model( self ):
+        (cls, kwargs) = self.FIXED[0]
+        g = self._model(cls, 'compact', 'direct', checkpoint = self._file, checkpoint_events = 200, **kwargs)
+        self._crash(g, 1)
+        self.assertRaises(Crash, g.dynamics)
+        g = SIRSynchronousDynamics(graph = self._t.to_networkx())
+        self.assertRaises(NotImplementedError, g.dynamics, resume_from = self._file)
+
+    def test_old_version_refused( self ):
+        Checkpoint(None, dict()).save(self._file)
+        Checkpoint.VERSION += 1
+        try:
+            self.assertRaises(ValueError, Checkpoint.load, self._file)
+        finally:
+            Checkpoint.VERSION -= 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# coding: utf-8
+
+import unittest
+import pickle
+import shutil
+import tempfile
+import networkx
+import numpy
+
+from CompactTopology import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+
+
+def same_graph( g, h ):
+    '''Test whether two networkx graphs have the same nodes and edges.'''
+    return (sorted(g.nodes()) == sorted(h.nodes())) and (set(map(frozenset, g.edges())) == set(map(frozenset, h.edges())))
+
+
+class CompactTopologyTest(unittest.TestCase):
+    '''Tests of the CSR topology.'''
+
+    def setUp( self ):
+        self._g = networkx.barabasi_albert_graph(300, 3, seed = 1)
+
+    def _check( self, t, g ):
+        '''Check a topology against the graph it was built from.'''
+        self.assertEqual(t.order(), g.order())
+        self.assertEqual(t.size(), g.size())
+        self.assertTrue(same_graph(t.to_networkx(), g))
+        for l in g.nodes():
+            i = t.index(l)
+            self.assertEqual(t.label(i), l)
+            self.assertEqual(t.degree(i), g.degree(l))
+            ns = t.neighbours(i)
+            self.assertEqual(ns, sorted(ns))
+            self.assertEqual(set([ t.label(j) for j in ns ]), set(g.neighbors(l)))
+
+    def test_from_graph( self ):
+        self._check(CompactTopology(self._g), self._g)
+
+    def test_relabelled( self ):
+        g = networkx.relabel_nodes(self._g, dict([ (n, 'n%d' % n) for n in self._g.nodes() ]))
+        self._check(CompactTopology(g), g)
+
+    def test_from_edges( self ):
+        # self-loops and repeated edges are dropped
+        t = CompactTopology.from_edges(4, [ 0, 1, 1, 2, 3 ], [ 1, 0, 1, 3, 2 ])
+        self.assertEqual(t.size(), 2)
+        self.assertEqual(t.neighbours(1), [ 0 ])
+        self.assertEqual(t.neighbours(3), [ 2 ])
+
+    def test_slots( self ):
+        t = CompactTopology(self._g)
+        ids = t.edge_ids()
+        self.assertEqual(sorted(set(ids.tolist())), range(t.size()))
+        slots = numpy.arange(2 * t.size())
+        reverse = t.reverse_slots(slots)
+        self.assertTrue((reverse[reverse] == slots).all())
+        self.assertTrue((ids[reverse] == ids).all())
+        for i in xrange(t.order()):
+            for j in t.neighbours(i):
+                k = t.slot(i, j)
+                self.assertEqual(t.neighbour_array()[k], j)
+                self.assertEqual(reverse[k], t.slot(j, i))
+        self.assertEqual(t.slot(0, 0), -1)
+
+    def test_save_and_load( self ):
+        g = networkx.relabel_nodes(self._g, dict([ (n, n * 2) for n in self._g.nodes() ]))
+        t = CompactTopology(g)
+        directory = tempfile.mkdtemp()
+        try:
+            t.save(directory)
+            u = CompactTopology.load(directory)
+            self.assertTrue(u.is_shared())
+            self.assertFalse(t.is_shared())
+            self._check(u, g)
+            self.assertTrue((u.edge_ids() == t.edge_ids()).all())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_pickle( self ):
+        t = CompactTopology(self._g)
+        self._check(pickle.loads(pickle.dumps(t, 2)), self._g)
+
+
+class CompactBackendTest(unittest.TestCase):
+    '''Tests of the node and edge views a model sees with the compact backend.'''
+
+    def test_views( self ):
+        g = networkx.barabasi_albert_graph(200, 3, seed = 2)
+        m = SIRStochasticDynamics(graph = g, p_infected = 0.05, p_infect = 0.3, p_recover = 0.5,
+                                  seed = 2, backend = 'compact')
+        self.assertTrue(same_graph(networkx.Graph(m.edges()), g))
+        for n in g.nodes():
+            self.assertEqual(sorted(m.neighbors(n)), sorted(g.neighbors(n)))
+        m.dynamics()
+        for n in m.nodes():
+            self.assertTrue(m.node[n][m.DYNAMICAL_STATE] in m.STATES)
+        
+        # the occupied flag is the same from either end of an edge
+        for (n, mp, data) in m.edges_iter(data = True):
+            self.assertEqual(data[m.OCCUPIED], m.adj[mp][n][m.OCCUPIED])
+        self.assertRaises(TypeError, m.remove_edge, 0, m.neighbors(0)[0])
+
+    def test_states( self ):
+        t = CompactTopology(networkx.path_graph(3))
+        nodes = CompactNodes(t, [ 'a', 'b' ], 'state')
+        self.assertFalse('state' in nodes[0])
+        self.assertRaises(KeyError, nodes[0].__getitem__, 'state')
+        nodes[1]['state'] = 'b'
+        self.assertEqual(nodes[1]['state'], 'b')
+        self.assertEqual(nodes.state_array().tolist(), [ -1, 1, -1 ])
+        self.assertRaises(KeyError, nodes.__getitem__, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
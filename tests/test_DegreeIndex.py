@@ -0,0 +1,105 @@
+# coding: utf-8
+
+import unittest
+import random
+import collections
+import networkx
+
+from DegreeIndex import *
+from RandomStream import RandomStream
+from SIRStochasticDynamicsRewireDegree import SIRStochasticDynamicsRewireDegree
+from SISStochasticDynamicsRewireDegree import SISStochasticDynamicsRewireDegree
+from StoppingCriteria import EventBudget
+
+
+class DegreeIndexTest(unittest.TestCase):
+    '''Tests of the index of nodes by state and degree.'''
+
+    def setUp( self ):
+        self._rng = random.Random(1)
+        self._stream = RandomStream(seed = 1)
+
+    def _nearest( self, truth, target, states, exclude ):
+        '''Return the set of nodes that nearest() may choose, by brute force.'''
+        candidates = [ n for (n, (s, d)) in truth.iteritems() if (s in states) and (n not in exclude) ]
+        if len(candidates) == 0:
+            return set()
+        best = min([ abs(truth[n][1] - target) for n in candidates ])
+        return set([ n for n in candidates if abs(truth[n][1] - target) == best ])
+
+    def test_random_operations( self ):
+        index = DegreeIndex()
+        truth = dict()
+        states = [ 'a', 'b', 'c' ]
+        for it in xrange(3000):
+            n = self._rng.randrange(60)
+            op = self._rng.random()
+            if n not in truth:
+                truth[n] = (self._rng.choice(states), self._rng.randrange(10))
+                index.add(n, truth[n][0], truth[n][1])
+            elif op < 0.3:
+                s = self._rng.choice(states)
+                index.set_state(n, s)
+                truth[n] = (s, truth[n][1])
+            elif op < 0.7:
+                delta = self._rng.choice([ -1, 1 ])
+                index.change_degree(n, delta)
+                truth[n] = (truth[n][0], truth[n][1] + delta)
+            elif op < 0.8:
+                index.remove(n)
+                del truth[n]
+            else:
+                target = self._rng.randrange(-2, 14)
+                ss = self._rng.sample(states, self._rng.randint(1, 3))
+                exclude = self._rng.sample(range(60), 5)
+                c = index.nearest(target, ss, exclude, self._stream)
+                expected = self._nearest(truth, target, ss, exclude)
+                if len(expected) == 0:
+                    self.assertEqual(c, None)
+                else:
+                    self.assertTrue(c in expected, (c, expected))
+        self.assertEqual(len(index), len(truth))
+        for (n, (s, d)) in truth.iteritems():
+            self.assertEqual((index.state(n), index.degree(n)), (s, d))
+
+    def test_uniform( self ):
+        index = DegreeIndex()
+        for n in xrange(10):
+            index.add(n, 'a', 3 if n < 4 else 7)
+        index.add(10, 'b', 5)
+        # degrees 3 and 7 are equally near 5, and nodes 1 and 10 are excluded
+        counts = collections.Counter([ index.nearest(5, [ 'a' ], [ 1, 10 ], self._stream) for _ in xrange(9000) ])
+        self.assertEqual(set(counts.keys()), set(range(10)) - set([ 1 ]))
+        for c in counts.values():
+            self.assertTrue(abs(c - 1000) < 5 * 1000 ** 0.5)
+
+    def test_mostly_excluded( self ):
+        index = DegreeIndex()
+        for n in xrange(10):
+            index.add(n, 'a', 2)
+        index.add(10, 'a', 9)
+        self.assertTrue(index.nearest(2, [ 'a' ], range(9), self._stream) == 9)
+        self.assertTrue(index.nearest(2, [ 'a' ], range(10), self._stream) == 10)
+        self.assertEqual(index.nearest(2, [ 'a' ], range(11), self._stream), None)
+        self.assertEqual(index.nearest(2, [ 'b' ], [], self._stream), None)
+
+
+class DegreeIndexDynamicsTest(unittest.TestCase):
+    '''Tests that the degree-rewiring models keep their index up to date,
+    including when events are applied in bulk by tau-leaping.'''
+
+    def test_index( self ):
+        g = networkx.barabasi_albert_graph(300, 3, seed = 3)
+        for cls in [ SIRStochasticDynamicsRewireDegree, SISStochasticDynamicsRewireDegree ]:
+            for (backend, engine) in [ ('networkx', 'direct'), ('compact', 'direct'), ('networkx', 'tau') ]:
+                m = cls(graph = g, p_infected = 0.05, p_infect = 0.3, p_recover = 0.5, p_rewire = 0.5,
+                        seed = 4, stopping = EventBudget(3000), backend = backend, engine = engine)
+                m.dynamics()
+                self.assertEqual(len(m._degrees), m.order())
+                for n in m.nodes():
+                    self.assertEqual(m._degrees.degree(n), m.degree(n))
+                    self.assertEqual(m._degrees.state(n), m.node[n][m.DYNAMICAL_STATE])
+
+
+if __name__ == '__main__':
+    unittest.main()
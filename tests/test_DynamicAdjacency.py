@@ -0,0 +1,138 @@
+# coding: utf-8
+
+import unittest
+import random
+import networkx
+
+from CompactTopology import *
+from SISStochasticDynamicsRewire import SISStochasticDynamicsRewire
+from StoppingCriteria import EventBudget
+
+
+class DynamicAdjacencyTest(unittest.TestCase):
+    '''Tests of the mutable adjacency over a compact topology, checked
+    against a networkx graph given the same changes.'''
+
+    KEY = 'occupied'
+
+    def _check( self, adj, g ):
+        '''Check an adjacency against a graph.'''
+        for n in g.nodes():
+            self.assertEqual(len(adj[n]), g.degree(n))
+            self.assertEqual(sorted(adj.neighbours(n)), sorted(g.neighbors(n)))
+            self.assertEqual([ adj.neighbour(n, i) for i in xrange(len(adj[n])) ], adj.neighbours(n))
+            for m in g.neighbors(n):
+                k = adj.find(n, m)
+                self.assertEqual(adj._neighbours[k], m)
+                # both directions of an edge share an id and occupied flag
+                self.assertEqual(adj._edge_ids[k], adj._edge_ids[adj.find(m, n)])
+                self.assertEqual(adj[n][m][self.KEY], g[n][m][self.KEY])
+            if n in adj._positions:
+                self.assertTrue(len(adj[n]) > adj.HUB_DEGREE // 2)
+            else:
+                self.assertTrue(len(adj[n]) <= adj.HUB_DEGREE)
+
+    def _random_changes( self, g, changes, seed, hub = None ):
+        '''Make random changes to a graph and an adjacency built from it,
+        optionally biased towards a hub, checking them against each other.'''
+        rng = random.Random(seed)
+        adj = DynamicAdjacency(CompactTopology(g), self.KEY)
+        for (n, m) in g.edges():
+            g[n][m][self.KEY] = False
+        nodes = g.nodes()
+        for it in xrange(changes):
+            n = rng.choice(nodes)
+            if (hub is not None) and (rng.random() < 0.5):
+                n = hub
+            m = rng.choice(nodes)
+            if n == m:
+                continue
+            if g.has_edge(n, m):
+                if rng.random() < 0.3:
+                    g[n][m][self.KEY] = True
+                    adj[n][m][self.KEY] = True
+                else:
+                    g.remove_edge(n, m)
+                    del adj[n][m]
+                    del adj[m][n]
+            else:
+                g.add_edge(n, m, { self.KEY: False })
+                adj.add(n, m, { self.KEY: False })
+                adj.add(m, n, { self.KEY: False })
+            self.assertEqual(adj.find(n, m) >= 0, g.has_edge(n, m))
+        self._check(adj, g)
+        return adj
+
+    def test_initial( self ):
+        g = networkx.barabasi_albert_graph(300, 3, seed = 1)
+        for (n, m) in g.edges():
+            g[n][m][self.KEY] = False
+        self._check(DynamicAdjacency(CompactTopology(g), self.KEY), g)
+
+    def test_random_changes( self ):
+        g = networkx.erdos_renyi_graph(100, 0.05, seed = 2)
+        adj = self._random_changes(g, 3000, 3)
+        self.assertEqual(adj.find(0, 0), -1)
+
+    def test_hub_grows_and_shrinks( self ):
+        # a node is added to and removed from until its row is well past
+        # the hub degree, and then back below it
+        g = networkx.empty_graph(200)
+        adj = DynamicAdjacency(CompactTopology(g), self.KEY)
+        for m in xrange(1, 150):
+            g.add_edge(0, m, { self.KEY: False })
+            adj.add(0, m, { self.KEY: False })
+            adj.add(m, 0, { self.KEY: False })
+        self.assertTrue(0 in adj._positions)
+        self._check(adj, g)
+        for m in xrange(1, 140):
+            g.remove_edge(0, m)
+            del adj[0][m]
+            del adj[m][0]
+            self.assertEqual(adj.find(0, m), -1)
+            self.assertEqual(adj.find(0, 149), adj._start[0] + adj.neighbours(0).index(149))
+        self.assertFalse(0 in adj._positions)
+        self._check(adj, g)
+
+    def test_hub_random_changes( self ):
+        g = networkx.barabasi_albert_graph(200, 2, seed = 4)
+        hub = max(g.nodes(), key = g.degree)
+        self._random_changes(g, 4000, 5, hub = hub)
+
+    def test_compact( self ):
+        g = networkx.barabasi_albert_graph(200, 2, seed = 6)
+        adj = self._random_changes(g, 2000, 7, hub = 0)
+        adj.compact()
+        self.assertEqual(adj._wasted, 0)
+        self._check(adj, g)
+
+    def test_free_ids_reused( self ):
+        g = networkx.path_graph(4)
+        adj = DynamicAdjacency(CompactTopology(g), self.KEY)
+        e = adj._edge_ids[adj.find(0, 1)]
+        adj[0][1][self.KEY] = True
+        del adj[0][1]
+        del adj[1][0]
+        adj.add(0, 2, dict())
+        adj.add(2, 0, dict())
+        self.assertEqual(adj._edge_ids[adj.find(0, 2)], e)
+        self.assertFalse(adj[0][2][self.KEY])
+
+
+class RewiringCompactTest(unittest.TestCase):
+    '''Tests that rewiring on the compact backend keeps the same network as
+    the model's own view of it.'''
+
+    def test_rewiring( self ):
+        g = networkx.barabasi_albert_graph(300, 3, seed = 8)
+        m = SISStochasticDynamicsRewire(graph = g, p_infected = 0.05, p_infect = 0.3, p_recover = 0.5,
+                                        p_rewire = 0.5, seed = 9, stopping = EventBudget(2000), backend = 'compact')
+        m.dynamics()
+        self.assertTrue(isinstance(m.adj, DynamicAdjacency))
+        self.assertEqual(m.size(), g.size())
+        for (n, mp) in m.edges():
+            self.assertTrue(n in m.adj[mp])
+
+
+if __name__ == '__main__':
+    unittest.main()
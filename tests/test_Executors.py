@@ -0,0 +1,102 @@
+# coding: utf-8
+
+import unittest
+import os
+import shutil
+import tempfile
+import pickle
+import sys
+import StringIO
+
+from Executors import *
+from BlobRunner import *
+
+
+def square( x ):
+    '''A function that can be pickled to send to other processes.'''
+    return x * x
+
+
+class ExecutorTest(unittest.TestCase):
+    '''Tests that the executors run a function over all its arguments.'''
+
+    def _check( self, executor ):
+        xs = range(50)
+        results = list(executor.imap_unordered(square, xs))
+        self.assertEqual(sorted([ i for (i, _) in results ]), xs)
+        for (i, r) in results:
+            self.assertEqual(r, xs[i] * xs[i])
+        self.assertEqual(executor.map(square, xs), [ x * x for x in xs ])
+        self.assertEqual(executor.map(square, []), [])
+
+    def test_serial( self ):
+        self._check(SerialExecutor())
+
+    def test_process_pool( self ):
+        for chunksize in [ None, 1, 7 ]:
+            executor = ProcessPoolExecutor(processes = 2, chunksize = chunksize)
+            try:
+                self._check(executor)
+            finally:
+                executor.close()
+
+
+class SweepTest(unittest.TestCase):
+    '''Tests that simulations can be sent to other processes and give the
+    same results there.'''
+
+    POINTS = [ dict(time_limit = 100, p_infected = 0.02, p_infect = p, p_recover = 0.3, seed = 1)
+               for p in [ 0.05, 0.1, 0.2 ] ]
+
+    def setUp( self ):
+        # the simulations write their results to the working directory
+        self._cwd = os.getcwd()
+        self._directory = tempfile.mkdtemp()
+        os.chdir(self._directory)
+
+    def tearDown( self ):
+        os.chdir(self._cwd)
+        shutil.rmtree(self._directory)
+
+    def _strip( self, r ):
+        '''Drop the timings, which differ between runs.'''
+        return dict([ (k, v) for (k, v) in r.iteritems() if k not in [ 'start_time', 'end_time' ] ])
+
+    def test_simulations_pickle( self ):
+        sim = make_simulation(100, 2, '', 'REWIRE', repetitions = 3, network = 'erdos_renyi')
+        copy = pickle.loads(pickle.dumps(sim))
+        self.assertEqual((copy.N, copy.M, copy.repetitions, copy.network), (100, 2, 3, 'erdos_renyi'))
+
+    def test_pool_matches_serial( self ):
+        t = barabasi_albert_topology(300, 2, seed = 2)
+        shared = SharedTopology(t)
+        try:
+            sim = make_ensemble_simulation(300, 2, '', 'SYNCHRONOUS_SIR', repetitions = 10, topologies = [ shared ])
+            serial = SerialExecutor().map(sim, self.POINTS)
+            executor = ProcessPoolExecutor(processes = 2)
+            try:
+                pooled = executor.map(sim, self.POINTS)
+            finally:
+                executor.close()
+        finally:
+            shared.unlink()
+        self.assertEqual([ self._strip(r) for r in serial ], [ self._strip(r) for r in pooled ])
+        self.assertEqual([ r['p_infect'] for r in pooled ], [ 0.05, 0.1, 0.2 ])
+
+    def test_blob_runner( self ):
+        # keep the progress reports out of the test output
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            blob_runner(reps = 2, timelim = 50, numnodes = 200, seed = 2, pinf_num = 2, prew_num = 1, prec_min = 0.5,
+                        prec_max = 0.5, prec_num = 1, model_type = 'SYNCHRONOUS_SIS', executor = SerialExecutor())
+        finally:
+            sys.stdout = stdout
+        rows = open('SYNCHRONOUS_SIS_results.csv').readlines()
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(rows[0].startswith('nodes,p_infect'))
+        self.assertEqual(len(open('.\\output\\SYNCHRONOUS_SIS_results.csv').readlines()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
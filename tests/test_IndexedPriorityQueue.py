@@ -0,0 +1,111 @@
+# coding: utf-8
+
+import unittest
+import random
+import networkx
+
+from IndexedPriorityQueue import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+from tests.channels import ChannelCounts
+
+
+class IndexedPriorityQueueTest(unittest.TestCase):
+    '''Tests of the indexed priority queue.'''
+
+    def _check( self, q, truth ):
+        '''Check the queue holds the given priorities, with the smallest on top.'''
+        self.assertEqual(len(q), len(truth))
+        for (k, p) in truth.iteritems():
+            self.assertTrue(k in q)
+            self.assertEqual(q.priority(k), p)
+        if len(truth) > 0:
+            (k, p) = q.top()
+            self.assertEqual(p, min(truth.values()))
+            self.assertEqual(truth[k], p)
+
+    def test_random_operations( self ):
+        rng = random.Random(1)
+        q = IndexedPriorityQueue()
+        truth = dict()
+        for it in xrange(5000):
+            k = rng.randrange(40)
+            if (rng.random() < 0.7) or (k not in truth):
+                p = rng.random()
+                q.update(k, p)
+                truth[k] = p
+            else:
+                q.remove(k)
+                del truth[k]
+            self._check(q, truth)
+
+    def test_drain_in_order( self ):
+        rng = random.Random(2)
+        q = IndexedPriorityQueue()
+        for k in xrange(100):
+            q.update(k, rng.random())
+        ps = []
+        while len(q) > 0:
+            (k, p) = q.top()
+            ps.append(p)
+            q.remove(k)
+        self.assertEqual(ps, sorted(ps))
+
+    def test_infinite_priorities( self ):
+        q = IndexedPriorityQueue()
+        q.update('a', float('inf'))
+        q.update('b', 2.0)
+        self.assertEqual(q.top(), ('b', 2.0))
+        q.update('b', float('inf'))
+        self.assertEqual(q.top()[1], float('inf'))
+
+    def test_clear( self ):
+        q = IndexedPriorityQueue()
+        q.update(1, 1.0)
+        q.clear()
+        self.assertEqual(len(q), 0)
+        self.assertFalse(1 in q)
+
+
+class NextReactionMethodTest(unittest.TestCase):
+    '''Tests that the next reaction method samples the same process as
+    the direct method.'''
+
+    def test_firing_proportions( self ):
+        rates = [ 1.0, 0.0, 4.0, 2.0, 3.0 ]
+        m = ChannelCounts(rates, events = 20000, engine = 'nrm', seed = 5)
+        m.dynamics()
+        n = sum(m.fired)
+        self.assertEqual(n, 20000)
+        for (k, r) in enumerate(rates):
+            expected = n * r / sum(rates)
+            self.assertTrue(abs(m.fired[k] - expected) < 4 * (expected + 1) ** 0.5, (k, m.fired[k], expected))
+
+    def test_elapsed_time( self ):
+        # events of a process with total rate 10 arrive 0.1 apart on average
+        m = ChannelCounts([ 4.0, 6.0 ], events = 10000, engine = 'nrm', seed = 6)
+        m.dynamics()
+        self.assertTrue(abs(m.CURRENT_TIMESTEP - 1000.0) < 4 * 10.0)
+
+    def test_sir_final_size( self ):
+        # the mean final size of an epidemic is the same under both engines
+        g = networkx.erdos_renyi_graph(200, 0.03, seed = 2)
+        sizes = dict()
+        for engine in [ 'direct', 'nrm' ]:
+            sizes[engine] = []
+            for r in xrange(150):
+                m = SIRStochasticDynamics(graph = g, p_infected = 0.02, p_infect = 0.2, p_recover = 1.0,
+                                          engine = engine, seed = 1000 * r + len(engine))
+                m.dynamics()
+                sizes[engine].append(len(m.POPULATION[m.RECOVERED]) + 0.0)
+        means = dict()
+        variances = dict()
+        for engine in sizes.keys():
+            n = len(sizes[engine])
+            means[engine] = sum(sizes[engine]) / n
+            variances[engine] = sum([ (x - means[engine]) ** 2 for x in sizes[engine] ]) / (n - 1)
+        se = ((variances['direct'] + variances['nrm']) / 150) ** 0.5
+        self.assertTrue(abs(means['direct'] - means['nrm']) < 4 * se, (means, se))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# coding: utf-8
+
+import unittest
+import random
+import networkx
+
+from NeighbourCounts import *
+from SIRAsynchronousDynamics import SIRAsynchronousDynamics
+from StoppingCriteria import EventBudget
+
+
+def brute_counts( g, state ):
+    '''Return the number of neighbours of every node in a state, by looking at them.'''
+    return dict([ (n, len([ m for m in g.neighbors(n) if g.node[m][g.DYNAMICAL_STATE] == state ]))
+                  for n in g.nodes() ])
+
+
+class NeighbourCountsTest(unittest.TestCase):
+    '''Tests that the neighbour counts follow the changes of state and of
+    edges they're told about.'''
+
+    def _model( self, g, **kwargs ):
+        '''Return a seeded SIR model whose counts have been set up.'''
+        m = SIRAsynchronousDynamics(graph = g, p_infected = 0.2, p_infect = 0.1, p_recover = 0.1, seed = 1, **kwargs)
+        m.before()
+        m._neighbour_counts = NeighbourCounts(m, m.INFECTED)
+        return m
+
+    def _check( self, m ):
+        truth = brute_counts(m, m.INFECTED)
+        for n in m.nodes():
+            self.assertEqual(m.neighbour_count(n), truth[n], n)
+
+    def test_initial_counts( self ):
+        g = networkx.barabasi_albert_graph(200, 3, seed = 1)
+        for backend in [ 'networkx', 'compact' ]:
+            self._check(self._model(g, backend = backend))
+
+    def test_labelled_nodes( self ):
+        g = networkx.barabasi_albert_graph(100, 2, seed = 2)
+        g = networkx.relabel_nodes(g, dict([ (n, 'n%d' % n) for n in g.nodes() ]))
+        m = self._model(g)
+        self._check(m)
+        self.assertEqual(len(m._neighbour_counts.counts()), 100)
+
+    def test_state_changes( self ):
+        rng = random.Random(3)
+        g = networkx.barabasi_albert_graph(100, 3, seed = 3)
+        for backend in [ 'networkx', 'compact' ]:
+            m = self._model(g, backend = backend)
+            for it in xrange(500):
+                n = rng.randrange(100)
+                before = m.node[n][m.DYNAMICAL_STATE]
+                after = rng.choice(list(m.STATES))
+                if after != before:
+                    m.update_node(n, before, after)
+            self._check(m)
+
+    def test_edge_changes( self ):
+        rng = random.Random(4)
+        m = self._model(networkx.barabasi_albert_graph(100, 3, seed = 4))
+        for it in xrange(500):
+            (u, v) = (rng.randrange(100), rng.randrange(100))
+            if u == v:
+                continue
+            if m.has_edge(u, v):
+                m.remove_edge(u, v)
+                m.edge_removed(u, v)
+            else:
+                m.add_edge(u, v)
+                m.edge_added(u, v)
+            if rng.random() < 0.3:
+                n = rng.randrange(100)
+                before = m.node[n][m.DYNAMICAL_STATE]
+                m.update_node(n, before, m.SUSCEPTIBLE if before == m.INFECTED else m.INFECTED)
+        self._check(m)
+
+    def test_counts_during_dynamics( self ):
+        g = networkx.barabasi_albert_graph(200, 3, seed = 5)
+        for backend in [ 'networkx', 'compact' ]:
+            for algorithm in [ 'rejection', 'rejection-free' ]:
+                m = SIRAsynchronousDynamics(graph = g, p_infected = 0.05, p_infect = 0.1, p_recover = 0.1, seed = 5,
+                                            backend = backend, algorithm = algorithm, stopping = EventBudget(100))
+                m.dynamics()
+                self._check(m)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# coding: utf-8
+
+import unittest
+import random
+import collections
+import networkx
+
+from PopulationSet import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+from SISStochasticDynamicsRewire import SISStochasticDynamicsRewire
+from StoppingCriteria import EventBudget
+
+
+class PopulationSetTest(unittest.TestCase):
+    '''Tests of the population containers.'''
+
+    def test_initial_members( self ):
+        p = PopulationSet([ 3, 1, 3, 2 ])
+        self.assertEqual(len(p), 3)
+        self.assertEqual(sorted(p), [ 1, 2, 3 ])
+
+    def test_remove_missing( self ):
+        p = PopulationSet([ 1 ])
+        self.assertRaises(KeyError, p.remove, 2)
+
+    def test_random_operations( self ):
+        rng = random.Random(2)
+        p = PopulationSet()
+        truth = set()
+        for it in xrange(5000):
+            n = rng.randrange(50)
+            if rng.random() < 0.5:
+                p.add(n)
+                truth.add(n)
+            elif n in truth:
+                p.remove(n)
+                truth.remove(n)
+            self.assertEqual(len(p), len(truth))
+        self.assertEqual(set(p), truth)
+        self.assertEqual(set([ p[i] for i in xrange(len(p)) ]), truth)
+        for n in xrange(50):
+            self.assertEqual(n in p, n in truth)
+
+    def test_uniform_sampling( self ):
+        rng = random.Random(3)
+        p = PopulationSet(range(10))
+        p.remove(4)
+        counts = collections.Counter([ p[rng.randrange(len(p))] for _ in xrange(18000) ])
+        self.assertEqual(set(counts.keys()), set(range(10)) - set([ 4 ]))
+        for c in counts.values():
+            self.assertTrue(abs(c - 2000) < 200)
+
+    def test_clear( self ):
+        p = PopulationSet([ 1, 2 ])
+        p.clear()
+        self.assertEqual(len(p), 0)
+        self.assertFalse(1 in p)
+
+
+class PopulationDynamicsTest(unittest.TestCase):
+    '''Tests that the populations of a model match the states of its nodes.'''
+
+    def _check( self, m ):
+        for s in m.STATES:
+            truth = set([ n for n in m.nodes() if m.node[n][m.DYNAMICAL_STATE] == s ])
+            self.assertEqual(set(m.POPULATION[s]), truth)
+            self.assertEqual(len(m.POPULATION[s]), len(truth))
+
+    def test_populations( self ):
+        g = networkx.barabasi_albert_graph(200, 3, seed = 1)
+        for (cls, kwargs) in [ (SIRStochasticDynamics, dict()), (SISStochasticDynamicsRewire, dict(p_rewire = 0.1)) ]:
+            for backend in [ 'networkx', 'compact' ]:
+                m = cls(graph = g, p_infected = 0.05, p_infect = 0.3, p_recover = 0.5,
+                        seed = 1, stopping = EventBudget(300), backend = backend, **kwargs)
+                m.dynamics()
+                self._check(m)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# coding: utf-8
+
+import unittest
+import networkx
+
+from RandomStream import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+
+
+class RandomStreamTest(unittest.TestCase):
+    '''Tests of the buffered random number stream.'''
+
+    def _draw( self, s, n ):
+        '''Draw a mixed sequence of variates from a stream.'''
+        xs = []
+        for i in xrange(n):
+            if i % 3 == 0:
+                xs.append(s.exponential())
+            elif i % 3 == 1:
+                xs.append(s.random())
+            else:
+                xs.append(s.randint(10))
+        return xs
+
+    def test_seeded_streams_repeat( self ):
+        a = RandomStream(seed = 4, block_size = 7)
+        b = RandomStream(seed = 4, block_size = 7)
+        self.assertEqual(self._draw(a, 100), self._draw(b, 100))
+        a.seed(4)
+        self.assertEqual(self._draw(a, 100), self._draw(RandomStream(seed = 4, block_size = 7), 100))
+
+    def test_distributions( self ):
+        s = RandomStream(seed = 1, block_size = 1000)
+        n = 20000
+        us = [ s.random() for _ in xrange(n) ]
+        self.assertTrue(min(us) >= 0.0 and max(us) < 1.0)
+        self.assertTrue(abs(sum(us) / n - 0.5) < 4 * (1.0 / 12 / n) ** 0.5)
+        es = [ s.exponential() for _ in xrange(n) ]
+        self.assertTrue(abs(sum(es) / n - 1.0) < 4 * (1.0 / n) ** 0.5)
+        ks = [ s.randint(6) for _ in xrange(n) ]
+        self.assertEqual(set(ks), set(range(6)))
+
+    def test_sample( self ):
+        s = RandomStream(seed = 2)
+        for (n, k) in [ (10, 0), (10, 10), (1000, 3), (50, 25) ]:
+            xs = s.sample(n, k)
+            self.assertEqual(len(xs), k)
+            self.assertEqual(len(set(xs)), k)
+            self.assertTrue(all([ 0 <= x < n for x in xs ]))
+        counts = [ 0 ] * 8
+        for it in xrange(8000):
+            for x in s.sample(8, 3):
+                counts[x] += 1
+        for c in counts:
+            self.assertTrue(abs(c - 3000) < 4 * 3000 ** 0.5)
+
+    def test_state_round_trip( self ):
+        # restoring a state continues the stream exactly, mid-buffer and across refills
+        for skip in [ 0, 1, 5, 13, 40 ]:
+            s = RandomStream(seed = 9, block_size = 8)
+            self._draw(s, skip)
+            state = s.get_state()
+            expected = self._draw(s, 50)
+            t = RandomStream(seed = 123, block_size = 8)
+            t.set_state(state)
+            self.assertEqual(self._draw(t, 50), expected)
+
+    def test_seeded_models_repeat( self ):
+        g = networkx.barabasi_albert_graph(200, 3, seed = 1)
+        runs = []
+        for r in xrange(2):
+            m = SIRStochasticDynamics(graph = g, p_infected = 0.05, p_infect = 0.3, p_recover = 0.5, seed = 42)
+            stats = m.dynamics()
+            runs.append((list(stats['times']), list(stats['infected_distribution'])))
+        self.assertEqual(runs[0], runs[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
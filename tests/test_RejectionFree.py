@@ -0,0 +1,68 @@
+# coding: utf-8
+
+import unittest
+import networkx
+import numpy
+
+from SIRAsynchronousDynamics import SIRAsynchronousDynamics
+from StoppingCriteria import *
+
+
+class RejectionFreeTest(unittest.TestCase):
+    '''Tests that the rejection-free asynchronous algorithm samples the same
+    process as rejection, and stops where the stopping criterion says.'''
+
+    def setUp( self ):
+        self._g = networkx.barabasi_albert_graph(200, 2, seed = 1)
+
+    def _model( self, algorithm, seed, **kwargs ):
+        params = dict(p_infected = 0.02, p_infect = 0.05, p_recover = 0.3)
+        params.update(kwargs)
+        return SIRAsynchronousDynamics(graph = self._g, algorithm = algorithm, seed = seed, **params)
+
+    def test_final_sizes_agree( self ):
+        sizes = dict()
+        for algorithm in [ 'rejection', 'rejection-free' ]:
+            s = []
+            for r in xrange(100):
+                m = self._model(algorithm, r)
+                m.dynamics()
+                s.append(len(m.POPULATION[m.RECOVERED]))
+            sizes[algorithm] = numpy.array(s, dtype = float)
+        (a, b) = (sizes['rejection'], sizes['rejection-free'])
+        se = (a.var(ddof = 1) / len(a) + b.var(ddof = 1) / len(b)) ** 0.5
+        self.assertTrue(abs(a.mean() - b.mean()) < 4 * se, (a.mean(), b.mean()))
+
+    def test_stops_at_the_model_time_limit( self ):
+        for seed in xrange(5):
+            m = self._model('rejection-free', seed, p_infected = 0.1, p_infect = 0.005, p_recover = 0.02, time_limit = 5)
+            m.dynamics()
+            self.assertTrue(5 <= m.CURRENT_TIMESTEP < 5 + m.DT + 1e-9, m.CURRENT_TIMESTEP)
+
+    def test_stops_at_the_criterion_time_limit( self ):
+        # the model's own time limit is far off, and skips are long
+        for seed in xrange(5):
+            m = self._model('rejection-free', seed, p_infected = 0.1, p_infect = 0.005, p_recover = 0.02, stopping = TimeLimit(5))
+            m.dynamics()
+            self.assertTrue(5 <= m.CURRENT_TIMESTEP < 5 + m.DT + 1e-9, m.CURRENT_TIMESTEP)
+
+    def test_continues_past_a_horizon_that_does_not_stop( self ):
+        # the first time limit is a horizon, but both must be met to stop
+        for seed in xrange(5):
+            m = self._model('rejection-free', seed, p_infected = 0.1, p_infect = 0.005, p_recover = 0.02,
+                            stopping = TimeLimit(2) & TimeLimit(5))
+            m.dynamics()
+            self.assertTrue(5 <= m.CURRENT_TIMESTEP < 5 + m.DT + 1e-9, m.CURRENT_TIMESTEP)
+
+    def test_unbounded_criterion( self ):
+        # with no time horizon the run goes until nothing more can happen
+        m = self._model('rejection-free', 1, p_recover = 1.0, stopping = Extinction(SIRAsynchronousDynamics.INFECTED))
+        m.dynamics()
+        self.assertEqual(len(m.POPULATION[m.INFECTED]), 0)
+
+    def test_unknown_algorithm( self ):
+        self.assertRaises(ValueError, self._model, 'metropolis', 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
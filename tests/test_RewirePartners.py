@@ -0,0 +1,51 @@
+# coding: utf-8
+
+import unittest
+import collections
+import networkx
+
+from SIRStochasticDynamicsRewire import SIRStochasticDynamicsRewire
+
+
+class RewirePartnersTest(unittest.TestCase):
+    '''Tests of the choice of new neighbours by rejection sampling.'''
+
+    def _model( self, g, p_infected = 0.3, backend = 'networkx' ):
+        m = SIRStochasticDynamicsRewire(graph = g, p_infected = p_infected, p_infect = 0.3, p_recover = 0.5,
+                                        p_rewire = 0.2, seed = 1, backend = backend)
+        m.before()
+        return m
+
+    def _check_uniform( self, m, n, states, draws ):
+        '''Check the partners chosen for a node are uniform over the suitable nodes.'''
+        suitable = set([ c for c in m.nodes() if (m.node[c][m.DYNAMICAL_STATE] in states) and (c != n) and (c not in m.adj[n]) ])
+        counts = collections.Counter([ m.choose_new_neighbour(n, states) for _ in xrange(draws) ])
+        self.assertEqual(set(counts.keys()), suitable)
+        expected = (draws + 0.0) / len(suitable)
+        for c in counts.values():
+            self.assertTrue(abs(c - expected) < 5 * expected ** 0.5, (c, expected))
+
+    def test_uniform( self ):
+        g = networkx.barabasi_albert_graph(40, 3, seed = 2)
+        for backend in [ 'networkx', 'compact' ]:
+            m = self._model(g, backend = backend)
+            hub = max(m.nodes(), key = m.degree)
+            self._check_uniform(m, hub, [ m.SUSCEPTIBLE, m.RECOVERED ], 20000)
+            self._check_uniform(m, hub, [ m.SUSCEPTIBLE, m.INFECTED ], 20000)
+
+    def test_mostly_unsuitable( self ):
+        # nearly all the candidates are neighbours, so the choice falls back
+        # on listing the suitable nodes, and must still be uniform
+        g = networkx.complete_graph(30)
+        g.remove_edges_from([ (0, 1), (0, 2), (0, 3) ])
+        m = self._model(g, p_infected = 0.0)
+        self._check_uniform(m, 0, [ m.SUSCEPTIBLE ], 6000)
+
+    def test_none_suitable( self ):
+        m = self._model(networkx.complete_graph(10), p_infected = 0.0)
+        self.assertEqual(m.choose_new_neighbour(0, [ m.SUSCEPTIBLE ]), None)
+        self.assertEqual(m.choose_new_neighbour(0, [ m.RECOVERED ]), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# coding: utf-8
+
+import unittest
+import random
+import networkx
+
+from SIEdgeIndex import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+from SISStochasticDynamics import SISStochasticDynamics
+from SIRStochasticDynamicsRewire import SIRStochasticDynamicsRewire
+from SISStochasticDynamicsRewire import SISStochasticDynamicsRewire
+from StoppingCriteria import EventBudget
+
+
+def si_edges( g ):
+    '''Return the set of (infected, susceptible) edges of a model's network.'''
+    edges = set()
+    for n in g.POPULATION[g.INFECTED]:
+        for m in g.neighbors(n):
+            if g.node[m][g.DYNAMICAL_STATE] == g.SUSCEPTIBLE:
+                edges.add((n, m))
+    return edges
+
+
+class SIEdgeIndexTest(unittest.TestCase):
+    '''Tests of the SI edge index on its own.'''
+
+    def setUp( self ):
+        self._rng = random.Random(1)
+
+    def _check( self, si, truth ):
+        '''Check the index holds exactly the given edges, with consistent positions.'''
+        self.assertEqual(len(si), len(truth))
+        self.assertEqual(set([ (n, m) for (n, m, _) in si ]), truth)
+        for i in xrange(len(si)):
+            (n, m, _) = si[i]
+            self.assertTrue((n, m) in si)
+
+    def test_add_is_idempotent( self ):
+        si = SIEdgeIndex()
+        si.add(1, 2, 'a')
+        si.add(1, 2, 'b')
+        self.assertEqual(len(si), 1)
+        self.assertEqual(si[0], (1, 2, 'a'))
+
+    def test_remove_returns_edge( self ):
+        si = SIEdgeIndex()
+        si.add(1, 2, 'a')
+        si.add(3, 4, 'b')
+        self.assertEqual(si.remove(1, 2), (1, 2, 'a'))
+        self._check(si, set([ (3, 4) ]))
+        self.assertRaises(KeyError, si.remove, 1, 2)
+
+    def test_random_operations( self ):
+        si = SIEdgeIndex()
+        truth = set()
+        for it in xrange(5000):
+            n = self._rng.randrange(30)
+            m = self._rng.randrange(30)
+            if n == m:
+                continue
+            op = self._rng.random()
+            if op < 0.5:
+                si.add(n, m, None)
+                truth.add((n, m))
+            elif (op < 0.8) and (len(si) > 0):
+                (np, mp, _) = si.pop(self._rng.randrange(len(si)))
+                truth.discard((np, mp))
+            else:
+                si.remove_node(n)
+                truth = set([ e for e in truth if n not in e ])
+        self._check(si, truth)
+        for n in xrange(30):
+            self.assertEqual(set([ (a, b) for (a, b, _) in si.edges_of(n) ]),
+                             set([ e for e in truth if n in e ]))
+
+    def test_remove_node_order_is_deterministic( self ):
+        a = SIEdgeIndex()
+        b = SIEdgeIndex()
+        for (n, m) in [ (1, 2), (1, 3), (4, 3), (5, 1), (1, 6), (7, 8) ]:
+            a.add(n, m, None)
+            b.add(n, m, None)
+        # the same edges, with the incidence sets filled in a different order
+        b._incident[1] = set(list(b._incident[1])[::-1])
+        a.remove_node(1)
+        b.remove_node(1)
+        self.assertEqual(list(a), list(b))
+
+    def test_remove_nodes( self ):
+        a = SIEdgeIndex()
+        b = SIEdgeIndex()
+        for it in xrange(300):
+            n = self._rng.randrange(40)
+            m = self._rng.randrange(40)
+            if n != m:
+                a.add(n, m, None)
+                b.add(n, m, None)
+        ns = [ 3, 7, 11, 7, 30 ]
+        a.remove_nodes(ns)
+        for n in ns:
+            b.remove_node(n)
+        self._check(a, set([ (n, m) for (n, m, _) in b ]))
+        for n in xrange(40):
+            self.assertEqual(set(a.edges_of(n)), set(b.edges_of(n)))
+        self.assertEqual(a.edges_of(7), [])
+
+    def test_clear( self ):
+        si = SIEdgeIndex()
+        si.add(1, 2, None)
+        si.clear()
+        self.assertEqual(len(si), 0)
+        self.assertEqual(si.edges_of(1), [])
+
+
+class SIEdgeIndexDynamicsTest(unittest.TestCase):
+    '''Tests that the models keep their SI index consistent with the network
+    as nodes are infected, recover, and rewire.'''
+
+    def _run( self, cls, backend, **kwargs ):
+        g = networkx.barabasi_albert_graph(300, 3, seed = 4)
+        for events in [ 1, 10, 100, 1000 ]:
+            m = cls(graph = g, p_infected = 0.05, p_infect = 0.3, p_recover = 0.5, seed = 3,
+                    stopping = EventBudget(events), backend = backend, **kwargs)
+            m.dynamics()
+            self.assertEqual(set([ (n, mp) for (n, mp, _) in m._si ]), si_edges(m))
+            self.assertEqual(len(m._si), len(si_edges(m)))
+
+    def test_sir( self ):
+        for backend in [ 'networkx', 'compact' ]:
+            self._run(SIRStochasticDynamics, backend)
+
+    def test_sis( self ):
+        for backend in [ 'networkx', 'compact' ]:
+            self._run(SISStochasticDynamics, backend)
+
+    def test_sir_rewire( self ):
+        for backend in [ 'networkx', 'compact' ]:
+            self._run(SIRStochasticDynamicsRewire, backend, p_rewire = 0.2)
+
+    def test_sis_rewire( self ):
+        for backend in [ 'networkx', 'compact' ]:
+            self._run(SISStochasticDynamicsRewire, backend, p_rewire = 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
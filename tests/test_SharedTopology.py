@@ -0,0 +1,133 @@
+# coding: utf-8
+
+import unittest
+import os
+import random
+import networkx
+
+from SharedTopology import *
+from Executors import ProcessPoolExecutor
+from SIRStochasticDynamicsRewire import SIRStochasticDynamicsRewire
+from StoppingCriteria import EventBudget
+from tests.test_SIEdgeIndex import si_edges
+
+
+def attached_size( shared ):
+    '''Return the order and size of a shared topology, attached in a worker process.'''
+    t = shared.attach()
+    return (t.order(), t.size(), t.is_shared())
+
+
+class SharedTopologyTest(unittest.TestCase):
+    '''Tests of publishing a topology into shared memory and attaching to it.'''
+
+    def setUp( self ):
+        self._t = CompactTopology(networkx.barabasi_albert_graph(200, 3, seed = 1))
+        self._shared = SharedTopology(self._t)
+
+    def tearDown( self ):
+        self._shared.unlink()
+
+    def test_attach( self ):
+        t = self._shared.attach()
+        self.assertTrue(t.is_shared())
+        self.assertTrue((t.offsets() == self._t.offsets()).all())
+        self.assertTrue((t.neighbour_array() == self._t.neighbour_array()).all())
+        self.assertTrue((t.edge_ids() == self._t.edge_ids()).all())
+        self.assertTrue(self._shared.attach() is t)
+
+    def test_attach_in_workers( self ):
+        executor = ProcessPoolExecutor(processes = 2)
+        try:
+            results = executor.map(attached_size, [ self._shared ] * 4)
+        finally:
+            executor.close()
+        self.assertEqual(results, [ (200, self._t.size(), True) ] * 4)
+
+    def test_unlink( self ):
+        shared = SharedTopology(self._t)
+        shared.attach()
+        shared.unlink()
+        self.assertFalse(os.path.exists(shared.directory()))
+
+
+class OverlayAdjacencyTest(unittest.TestCase):
+    '''Tests that the copy-on-write adjacency follows a networkx graph under
+    random changes, without writing to the shared arrays.'''
+
+    def setUp( self ):
+        self._g = networkx.barabasi_albert_graph(100, 3, seed = 2)
+        self._shared = SharedTopology(self._g)
+        self._t = self._shared.attach()
+
+    def tearDown( self ):
+        self._shared.unlink()
+
+    def test_random_changes( self ):
+        rng = random.Random(3)
+        adj = OverlayAdjacency(self._t, 'occupied')
+        g = self._g.copy()
+        neighbours = self._t.neighbour_array().copy()
+        for it in xrange(500):
+            (u, v) = (rng.randrange(100), rng.randrange(100))
+            if u == v:
+                continue
+            if g.has_edge(u, v):
+                g.remove_edge(u, v)
+                del adj[u][v]
+                del adj[v][u]
+            else:
+                g.add_edge(u, v)
+                adj[u][v] = dict()
+                adj[v][u] = dict()
+        for n in xrange(100):
+            self.assertEqual(sorted(adj[n]), sorted(g.neighbors(n)))
+            self.assertEqual(adj.degree(n), g.degree(n))
+            for m in g.neighbors(n):
+                self.assertEqual(adj.find(n, m), adj.find(m, n))
+        ids = [ adj.find(n, m) for (n, m) in g.edges() ]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertTrue(adj.overlaid() <= 100)
+        self.assertTrue((self._t.neighbour_array() == neighbours).all())
+
+    def test_copy_on_write( self ):
+        adj = OverlayAdjacency(self._t, 'occupied')
+        (n, m) = self._g.edges()[0]
+        del adj[n][m]
+        del adj[m][n]
+        self.assertEqual(adj.overlaid(), 2)
+        self.assertFalse(m in adj[n])
+        self.assertTrue(m in self._t.neighbours(n))
+
+    def test_occupied_edges( self ):
+        adj = OverlayAdjacency(self._t, 'occupied')
+        (n, m) = self._g.edges()[0]
+        adj[n][m]['occupied'] = True
+        self.assertTrue(adj[m][n]['occupied'])
+        del adj[n][m]
+        self.assertTrue(adj.is_occupied(adj.find(m, n)))
+        e = adj.find(m, n)
+        del adj[m][n]
+        self.assertFalse(adj.is_occupied(e))
+
+        # a new edge gets a new id
+        adj[n][m] = { 'occupied': True }
+        adj[m][n] = dict()
+        self.assertEqual(adj.find(n, m), self._t.size())
+        self.assertTrue(adj[m][n]['occupied'])
+
+    def test_adaptive_model( self ):
+        # each simulation rewires its own overlay, leaving the shared network alone
+        for seed in xrange(3):
+            m = SIRStochasticDynamicsRewire(graph = self._t, p_infected = 0.05, p_infect = 0.3, p_recover = 0.2,
+                                            p_rewire = 0.5, seed = seed, stopping = EventBudget(300), backend = 'compact')
+            self.assertTrue(isinstance(m.adj, OverlayAdjacency))
+            m.dynamics()
+            self.assertTrue(m.adj.overlaid() > 0)
+            self.assertEqual(set([ (n, mp) for (n, mp, _) in m._si ]), si_edges(m))
+            self.assertEqual(sum([ m.adj.degree(n) for n in xrange(100) ]), 2 * self._g.number_of_edges())
+        self.assertEqual(sorted(self._t.to_networkx().edges()), sorted(self._g.edges()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# coding: utf-8
+
+import unittest
+import random
+import numpy
+
+from Snapshot import *
+from TopologyGenerators import barabasi_albert_topology
+from SIRStochasticDynamics import SIRStochasticDynamics
+from SIRStochasticDynamicsRewire import SIRStochasticDynamicsRewire
+from SISStochasticDynamicsDisconnect import SISStochasticDynamicsDisconnect
+from SIRSynchronousDynamics import SIRSynchronousDynamics
+
+
+# the models to snapshot, with their parameters
+MODELS = [ (SIRStochasticDynamics, dict()),
+           (SIRStochasticDynamicsRewire, dict(p_rewire = 0.2)),
+           (SISStochasticDynamicsDisconnect, dict(p_rewire = 0.2)),
+           (SIRSynchronousDynamics, dict()) ]
+
+
+def occupied_edges( g ):
+    '''Return the set of occupied edges of a graph, each with its smaller end first.'''
+    return set([ (min(u, v), max(u, v)) for (u, v, data) in g.edges_iter(data = True) if data.get(g.OCCUPIED) == True ])
+
+
+class BitsTest(unittest.TestCase):
+    '''Tests of packing flags into bitsets.'''
+
+    def test_round_trip( self ):
+        rng = random.Random(1)
+        for n in [ 0, 1, 7, 8, 9, 100 ]:
+            flags = numpy.array([ rng.random() < 0.5 for i in xrange(n) ], dtype = bool)
+            self.assertEqual(unpack_bits(pack_bits(flags), n).tolist(), flags.tolist())
+
+
+class SnapshotTest(unittest.TestCase):
+    '''Tests that restoring a snapshot puts a simulation back as it was.'''
+
+    def setUp( self ):
+        self._t = barabasi_albert_topology(500, 3, seed = 1)
+
+    def _model( self, cls, backend, **kwargs ):
+        g = cls(backend = backend, seed = 5, time_limit = 200, p_infect = 0.3, p_recover = 0.5, p_infected = 0.02, **kwargs)
+        g.copy_from(self._t)
+        return g
+
+    def _key( self, stats ):
+        '''Return the parts of a run's statistics that should repeat.'''
+        return (stats.get('timesteps'), stats.get('events'), list(stats['infected_distribution']), len(stats['times']))
+
+    def test_restore_repeats_runs( self ):
+        for backend in [ 'networkx', 'compact' ]:
+            for (cls, kwargs) in MODELS:
+                fresh = []
+                for seed in [ 5, 6, 7 ]:
+                    g = self._model(cls, backend, **kwargs)
+                    g._rng.seed(seed)
+                    fresh.append(self._key(g.dynamics()))
+                g = self._model(cls, backend, **kwargs)
+                snapshot = g.snapshot()
+                restored = []
+                for seed in [ 5, 6, 7 ]:
+                    g.restore(snapshot)
+                    g._rng.seed(seed)
+                    restored.append(self._key(g.dynamics()))
+                    if backend == 'networkx':
+                        g.skeletonise()
+                self.assertEqual(fresh, restored, (backend, cls.__name__))
+                g.restore(snapshot)
+                self.assertEqual(g.number_of_edges(), self._t.size())
+                self.assertEqual(g.CURRENT_TIMESTEP, 0)
+
+    def test_restore_into_another_graph( self ):
+        for backend in [ 'networkx', 'compact' ]:
+            for (cls, kwargs) in MODELS:
+                g = self._model(cls, backend, **kwargs)
+                g._rng.seed(9)
+                g.dynamics()
+                snapshot = g.snapshot()
+                h = cls(backend = backend, seed = 5, time_limit = 200, p_infect = 0.3, p_recover = 0.5, p_infected = 0.02, **kwargs)
+                h.restore(snapshot)
+                for s in g.POPULATION.keys():
+                    self.assertEqual(list(h.POPULATION[s]), list(g.POPULATION[s]))
+                if getattr(g, '_si', None) is not None:
+                    self.assertEqual([ (n, m) for (n, m, _) in h._si ], [ (n, m) for (n, m, _) in g._si ])
+                self.assertEqual(occupied_edges(h), occupied_edges(g))
+                for n in g.nodes_iter():
+                    self.assertEqual(h.node[n][h.DYNAMICAL_STATE], g.node[n][g.DYNAMICAL_STATE])
+                self.assertEqual(sorted(map(sorted, h.edges())), sorted(map(sorted, g.edges())))
+                self.assertEqual((h.CURRENT_TIMESTEP, h.CURRENT_EVENTS), (g.CURRENT_TIMESTEP, g.CURRENT_EVENTS))
+
+    def test_compact_snapshot_shares_topology( self ):
+        g = self._model(SIRStochasticDynamics, 'compact')
+        snapshot = g.snapshot()
+        self.assertTrue(snapshot.topology() is self._t)
+        g.dynamics()
+        g.restore(snapshot)
+        self.assertTrue(g.topology() is self._t)
+        self.assertEqual(occupied_edges(g), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
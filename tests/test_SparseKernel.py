@@ -0,0 +1,72 @@
+# coding: utf-8
+
+import unittest
+import networkx
+import numpy
+
+from SIRSynchronousDynamics import SIRSynchronousDynamics
+
+
+class SparseKernelTest(unittest.TestCase):
+    '''Tests that the vectorised sparse kernel for synchronous SIR dynamics
+    samples the same process as the python kernel.'''
+
+    def setUp( self ):
+        self._g = networkx.barabasi_albert_graph(1000, 3, seed = 1)
+
+    def _runs( self, g, kernel, backend, runs ):
+        '''Return the final sizes and largest outbreaks of a number of runs.'''
+        sizes = []
+        outbreaks = []
+        for r in xrange(runs):
+            m = SIRSynchronousDynamics(graph = g, p_infected = 0.01, p_infect = 0.1, p_recover = 0.3,
+                                       seed = r, kernel = kernel, backend = backend)
+            stats = m.dynamics()
+            sizes.append(len(m.POPULATION[m.RECOVERED]))
+            outbreaks.append(stats['max_outbreak_size'][0])
+        return (numpy.array(sizes, dtype = float), numpy.array(outbreaks, dtype = float))
+
+    def _agree( self, a, b ):
+        '''Test whether two samples have the same mean, within four standard errors.'''
+        se = (a.var(ddof = 1) / len(a) + b.var(ddof = 1) / len(b)) ** 0.5
+        return abs(a.mean() - b.mean()) < 4 * se
+
+    def test_kernels_agree( self ):
+        (sizes, outbreaks) = self._runs(self._g, 'python', 'networkx', 120)
+        for backend in [ 'networkx', 'compact' ]:
+            (s, o) = self._runs(self._g, 'sparse', backend, 120)
+            self.assertTrue(self._agree(sizes, s), (backend, sizes.mean(), s.mean()))
+            self.assertTrue(self._agree(outbreaks, o), (backend, outbreaks.mean(), o.mean()))
+
+    def test_relabelled_nodes( self ):
+        g = networkx.relabel_nodes(self._g, dict([ (n, 'n%d' % n) for n in self._g.nodes() ]))
+        m = SIRSynchronousDynamics(graph = g, p_infected = 0.05, p_infect = 0.2, p_recover = 0.3,
+                                   seed = 2, kernel = 'sparse')
+        m.dynamics()
+        self.assertEqual(sorted(m.nodes()), sorted(g.nodes()))
+        for s in m.STATES:
+            self.assertEqual(set(m.POPULATION[s]), set([ n for n in m.nodes() if m.node[n][m.DYNAMICAL_STATE] == s ]))
+
+    def test_one_occupied_edge_per_infection( self ):
+        # every node infected during the run was infected along one occupied edge
+        for backend in [ 'networkx', 'compact' ]:
+            m = SIRSynchronousDynamics(graph = self._g, p_infected = 0.01, p_infect = 0.2, p_recover = 0.3,
+                                       seed = 3, kernel = 'sparse', backend = backend)
+            m.before()
+            seeds = len(m.POPULATION[m.INFECTED])
+            m = SIRSynchronousDynamics(graph = self._g, p_infected = 0.01, p_infect = 0.2, p_recover = 0.3,
+                                       seed = 3, kernel = 'sparse', backend = backend)
+            m.dynamics()
+            occupied = [ (n, mp) for (n, mp, data) in m.edges_iter(data = True) if data[m.OCCUPIED] ]
+            infected = len(m.POPULATION[m.RECOVERED]) + len(m.POPULATION[m.INFECTED])
+            self.assertEqual(len(occupied), infected - seeds)
+            for (n, mp) in occupied:
+                self.assertTrue(m.adj[mp][n][m.OCCUPIED])
+            self.assertEqual(m._outbreaks.sets(), m.order() - len(occupied))
+
+    def test_unknown_kernel( self ):
+        self.assertRaises(ValueError, SIRSynchronousDynamics, graph = self._g, kernel = 'fortran')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# coding: utf-8
+
+import unittest
+import networkx
+
+from StoppingCriteria import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+
+
+class State(object):
+    '''A stand-in for a graph with dynamics, holding just what the criteria look at.'''
+
+    def __init__( self, t = 0.0, events = 0, infected = 0 ):
+        self.CURRENT_TIMESTEP = t
+        self.RECORDED_TIMESTEP = t
+        self.CURRENT_EVENTS = events
+        self.POPULATION = { 'infected': range(infected) }
+
+    def move( self, t, events, infected ):
+        self.RECORDED_TIMESTEP = self.CURRENT_TIMESTEP
+        self.CURRENT_TIMESTEP = t
+        self.CURRENT_EVENTS = events
+        self.POPULATION['infected'] = range(infected)
+
+
+class StoppingCriteriaTest(unittest.TestCase):
+    '''Tests of the stopping criteria.'''
+
+    def test_time_limit( self ):
+        c = TimeLimit(5.0)
+        g = State(t = 4.9)
+        self.assertFalse(c.stop(g))
+        self.assertEqual(c.horizon(g), (5.0, float('inf')))
+        g.move(5.0, 1, 0)
+        self.assertTrue(c.stop(g))
+        self.assertEqual(c.horizon(g), StoppingCriterion.UNBOUNDED)
+
+    def test_extinction( self ):
+        c = Extinction('infected')
+        g = State(infected = 1)
+        self.assertFalse(c.stop(g))
+        self.assertEqual(c.horizon(g), StoppingCriterion.UNBOUNDED)
+        g.move(1.0, 1, 0)
+        self.assertTrue(c.stop(g))
+
+    def test_event_budget( self ):
+        c = EventBudget(10)
+        g = State(events = 9)
+        self.assertFalse(c.stop(g))
+        self.assertEqual(c.horizon(g), (float('inf'), 10))
+        g.move(1.0, 10, 0)
+        self.assertTrue(c.stop(g))
+
+    def test_drop_from_peak( self ):
+        c = DropFromPeak('infected', 0.5)
+        g = State(infected = 4)
+        c.reset(g)
+        for (t, i) in [ (1.0, 6), (2.0, 10), (3.0, 9), (4.0, 10), (5.0, 6), (6.0, 5) ]:
+            g.move(t, int(t), i)
+            self.assertFalse(c.stop(g))
+        # no more than 5 - 0.5 * 10 = 0 events can happen without stopping
+        self.assertEqual(c.horizon(g), (float('inf'), 6))
+        g.move(7.0, 7, 4)
+        self.assertTrue(c.stop(g))
+        self.assertEqual(c.horizon(g), StoppingCriterion.UNBOUNDED)
+        # the peak was first reached at the time it was recorded
+        self.assertEqual(c.statistics(), { 'peak_infected': (1.0, 10) })
+
+    def test_drop_from_peak_horizon( self ):
+        c = DropFromPeak('infected', 0.25)
+        g = State(events = 100, infected = 40)
+        c.reset(g)
+        self.assertEqual(c.horizon(g), (float('inf'), 130))
+
+    def test_wall_clock_budget( self ):
+        c = WallClockBudget(0.0, check_every = 3)
+        g = State()
+        c.reset(g)
+        self.assertEqual([ c.stop(g) for _ in xrange(3) ], [ False, False, True ])
+        c = WallClockBudget(1000.0, check_every = 1)
+        c.reset(g)
+        self.assertFalse(c.stop(g))
+
+    def test_combinations( self ):
+        g = State(t = 1.0, events = 5, infected = 3)
+        either = TimeLimit(2.0) | EventBudget(8)
+        both = TimeLimit(2.0) & EventBudget(8)
+        self.assertEqual(either.horizon(g), (2.0, 8))
+        self.assertEqual(both.horizon(g), (2.0, 8))
+        g.move(2.0, 6, 3)
+        self.assertTrue(either.stop(g))
+        self.assertFalse(both.stop(g))
+        # a criterion that's already met doesn't hold the others back
+        self.assertEqual(both.horizon(g), (float('inf'), 8))
+        g.move(2.5, 8, 3)
+        self.assertTrue(both.stop(g))
+
+    def test_all_criteria_evaluated( self ):
+        # the peak is tracked even when an earlier criterion has stopped
+        peak = DropFromPeak('infected', 0.1)
+        c = TimeLimit(0.0) | peak
+        g = State(infected = 1)
+        c.reset(g)
+        g.move(1.0, 1, 7)
+        self.assertTrue(c.stop(g))
+        self.assertEqual(peak.peak(), (0.0, 7))
+
+
+class StoppingDynamicsTest(unittest.TestCase):
+    '''Tests of the criteria in use.'''
+
+    def test_peak_matches_timeline( self ):
+        g = networkx.barabasi_albert_graph(1000, 3, seed = 1)
+        for engine in [ 'direct', 'nrm', 'tau' ]:
+            m = SIRStochasticDynamics(graph = g, p_infected = 0.01, p_infect = 0.3, p_recover = 0.5,
+                                      engine = engine, seed = 2)
+            m._stopping = Extinction(m.INFECTED) | DropFromPeak(m.INFECTED, 0.0)
+            stats = m.dynamics()
+            self.assertEqual(stats['peak_infected'], m._timeline.peak(m.INFECTED))
+
+    def test_event_budget( self ):
+        g = networkx.barabasi_albert_graph(1000, 3, seed = 1)
+        for engine in [ 'direct', 'nrm', 'tau' ]:
+            m = SIRStochasticDynamics(graph = g, p_infected = 0.05, p_infect = 0.3, p_recover = 0.5,
+                                      engine = engine, seed = 2, stopping = EventBudget(300))
+            m.dynamics()
+            self.assertEqual(m.CURRENT_EVENTS, 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
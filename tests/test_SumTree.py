@@ -0,0 +1,87 @@
+# coding: utf-8
+
+import unittest
+import random
+import collections
+
+from SumTree import *
+from tests.channels import ChannelCounts
+
+
+class SumTreeTest(unittest.TestCase):
+    '''Tests of the sum-tree transition selector.'''
+
+    def test_append_grows( self ):
+        t = SumTree(capacity = 1)
+        for i in xrange(37):
+            self.assertEqual(t.append(float(i)), i)
+        self.assertEqual(len(t), 37)
+        self.assertEqual(t.total(), sum(range(37)))
+        self.assertEqual([ t[i] for i in xrange(37) ], [ float(i) for i in xrange(37) ])
+        self.assertRaises(IndexError, t.__getitem__, 37)
+
+    def test_update_keeps_total( self ):
+        rng = random.Random(1)
+        t = SumTree()
+        rates = [ 0.0 ] * 20
+        for i in xrange(20):
+            t.append(0.0)
+        for it in xrange(1000):
+            i = rng.randrange(20)
+            rates[i] = rng.random()
+            t.update(i, rates[i])
+            self.assertAlmostEqual(t.total(), sum(rates))
+
+    def test_find_boundaries( self ):
+        t = SumTree()
+        for r in [ 1.0, 0.0, 2.0, 0.0 ]:
+            t.append(r)
+        self.assertEqual(t.find(0.0), 0)
+        self.assertEqual(t.find(0.999), 0)
+        self.assertEqual(t.find(1.0), 2)
+        self.assertEqual(t.find(2.999), 2)
+
+    def test_never_finds_zero_rates( self ):
+        rng = random.Random(2)
+        t = SumTree()
+        for r in [ 0.0, 3.0, 0.0, 0.0, 1.0, 0.0 ]:
+            t.append(r)
+        for it in xrange(2000):
+            self.assertTrue(t.find(rng.random() * t.total()) in [ 1, 4 ])
+
+    def test_sampling_proportions( self ):
+        rng = random.Random(3)
+        t = SumTree()
+        rates = [ 1.0, 2.0, 3.0, 4.0, 0.0, 10.0 ]
+        for r in rates:
+            t.append(r)
+        n = 40000
+        counts = collections.Counter([ t.find(rng.random() * t.total()) for _ in xrange(n) ])
+        for (i, r) in enumerate(rates):
+            expected = n * r / sum(rates)
+            self.assertTrue(abs(counts[i] - expected) < 4 * (expected + 1) ** 0.5, (i, counts[i], expected))
+
+    def test_clear( self ):
+        t = SumTree()
+        t.append(1.0)
+        t.clear()
+        self.assertEqual(len(t), 0)
+        self.assertEqual(t.total(), 0.0)
+
+
+class DirectSelectionTest(unittest.TestCase):
+    '''Tests that the direct method fires channels in proportion to their rates.'''
+
+    def test_firing_proportions( self ):
+        rates = [ 1.0, 0.0, 4.0, 2.0, 3.0 ]
+        m = ChannelCounts(rates, events = 20000, engine = 'direct', seed = 5)
+        m.dynamics()
+        n = sum(m.fired)
+        self.assertEqual(n, 20000)
+        for (k, r) in enumerate(rates):
+            expected = n * r / sum(rates)
+            self.assertTrue(abs(m.fired[k] - expected) < 4 * (expected + 1) ** 0.5, (k, m.fired[k], expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# coding: utf-8
+
+import unittest
+import os
+import shutil
+import tempfile
+import networkx
+import numpy
+
+from SIRSynchronousDynamics import SIRSynchronousDynamics
+from SIRSynchronousEnsemble import SIRSynchronousEnsemble
+from SISSynchronousEnsemble import SISSynchronousEnsemble
+from CompactTopology import CompactTopology
+from TopologyCache import TopologyCache
+from BlobRunner import *
+
+
+def agree( a, b ):
+    '''Test whether two samples have the same mean, within four standard errors.'''
+    (a, b) = (numpy.asarray(a, dtype = float), numpy.asarray(b, dtype = float))
+    se = (a.var(ddof = 1) / len(a) + b.var(ddof = 1) / len(b)) ** 0.5
+    return abs(a.mean() - b.mean()) <= 4 * se
+
+
+class SynchronousEnsembleTest(unittest.TestCase):
+    '''Tests that the replicas of an ensemble are independent runs of the
+    same process as single simulations.'''
+
+    PARAMS = dict(p_infected = 0.01, p_infect = 0.1, p_recover = 0.3)
+
+    def setUp( self ):
+        self._g = networkx.barabasi_albert_graph(1000, 3, seed = 1)
+        self._t = CompactTopology(self._g)
+
+    def test_sir_matches_single_simulations( self ):
+        stats = SIRSynchronousEnsemble(self._t, replicas = 120, seed = 1, **self.PARAMS).dynamics()
+        sizes = []
+        outbreaks = []
+        for r in xrange(120):
+            m = SIRSynchronousDynamics(graph = self._g, seed = r, kernel = 'sparse', **self.PARAMS)
+            s = m.dynamics()
+            sizes.append(len(m.POPULATION[m.RECOVERED]))
+            outbreaks.append(s['max_outbreak_size'][0])
+        self.assertTrue(agree(stats['recovered_distribution'][:, -1], sizes))
+        self.assertTrue(agree(stats['max_outbreak_size'], outbreaks))
+
+    def test_replicas_match_single_replicas( self ):
+        for cls in [ SIRSynchronousEnsemble, SISSynchronousEnsemble ]:
+            stats = cls(self._t, replicas = 100, seed = 2, time_limit = 50, **self.PARAMS).dynamics()
+            singles = [ cls(self._t, replicas = 1, seed = 100 + r, time_limit = 50, **self.PARAMS).dynamics()
+                        for r in xrange(100) ]
+            for k in [ 'r_infinity', 'events', 'timesteps' ]:
+                self.assertTrue(agree(stats[k], [ s[k][0] for s in singles ]), (cls.__name__, k))
+            self.assertTrue(agree(stats['peak_infection'][1], [ s['peak_infection'][1][0] for s in singles ]))
+
+    def test_replica_statistics( self ):
+        e = SIRSynchronousEnsemble(self._t, replicas = 20, seed = 3, **self.PARAMS)
+        stats = e.dynamics()
+        (s, i, r) = [ stats[k + '_distribution'] for k in e.STATES ]
+        n = self._t.order()
+        self.assertEqual(s.shape, (20, len(stats['times'])))
+        self.assertTrue(((s + i + r) == n).all())
+        self.assertTrue((i[:, -1] == 0).all())
+
+        # each node that left the susceptible state recovered, and all but the seeds were infected by an event
+        self.assertTrue((stats['events'] == 2 * (n - s[:, -1]) - i[:, 0]).all())
+        self.assertTrue(numpy.allclose(stats['r_infinity'], (r[:, -1] + 0.0) / n))
+        (times, peaks) = stats['peak_infection']
+        self.assertTrue((peaks == i.max(axis = 1)).all())
+        self.assertTrue((i[numpy.arange(20), times] == peaks).all())
+        self.assertTrue((stats['timesteps'] < len(stats['times'])).all())
+
+    def test_seeded_ensembles_repeat( self ):
+        a = SISSynchronousEnsemble(self._t, replicas = 5, seed = 4, time_limit = 30, **self.PARAMS).dynamics()
+        b = SISSynchronousEnsemble(self._g, replicas = 5, seed = 4, time_limit = 30, **self.PARAMS).dynamics()
+        self.assertTrue((a['infected_distribution'] == b['infected_distribution']).all())
+        self.assertEqual(len(a['times']), 31)
+
+
+class EnsembleSimulationTest(unittest.TestCase):
+    '''Tests of running the repetitions of a parameter point as an ensemble.'''
+
+    POINT = dict(time_limit = 100, p_infected = 0.01, p_infect = 0.1, p_recover = 0.3, seed = 5)
+
+    def setUp( self ):
+        # the simulations append to a results file in the working directory
+        self._cwd = os.getcwd()
+        self._directory = tempfile.mkdtemp()
+        os.chdir(self._directory)
+
+    def tearDown( self ):
+        os.chdir(self._cwd)
+        shutil.rmtree(self._directory)
+
+    def test_averages_the_replicas( self ):
+        t = barabasi_albert_topology(500, 2, seed = 1)
+        shared = SharedTopology(t)
+        try:
+            sim = make_ensemble_simulation(500, 2, '', 'SYNCHRONOUS_SIR', repetitions = 30, topologies = [ shared ])
+            r = sim(self.POINT)
+        finally:
+            shared.unlink()
+        stats = SIRSynchronousEnsemble(t, replicas = 30, **self.POINT).dynamics()
+        self.assertEqual(set(r.keys()), set([ 'nodes', 'p_infect', 'p_rewire', 'p_recover', 'repetitions', 'start_time',
+                                              'end_time', 'avg_time_data', 'avg_node_data', 'r_infinity' ]))
+        self.assertEqual((r['nodes'], r['repetitions'], r['p_rewire']), (500, 30, 0.0))
+        self.assertEqual(r['avg_time_data'], numpy.mean(stats['peak_infection'][0]))
+        self.assertEqual(r['avg_node_data'], numpy.mean(stats['peak_infection'][1]))
+        self.assertEqual(r['r_infinity'], numpy.mean(stats['r_infinity']))
+        self.assertEqual(len(open('SYNCHRONOUS_SIR_results.csv').readlines()), 1)
+
+    def test_cached_network( self ):
+        cache = TopologyCache(os.path.join(self._directory, 'cache'))
+        sim = make_ensemble_simulation(300, 2, '', 'SYNCHRONOUS_SIS', repetitions = 4, offset = 7, cache = cache,
+                                       network = 'erdos_renyi')
+        sim(self.POINT)
+        self.assertEqual(len(cache.entries()), 1)
+        t = sim.topology()
+        self.assertEqual(t.order(), 300)
+        u = erdos_renyi_topology(300, 4.0 / 299, seed = 7)
+        self.assertTrue((t.offsets() == u.offsets()).all())
+        self.assertTrue((t.neighbour_array() == u.neighbour_array()).all())
+
+    def test_unknown_ensemble( self ):
+        self.assertRaises(ValueError, make_ensemble_simulation, 100, 2, '', 'REWIRE')
+        self.assertRaises(ValueError, blob_runner, model_type = 'SYNCHRONOUS_SIR', prew_max = 0.1,
+                          executor = SerialExecutor())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# coding: utf-8
+
+import unittest
+import math
+import networkx
+
+from SIRStochasticDynamics import SIRStochasticDynamics
+from SISStochasticDynamics import SISStochasticDynamics
+from SIRStochasticDynamicsRewire import SIRStochasticDynamicsRewire
+from SISStochasticDynamicsDisconnect import SISStochasticDynamicsDisconnect
+from SISStochasticDynamicsRewireDegree import SISStochasticDynamicsRewireDegree
+from SIRStochasticDynamicsRewireNeighbour import SIRStochasticDynamicsRewireNeighbour
+from StoppingCriteria import *
+from tests.channels import ChannelCounts
+from tests.test_SIEdgeIndex import si_edges
+
+
+class TauLeapingTest(unittest.TestCase):
+    '''Tests of the tau-leaping engine.'''
+
+    def setUp( self ):
+        self._g = networkx.barabasi_albert_graph(5000, 3, seed = 1)
+
+    def _sis( self, stopping, seed = 3 ):
+        return SISStochasticDynamics(graph = self._g, p_infected = 0.02, p_infect = 0.3, p_recover = 0.5,
+                                     engine = 'tau', seed = seed, stopping = stopping)
+
+    def test_leaps( self ):
+        # a large epidemic is simulated in many fewer steps than events
+        m = self._sis(EventBudget(20000))
+        stats = m.dynamics()
+        self.assertTrue(len(stats['times']) < 20000 / 10)
+
+    def test_event_budget_not_overshot( self ):
+        for events in [ 1000, 5000, 20000 ]:
+            m = self._sis(EventBudget(events))
+            m.dynamics()
+            self.assertEqual(m.CURRENT_EVENTS, events)
+
+    def test_time_limit_not_overshot( self ):
+        # the limit of the stopping criterion applies, not the model's default
+        m = self._sis(TimeLimit(2.5))
+        m.dynamics()
+        self.assertTrue(2.5 <= m.CURRENT_TIMESTEP < 2.5 + 0.01)
+
+    def test_drop_from_peak_not_overshot( self ):
+        m = SIRStochasticDynamics(graph = self._g, p_infected = 0.01, p_infect = 0.3, p_recover = 0.5,
+                                  engine = 'tau', seed = 3)
+        m._stopping = DropFromPeak(m.INFECTED, 0.5)
+        stats = m.dynamics()
+        (_, peak) = stats['peak_infected']
+        self.assertEqual(len(m.POPULATION[m.INFECTED]), int(math.ceil(0.5 * peak)) - 1)
+
+    def test_firing_proportions( self ):
+        rates = [ 100.0, 400.0, 0.0, 500.0 ]
+        m = ChannelCounts(rates, events = 50000, engine = 'tau', seed = 5)
+        stats = m.dynamics()
+        n = sum(m.fired)
+        self.assertEqual(n, 50000)
+        self.assertTrue(len(stats['times']) < n / 10)
+        for (k, r) in enumerate(rates):
+            expected = n * r / sum(rates)
+            self.assertTrue(abs(m.fired[k] - expected) < 4 * (expected + 1) ** 0.5, (k, m.fired[k], expected))
+
+    def test_indexes_after_leaps( self ):
+        for (cls, kwargs) in [ (SIRStochasticDynamics, dict()), (SISStochasticDynamics, dict()),
+                               (SIRStochasticDynamicsRewire, dict(p_rewire = 0.2)),
+                               (SISStochasticDynamicsDisconnect, dict(p_rewire = 0.2)),
+                               (SISStochasticDynamicsRewireDegree, dict(p_rewire = 0.2)),
+                               (SIRStochasticDynamicsRewireNeighbour, dict(p_rewire = 0.2)) ]:
+            for backend in [ 'networkx', 'compact' ]:
+                m = cls(graph = self._g, p_infected = 0.02, p_infect = 0.3, p_recover = 0.5, engine = 'tau',
+                        seed = 4, stopping = EventBudget(5000), backend = backend, **kwargs)
+                m.dynamics()
+                self.assertEqual(set([ (n, mp) for (n, mp, _) in m._si ]), si_edges(m))
+                for s in m.STATES:
+                    truth = set([ n for n in m.nodes() if m.node[n][m.DYNAMICAL_STATE] == s ])
+                    self.assertEqual(set(m.POPULATION[s]), truth)
+                self.assertEqual(m.rate(m._infect_channel), len(m._si) * m.p_infect)
+
+    def test_sir_final_size( self ):
+        # the leaps give much the same epidemic as exact simulation
+        g = networkx.barabasi_albert_graph(3000, 3, seed = 2)
+        means = dict()
+        for engine in [ 'direct', 'tau' ]:
+            sizes = []
+            for r in xrange(10):
+                m = SIRStochasticDynamics(graph = g, p_infected = 0.02, p_infect = 0.3, p_recover = 0.5,
+                                          engine = engine, seed = 100 * r + len(engine))
+                m.dynamics()
+                sizes.append(len(m.POPULATION[m.RECOVERED]) + 0.0)
+            means[engine] = sum(sizes) / len(sizes)
+        self.assertTrue(abs(means['tau'] - means['direct']) < 0.03 * means['direct'], means)
+
+
+if __name__ == '__main__':
+    unittest.main()
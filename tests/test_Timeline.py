@@ -0,0 +1,90 @@
+# coding: utf-8
+
+import unittest
+import networkx
+import numpy
+
+from Timeline import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+
+
+class TimelineTest(unittest.TestCase):
+    '''Tests of the population timeline.'''
+
+    def test_unknown_mode( self ):
+        self.assertRaises(ValueError, Timeline, [ 'a' ], 'sometimes')
+
+    def test_event_mode_grows( self ):
+        tl = Timeline([ 'a', 'b' ], capacity = 2)
+        for i in xrange(100):
+            tl.record(i * 0.5, [ i, 100 - i ], 1)
+        self.assertEqual(len(tl), 100)
+        self.assertEqual(list(tl.times()), [ i * 0.5 for i in xrange(100) ])
+        self.assertEqual(list(tl.counts('a')), range(100))
+        self.assertEqual(list(tl.counts('b')), [ 100 - i for i in xrange(100) ])
+        self.assertEqual(tl.events().sum(), 100)
+
+    def test_grid_mode( self ):
+        tl = Timeline([ 'a' ], mode = 'grid', step = 1.0)
+        for (t, a) in [ (0.0, 5), (0.4, 6), (2.5, 7), (2.7, 8) ]:
+            tl.record(t, [ a ], 1)
+        tl.finish(3.2)
+        self.assertEqual(list(tl.times()), [ 0.0, 1.0, 2.0, 3.0 ])
+        self.assertEqual(list(tl.counts('a')), [ 5, 6, 6, 8 ])
+        self.assertEqual(tl.events().sum(), 4)
+
+    def test_every_mode( self ):
+        tl = Timeline([ 'a' ], mode = 'every', step = 3)
+        for i in xrange(10):
+            tl.record(float(i), [ i ], 1)
+        tl.finish(9.0)
+        self.assertEqual(list(tl.times()), [ 0.0, 3.0, 6.0, 9.0 ])
+        self.assertEqual(list(tl.counts('a')), [ 0, 3, 6, 9 ])
+        self.assertEqual(tl.events().sum(), 10)
+
+    def test_every_mode_finishes_pending( self ):
+        tl = Timeline([ 'a' ], mode = 'every', step = 4)
+        for i in xrange(6):
+            tl.record(float(i), [ i ], 1)
+        tl.finish(5.0)
+        self.assertEqual(list(tl.times()), [ 0.0, 4.0, 5.0 ])
+        self.assertEqual(list(tl.counts('a')), [ 0, 4, 5 ])
+        self.assertEqual(tl.events().sum(), 6)
+
+    def test_peak( self ):
+        tl = Timeline([ 'a' ])
+        self.assertEqual(tl.peak('a'), None)
+        for (t, a) in [ (0.0, 1), (1.0, 4), (2.0, 4), (3.0, 2) ]:
+            tl.record(t, [ a ])
+        self.assertEqual(tl.peak('a'), (1.0, 4))
+
+
+class TimelineDynamicsTest(unittest.TestCase):
+    '''Tests that the recording modes give consistent views of the same run.'''
+
+    def test_modes_agree( self ):
+        g = networkx.barabasi_albert_graph(500, 3, seed = 1)
+        stats = dict()
+        for (mode, step) in [ ('event', 1), ('grid', 0.5), ('every', 7) ]:
+            m = SIRStochasticDynamics(graph = g, p_infected = 0.02, p_infect = 0.3, p_recover = 0.5,
+                                      seed = 8, record = mode, record_step = step)
+            stats[mode] = dict(m.dynamics())
+        ts = stats['event']['times']
+        infected = stats['event']['infected_distribution']
+        
+        # every mode keeps every 7th row
+        self.assertEqual(list(stats['every']['times'][:-1]), list(ts[::7]))
+        self.assertEqual(list(stats['every']['infected_distribution'][:-1]), list(infected[::7]))
+        
+        # grid mode keeps the last populations at or before each grid point
+        for (t, i) in zip(stats['grid']['times'], stats['grid']['infected_distribution']):
+            j = numpy.searchsorted(ts, t, side = 'right') - 1
+            self.assertEqual(i, infected[j])
+        
+        # all modes count the same events
+        for mode in stats.keys():
+            self.assertEqual(stats[mode]['event_distribution'].sum(), stats['event']['event_distribution'].sum())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# coding: utf-8
+
+import unittest
+import os
+import shutil
+import tempfile
+import networkx
+
+from TopologyCache import *
+from TopologyGenerators import *
+from Executors import ProcessPoolExecutor
+from SIRStochasticDynamics import SIRStochasticDynamics
+
+
+def same( a, b ):
+    '''Test whether two topologies have the same arrays.'''
+    return (a.offsets() == b.offsets()).all() and (a.neighbour_array() == b.neighbour_array()).all()
+
+
+def cached_network( task ):
+    '''Load a network from a cache in a worker process, building it if needed.'''
+    (directory, seed) = task
+    cache = TopologyCache(directory)
+    t = cache.topology('barabasi_albert', dict(n = 300, m = 2), seed, lambda: barabasi_albert_topology(300, 2, seed = seed))
+    return t.neighbour_array().tolist()
+
+
+class TopologyCacheTest(unittest.TestCase):
+    '''Tests of the cache of generated networks.'''
+
+    def setUp( self ):
+        self._directory = tempfile.mkdtemp()
+        self._cache = TopologyCache(os.path.join(self._directory, 'cache'))
+
+    def tearDown( self ):
+        shutil.rmtree(self._directory)
+
+    def _names( self ):
+        '''Return the names in the cache directory.'''
+        return os.listdir(os.path.join(self._directory, 'cache'))
+
+    def test_put_and_get( self ):
+        params = dict(n = 200, m = 3)
+        self.assertTrue(self._cache.get('barabasi_albert', params, 1) is None)
+        t = barabasi_albert_topology(200, 3, seed = 1)
+        self._cache.put('barabasi_albert', params, 1, t)
+        u = self._cache.get('barabasi_albert', params, 1)
+        self.assertTrue(u.is_shared())
+        self.assertTrue(same(t, u))
+        self.assertTrue(self._cache.get('barabasi_albert', params, 2) is None)
+        self.assertTrue(self._cache.get('erdos_renyi', params, 1) is None)
+
+    def test_keys( self ):
+        key = self._cache.key('g', dict(a = 1, b = 2), 3)
+        self.assertEqual(key, self._cache.key('g', dict(b = 2, a = 1), 3))
+        self.assertNotEqual(key, self._cache.key('g', dict(a = 1, b = 2), 4))
+        self.assertNotEqual(key, self._cache.key('g', dict(a = 1, b = 3), 3))
+        self.assertNotEqual(key, self._cache.key('h', dict(a = 1, b = 2), 3))
+
+    def test_builds_once( self ):
+        built = []
+        def build():
+            built.append(True)
+            return networkx.erdos_renyi_graph(100, 0.05, seed = 2)
+        t = self._cache.topology('erdos_renyi', dict(n = 100, p = 0.05), 2, build)
+        u = self._cache.topology('erdos_renyi', dict(n = 100, p = 0.05), 2, build)
+        self.assertEqual(len(built), 1)
+        self.assertTrue(isinstance(t, CompactTopology))
+        self.assertTrue(same(t, u))
+
+    def test_second_put_is_discarded( self ):
+        t = barabasi_albert_topology(100, 2, seed = 1)
+        self._cache.put('barabasi_albert', dict(n = 100, m = 2), 1, t)
+        self._cache.put('barabasi_albert', dict(n = 100, m = 2), 1, barabasi_albert_topology(100, 2, seed = 2))
+        self.assertEqual(len(self._names()), 1)
+        self.assertTrue(same(t, self._cache.get('barabasi_albert', dict(n = 100, m = 2), 1)))
+
+    def test_evicts_least_recently_used( self ):
+        for seed in xrange(3):
+            self._cache.put('barabasi_albert', dict(n = 100, m = 2), seed, barabasi_albert_topology(100, 2, seed = seed))
+        entries = self._cache.entries()
+        self.assertEqual(len(entries), 3)
+        size = entries[0][1]
+
+        # make the networks' last uses an hour apart, with seed 0 the most recent
+        for (seed, age) in [ (0, 0), (1, 7200), (2, 3600) ]:
+            entry = os.path.join(self._directory, 'cache', self._cache.key('barabasi_albert', dict(n = 100, m = 2), seed))
+            t = os.path.getmtime(entry) - age
+            os.utime(entry, (t, t))
+        self._cache._budget = 2 * size
+        self._cache.evict()
+        self.assertTrue(self._cache.get('barabasi_albert', dict(n = 100, m = 2), 1) is None)
+        self.assertFalse(self._cache.get('barabasi_albert', dict(n = 100, m = 2), 0) is None)
+        self.assertFalse(self._cache.get('barabasi_albert', dict(n = 100, m = 2), 2) is None)
+        self.assertEqual(self._cache.size(), 2 * size)
+
+    def test_clear( self ):
+        for seed in xrange(3):
+            self._cache.put('barabasi_albert', dict(n = 100, m = 2), seed, barabasi_albert_topology(100, 2, seed = seed))
+        self._cache.clear()
+        self.assertEqual(self._cache.entries(), [])
+        self.assertEqual(self._names(), [])
+
+    def test_workers_share_networks( self ):
+        executor = ProcessPoolExecutor(processes = 3, chunksize = 1)
+        directory = os.path.join(self._directory, 'cache')
+        try:
+            results = executor.map(cached_network, [ (directory, seed % 2) for seed in xrange(8) ])
+        finally:
+            executor.close()
+        for (seed, r) in enumerate(results):
+            self.assertEqual(r, barabasi_albert_topology(300, 2, seed = seed % 2).neighbour_array().tolist())
+        self.assertEqual(len(self._names()), 2)
+
+    def test_rebuild_from_cache( self ):
+        m = SIRStochasticDynamics(p_infected = 0.05, p_infect = 0.3, p_recover = 0.5, backend = 'compact')
+        m.rebuild_configuration_model(200, 2.5, k_min = 2, seed = 4, cache = self._cache)
+        self.assertEqual(len(self._cache.entries()), 1)
+        self.assertTrue(m.topology().is_shared())
+        self.assertTrue(same(m.topology(), configuration_model_topology(200, 2.5, k_min = 2, seed = 4)))
+        m.dynamics()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# coding: utf-8
+
+import unittest
+import collections
+import networkx
+import numpy
+
+from TopologyGenerators import *
+
+
+def check_simple( test, t ):
+    '''Check a topology has no self-loops or repeated edges, and that its
+    rows are symmetric.'''
+    for n in xrange(t.order()):
+        ns = t.neighbours(n)
+        test.assertFalse(n in ns)
+        test.assertEqual(len(set(ns)), len(ns))
+        for m in ns:
+            test.assertTrue(n in t.neighbours(m))
+
+
+class BarabasiAlbertTest(unittest.TestCase):
+    '''Tests of the vectorised Barabasi-Albert generator.'''
+
+    def test_structure( self ):
+        (n, m) = (1000, 3)
+        t = barabasi_albert_topology(n, m, seed = 1)
+        check_simple(self, t)
+        self.assertEqual(t.order(), n)
+        self.assertEqual(t.size(), m * (n - m))
+
+        # every node after the first joins m earlier nodes
+        for v in xrange(m + 1, n):
+            self.assertEqual(len([ w for w in t.neighbours(v) if w < v ]), m)
+        self.assertEqual(sorted([ w for w in t.neighbours(m) if w < m ]), range(m))
+
+    def test_seeded( self ):
+        a = barabasi_albert_topology(500, 2, seed = 3)
+        b = barabasi_albert_topology(500, 2, seed = 3)
+        c = barabasi_albert_topology(500, 2, seed = 4)
+        self.assertTrue((a.neighbour_array() == b.neighbour_array()).all())
+        self.assertFalse((a.neighbour_array() == c.neighbour_array()).all())
+
+    def test_matches_networkx( self ):
+        # the degree distributions agree, in the proportion of nodes of
+        # the smallest degree and in the size of the largest hubs
+        (n, m, runs) = (2000, 2, 20)
+        (ours, theirs) = ([], [])
+        for seed in xrange(runs):
+            t = barabasi_albert_topology(n, m, seed = seed)
+            g = networkx.barabasi_albert_graph(n, m, seed = seed)
+            ours.append([ t.degree(v) for v in xrange(n) ])
+            theirs.append(g.degree().values())
+        (ours, theirs) = (numpy.array(ours), numpy.array(theirs))
+        for f in [ lambda ds: (ds == m).mean(axis = 1), lambda ds: ds.max(axis = 1) ]:
+            (a, b) = (f(ours).astype(float), f(theirs).astype(float))
+            se = ((a.var(ddof = 1) + b.var(ddof = 1)) / runs) ** 0.5
+            self.assertTrue(abs(a.mean() - b.mean()) < 4 * se, (a.mean(), b.mean()))
+
+    def test_bad_parameters( self ):
+        self.assertRaises(ValueError, barabasi_albert_topology, 10, 0)
+        self.assertRaises(ValueError, barabasi_albert_topology, 10, 10)
+
+
+class ConfigurationModelTest(unittest.TestCase):
+    '''Tests of the configuration model generator.'''
+
+    def test_structure( self ):
+        t = configuration_model_topology(2000, 2.5, k_min = 2, k_max = 50, seed = 1)
+        check_simple(self, t)
+        degrees = numpy.array([ t.degree(v) for v in xrange(2000) ])
+        self.assertTrue(degrees.max() <= 50)
+
+    def test_degree_distribution( self ):
+        # with few hubs almost no stubs are dropped, so the degrees follow the power law
+        (n, alpha, k_min, k_max) = (20000, 2.5, 1, 20)
+        t = configuration_model_topology(n, alpha, k_min = k_min, k_max = k_max, seed = 2)
+        counts = collections.Counter([ t.degree(v) for v in xrange(n) ])
+        ks = numpy.arange(k_min, k_max + 1, dtype = float)
+        ps = ks ** -alpha / (ks ** -alpha).sum()
+        for (k, p) in zip(range(k_min, 5), ps):
+            expected = n * p
+            self.assertTrue(abs(counts[k] - expected) < 4 * expected ** 0.5 + 0.01 * n, (k, counts[k], expected))
+
+    def test_seeded( self ):
+        a = configuration_model_topology(500, 2.2, k_min = 2, seed = 3)
+        b = configuration_model_topology(500, 2.2, k_min = 2, seed = 3)
+        self.assertTrue((a.neighbour_array() == b.neighbour_array()).all())
+
+    def test_bad_parameters( self ):
+        self.assertRaises(ValueError, configuration_model_topology, 100, 2.5, k_min = 0)
+        self.assertRaises(ValueError, configuration_model_topology, 100, 2.5, k_min = 5, k_max = 4)
+
+
+class ErdosRenyiTest(unittest.TestCase):
+    '''Tests of the geometric-skipping Erdos-Renyi generator.'''
+
+    def test_structure( self ):
+        t = erdos_renyi_topology(1000, 0.01, seed = 1)
+        check_simple(self, t)
+        pairs = 1000 * 999 / 2
+        self.assertTrue(abs(t.size() - 0.01 * pairs) < 4 * (0.01 * 0.99 * pairs) ** 0.5)
+
+    def test_pairs_are_uniform( self ):
+        (n, p, runs) = (10, 0.3, 2000)
+        counts = collections.Counter()
+        for seed in xrange(runs):
+            counts.update(erdos_renyi_topology(n, p, seed = seed).to_networkx().edges())
+        self.assertEqual(len(counts), n * (n - 1) / 2)
+        sd = (runs * p * (1 - p)) ** 0.5
+        for c in counts.values():
+            self.assertTrue(abs(c - runs * p) < 4 * sd, c)
+
+    def test_extremes( self ):
+        self.assertEqual(erdos_renyi_topology(50, 0.0, seed = 1).size(), 0)
+        self.assertEqual(erdos_renyi_topology(50, 1.0, seed = 1).size(), 50 * 49 / 2)
+
+    def test_bad_parameters( self ):
+        self.assertRaises(ValueError, erdos_renyi_topology, 10, 1.5)
+        self.assertRaises(ValueError, erdos_renyi_topology, 10, -0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
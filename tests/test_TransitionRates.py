@@ -0,0 +1,86 @@
+# coding: utf-8
+
+import unittest
+import networkx
+
+from GraphWithStochasticDynamics import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+from SISStochasticDynamics import SISStochasticDynamics
+from SIRStochasticDynamicsRewire import SIRStochasticDynamicsRewire
+from SISStochasticDynamicsRewire import SISStochasticDynamicsRewire
+from SIRStochasticDynamicsDisconnect import SIRStochasticDynamicsDisconnect
+from SISStochasticDynamicsDisconnect import SISStochasticDynamicsDisconnect
+from SIRStochasticDynamicsRewireDegree import SIRStochasticDynamicsRewireDegree
+from SISStochasticDynamicsRewireDegree import SISStochasticDynamicsRewireDegree
+from SIRStochasticDynamicsRewireNeighbour import SIRStochasticDynamicsRewireNeighbour
+from SISStochasticDynamicsRewireNeighbour import SISStochasticDynamicsRewireNeighbour
+
+
+class LegacyCounts(GraphWithStochasticDynamics):
+    '''A model that gives its transitions as a vector rather than
+    registering channels, with one channel whose rate falls as it fires.'''
+
+    def __init__( self, firings ):
+        GraphWithStochasticDynamics.__init__(self, graph = networkx.empty_graph(1), states = [ 'node' ])
+        self._firings = firings
+
+    def before( self ):
+        for n in self.node.keys():
+            self.node[n][self.DYNAMICAL_STATE] = 'node'
+        self.POPULATION = self.calculate_populations()
+        self.left = self._firings
+
+    def fire( self, t ):
+        self.left -= 1
+
+    def transitions( self ):
+        return [ (self.left * 1.0, self.fire), (0.0, self.fire) ]
+
+    def after( self ):
+        pass
+
+    def stopping_criterion( self ):
+        return TimeLimit(self._time_limit)
+
+
+class TransitionRatesTest(unittest.TestCase):
+    '''Tests that the incrementally-maintained channel rates always equal
+    the rates recomputed from the state of the network.'''
+
+    MODELS = [ (SIRStochasticDynamics, False), (SISStochasticDynamics, False),
+               (SIRStochasticDynamicsRewire, True), (SISStochasticDynamicsRewire, True),
+               (SIRStochasticDynamicsDisconnect, True), (SISStochasticDynamicsDisconnect, True),
+               (SIRStochasticDynamicsRewireDegree, True), (SISStochasticDynamicsRewireDegree, True),
+               (SIRStochasticDynamicsRewireNeighbour, True), (SISStochasticDynamicsRewireNeighbour, True) ]
+
+    def _check( self, m, rewires ):
+        '''Check the rates of a model's channels against its SI edges and infected nodes.'''
+        self.assertAlmostEqual(m.rate(m._infect_channel), len(m._si) * m.p_infect)
+        self.assertAlmostEqual(m.rate(m._recover_channel), len(m.POPULATION[m.INFECTED]) * m.p_recover)
+        total = m.rate(m._infect_channel) + m.rate(m._recover_channel)
+        if rewires:
+            self.assertAlmostEqual(m.rate(m._rewire_channel), len(m._si) * m.p_rewire)
+            total += m.rate(m._rewire_channel)
+        self.assertAlmostEqual(m._rates.total(), total)
+
+    def test_rates( self ):
+        g = networkx.barabasi_albert_graph(200, 3, seed = 2)
+        for (cls, rewires) in self.MODELS:
+            kwargs = dict()
+            if rewires:
+                kwargs['p_rewire'] = 0.2
+            for events in [ 0, 1, 50, 500 ]:
+                m = cls(graph = g, p_infected = 0.05, p_infect = 0.3, p_recover = 0.5, seed = 7,
+                        stopping = EventBudget(events), **kwargs)
+                m.dynamics()
+                self._check(m, rewires)
+
+    def test_legacy_transitions( self ):
+        m = LegacyCounts(25)
+        m.dynamics()
+        self.assertEqual(m.left, 0)
+        self.assertEqual(m._rates.total(), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# coding: utf-8
+
+import unittest
+import random
+import collections
+import networkx
+
+from TwoHopSampler import *
+from RandomStream import RandomStream
+from CompactTopology import *
+
+
+class Network(object):
+    '''A holder for an adjacency map, as the sampler only looks at g.adj.'''
+
+    def __init__( self, adj ):
+        self.adj = adj
+
+
+class TwoHopSamplerTest(unittest.TestCase):
+    '''Tests of the two-hop neighbourhood sampler.'''
+
+    def setUp( self ):
+        self._g = networkx.barabasi_albert_graph(300, 3, seed = 5)
+        t = CompactTopology(self._g)
+        self._networks = [ self._g ] + [ Network(cls(t, 'occupied')) for cls in [ CompactAdjacency, DynamicAdjacency, OverlayAdjacency ] ]
+
+    def _twohop( self, g, m, suitable = lambda c: True ):
+        '''Return the suitable two-hop neighbourhood of a node, by brute force.'''
+        return set([ c for j in g[m] for c in g[j] if (c != m) and (c not in g[m]) and suitable(c) ])
+
+    def _check_uniform( self, s, m, suitable ):
+        '''Check a sampler chooses uniformly from the suitable two-hop neighbours of a node.'''
+        exact = self._twohop(self._g, m, suitable)
+        draws = 40 * len(exact)
+        counts = collections.Counter([ s.sample(m, suitable) for _ in xrange(draws) ])
+        self.assertEqual(set(counts.keys()), exact)
+        chi2 = sum([ (counts[c] - 40.0) ** 2 / 40.0 for c in exact ])
+        dof = len(exact) - 1
+        self.assertTrue(chi2 < dof + 5 * (2 * dof) ** 0.5, (m, chi2, dof))
+
+    def test_uniform( self ):
+        suitable = lambda c: c % 3 != 0
+        hub = max(self._g.nodes(), key = self._g.degree)
+        for g in self._networks:
+            for m in [ hub, 150, 299 ]:
+                self._check_uniform(TwoHopSampler(g, RandomStream(2)), m, suitable)
+
+    def test_uniform_with_network_bound( self ):
+        # bound the degrees of the middle of the walk by the largest in the network
+        for g in self._networks:
+            s = TwoHopSampler(g, RandomStream(3))
+            s.LOCAL_DEGREES = 0
+            for m in [ 0, 299 ]:
+                self._check_uniform(s, m, lambda c: True)
+
+    def test_nothing_suitable( self ):
+        s = TwoHopSampler(self._g, RandomStream(4))
+        self.assertEqual(s.sample(5, lambda c: False), None)
+        g = networkx.star_graph(4)
+        g.add_node(9)
+        s = TwoHopSampler(g, RandomStream(4))
+        self.assertEqual(s.sample(9, lambda c: True), None)
+        self.assertEqual(s.sample(0, lambda c: True), None)
+        self.assertEqual(set([ s.sample(1, lambda c: True) for _ in xrange(100) ]), set([ 2, 3, 4 ]))
+
+    def test_neighbourhood( self ):
+        for g in self._networks:
+            s = TwoHopSampler(g, RandomStream(5))
+            for m in [ 0, 17, 299 ]:
+                self.assertEqual(set(s.neighbourhood(m)), self._twohop(self._g, m))
+
+    def test_cache_follows_changes( self ):
+        g = networkx.barabasi_albert_graph(100, 2, seed = 6)
+        s = TwoHopSampler(g, RandomStream(6), cache_size = 10)
+        rng = random.Random(6)
+        for it in xrange(500):
+            m = rng.randrange(100)
+            self.assertEqual(set(s.neighbourhood(m)), self._twohop(g, m))
+            (a, b) = (rng.randrange(100), rng.randrange(100))
+            if a == b:
+                continue
+            if g.has_edge(a, b):
+                g.remove_edge(a, b)
+            else:
+                g.add_edge(a, b)
+            s.edge_changed(a, b)
+        self.assertTrue(len(s._cache) <= 10)
+
+    def test_largest_degree_follows_changes( self ):
+        for backend in [ 'networkx', 'dynamic' ]:
+            g = networkx.barabasi_albert_graph(200, 3, seed = 4)
+            if backend == 'dynamic':
+                g = Network(DynamicAdjacency(CompactTopology(g), 'occupied'))
+            s = TwoHopSampler(g, RandomStream(1))
+            s._largest_degree()
+            rng = random.Random(3)
+            for it in xrange(3000):
+                (a, b) = (rng.randrange(200), rng.randrange(200))
+                if a == b:
+                    continue
+                if b in g.adj[a]:
+                    del g.adj[a][b]
+                    del g.adj[b][a]
+                else:
+                    g.adj[a][b] = dict()
+                    g.adj[b][a] = dict()
+                s.edge_changed(a, b)
+                self.assertEqual(s._largest_degree(), max([ len(g.adj[n]) for n in g.adj ]))
+
+
+if __name__ == '__main__':
+    unittest.main()
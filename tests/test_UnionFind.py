@@ -0,0 +1,89 @@
+# coding: utf-8
+
+import unittest
+import random
+import collections
+import networkx
+
+from UnionFind import *
+from SIRStochasticDynamics import SIRStochasticDynamics
+
+
+class ComponentsTestCase(unittest.TestCase):
+    '''Base for tests that compare a forest with the components of a graph.'''
+
+    def _check( self, uf, g ):
+        '''Check a forest against the components of a graph with the same elements.'''
+        components = list(networkx.connected_components(g))
+        sizes = [ len(c) for c in components ]
+        self.assertEqual(uf.sets(), len(components))
+        self.assertEqual(uf.max_size(), max(sizes))
+        self.assertAlmostEqual(uf.mean_size(), (g.order() + 0.0) / len(components))
+        self.assertEqual(uf.size_distribution(), dict(collections.Counter(sizes)))
+        for c in components:
+            c = list(c)
+            r = uf.find(c[0])
+            for e in c:
+                self.assertEqual(uf.find(e), r)
+                self.assertEqual(uf.size(e), len(c))
+
+
+class UnionFindTest(ComponentsTestCase):
+    '''Tests of the disjoint-set forest.'''
+
+    def test_singletons( self ):
+        uf = UnionFind(range(5))
+        uf.add(3)
+        self.assertEqual(len(uf), 5)
+        self.assertEqual(uf.sets(), 5)
+        self.assertEqual(uf.size_distribution(), { 1: 5 })
+        self.assertTrue(3 in uf)
+        self.assertFalse(7 in uf)
+
+    def test_union( self ):
+        uf = UnionFind(range(4))
+        self.assertTrue(uf.union(0, 1))
+        self.assertFalse(uf.union(1, 0))
+        self.assertTrue(uf.union(2, 1))
+        self.assertEqual(uf.size(0), 3)
+        self.assertEqual(uf.size_distribution(), { 3: 1, 1: 1 })
+
+    def test_random_unions( self ):
+        rng = random.Random(1)
+        uf = UnionFind(range(200))
+        g = networkx.empty_graph(200)
+        for it in xrange(150):
+            (e, f) = (rng.randrange(200), rng.randrange(200))
+            uf.union(e, f)
+            g.add_edge(e, f)
+            if it % 25 == 0:
+                self._check(uf, g)
+        self._check(uf, g)
+
+    def test_empty( self ):
+        uf = UnionFind()
+        self.assertEqual(uf.mean_size(), 0.0)
+        self.assertEqual(uf.max_size(), 0)
+
+
+class OutbreakTest(ComponentsTestCase):
+    '''Tests that the outbreaks tracked during a run are the components
+    of the network of occupied edges.'''
+
+    def test_outbreaks( self ):
+        g = networkx.barabasi_albert_graph(500, 3, seed = 1)
+        for backend in [ 'networkx', 'compact' ]:
+            m = SIRStochasticDynamics(graph = g, p_infected = 0.02, p_infect = 0.3, p_recover = 0.5,
+                                      seed = 2, backend = backend)
+            m.dynamics()
+            skeleton = networkx.Graph()
+            skeleton.add_nodes_from(m.nodes())
+            skeleton.add_edges_from([ (n, mp) for (n, mp, data) in m.edges_iter(data = True) if data[m.OCCUPIED] ])
+            self.assertTrue(skeleton.size() > 0)
+            self._check(m._outbreaks, skeleton)
+            if backend == 'networkx':
+                self.assertEqual(sorted(m.skeletonise().edges()), sorted(skeleton.edges()))
+
+
+if __name__ == '__main__':
+    unittest.main()